@@ -67,6 +67,9 @@ CREATE TABLE model_evaluations (
     FOREIGN KEY (lottery_type_id) REFERENCES lottery_types(id)
 );
 
+-- 按(模型, 彩种, 期号)判断预测是否已评估
+CREATE INDEX idx_eval_model_draw ON model_evaluations (model_id, lottery_type_id, draw_number);
+
 -- 统计分析表
 CREATE TABLE statistical_analysis (
     id INT PRIMARY KEY AUTO_INCREMENT,
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+爬虫吞吐量基准测试
+用合成开奖数据生成历史开奖样本页，由本地回放服务器按指定延迟和错误率提供，
+爬虫经REPLAY_CONFIG改发请求，数据写入SQLite本地数据库替身，不需要网络和MySQL。
+分别测量请求(页/秒)、解析(页/秒)和入库(条/秒)，以及crawl_all_data的端到端吞吐量；
+端到端爬取先在空的HTTP缓存上执行一次，再重复执行一次，比较两次的请求数和下载字节数。
+"""
+import sys
+import os
+import json
+import time
+import argparse
+import tempfile
+import requests
+from loguru import logger
+
+# 添加项目目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import CRAWLER_CONFIG, DATA_SOURCES, REPLAY_CONFIG, FEATURE_STORE_CONFIG, HTTP_CACHE_CONFIG, \
+    TRACING_CONFIG
+from replay_server import FixtureStore, ReplayServer, synthesize_fixtures
+from crawler import LotteryCrawler
+from parsers import ParserFactory
+from local_db import LocalDatabaseManager
+
+
+def bench_stages(crawler: LotteryCrawler, game: str, pages: int) -> dict:
+    """分阶段计时一个数据源: 逐页请求、逐页解析、批量入库"""
+    source = DATA_SOURCES[game]
+    lottery_type_id = {row['type_code']: row['id'] for row in crawler.db.get_lottery_types()}[game]
+
+    htmls = []
+    failed = 0
+    start = time.perf_counter()
+    for page in range(1, pages + 1):
+        try:
+            htmls.append(crawler.fetch_page(game, source['url'], {'page': page}))
+        except requests.RequestException:
+            failed += 1
+    fetch_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    parser = ParserFactory.create_parser(source['parser'])
+    results = [row for html in htmls for row in parser.parse(html)]
+    parse_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    saved = crawler.save_to_database(lottery_type_id, results)
+    save_seconds = time.perf_counter() - start
+
+    return {
+        'pages': pages,
+        'failed_pages': failed,
+        'rows': len(results),
+        'saved': saved,
+        'fetch_pages_per_second': round(pages / fetch_seconds, 1),
+        'parse_pages_per_second': round(len(htmls) / parse_seconds, 1),
+        'save_rows_per_second': round(len(results) / save_seconds, 1)
+    }
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="爬虫吞吐量基准测试")
+    parser.add_argument('--games', default=','.join(DATA_SOURCES), help='数据源，逗号分隔')
+    parser.add_argument('--pages', type=int, default=20, help='每个数据源的页数')
+    parser.add_argument('--rows', type=int, default=30, help='每页开奖期数')
+    parser.add_argument('--latency', type=float, default=0.0, help='回放服务器平均响应延迟(秒)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='回放服务器返回503的概率')
+    parser.add_argument('--seed', type=int, default=2024, help='随机种子')
+    parser.add_argument('--output', help='结果JSON文件路径')
+    args = parser.parse_args()
+
+    logger.remove()
+    games = [game.strip().upper() for game in args.games.split(',')]
+    workdir = tempfile.TemporaryDirectory(prefix='lottery-crawl-')
+    store = FixtureStore(os.path.join(workdir.name, 'fixtures'))
+    synthesize_fixtures(store, games, args.pages, args.rows, args.seed)
+    server = ReplayServer(store, port=0, latency=args.latency, error_rate=args.error_rate, seed=args.seed).start()
+
+    # 只在本进程内改写配置: 请求发往回放服务器，不限速，特征缓存、HTTP缓存和爬取进度写入临时目录，不记录链路追踪
+    REPLAY_CONFIG.update(enabled=True, record=False, base_url=server.url)
+    CRAWLER_CONFIG.update(simulate=False, request_delay=0, pages=args.pages,
+                          checkpoint_file=os.path.join(workdir.name, 'checkpoint.json'))
+    FEATURE_STORE_CONFIG['cache_dir'] = os.path.join(workdir.name, 'features')
+    HTTP_CACHE_CONFIG['cache_dir'] = os.path.join(workdir.name, 'http')
+    TRACING_CONFIG['enabled'] = False
+
+    report = {'stages': {}}
+    print(f"🕷️ 爬虫基准测试: {','.join(games)}, 每个数据源{args.pages}页×{args.rows}期, "
+          f"延迟{args.latency}秒, 错误率{args.error_rate}")
+    try:
+        crawler = LotteryCrawler(LocalDatabaseManager())
+        crawler.cache = None  # 分阶段计时不使用HTTP缓存
+        for game in games:
+            stats = bench_stages(crawler, game, args.pages)
+            report['stages'][game] = stats
+            if stats['failed_pages']:
+                print(f"   {game:<5}请求失败{stats['failed_pages']}页")
+            print(f"   {game:<5}请求{stats['fetch_pages_per_second']:8.1f} 页/秒  "
+                  f"解析{stats['parse_pages_per_second']:8.1f} 页/秒  入库{stats['save_rows_per_second']:8.1f} 条/秒")
+        crawler.close()
+
+        # 端到端: 新的数据库上执行一次完整爬取(HTTP缓存为空)，再重复执行一次
+        db = LocalDatabaseManager()
+        db.execute_update("DELETE FROM lottery_types WHERE type_code NOT IN (" + ','.join(['%s'] * len(games)) + ")",
+                          tuple(games))
+        for run in ('cold', 'repeat'):
+            crawler = LotteryCrawler(db)
+            requests_before, bytes_before = server.requests, server.bytes_sent
+            start = time.perf_counter()
+            saved = crawler.crawl_all_data()
+            elapsed = time.perf_counter() - start
+            pages = server.requests - requests_before
+            downloaded = server.bytes_sent - bytes_before
+            report[f'crawl_all_data_{run}'] = {'saved': saved, 'seconds': round(elapsed, 3), 'requests': pages,
+                                               'bytes': downloaded, 'pages_per_second': round(pages / elapsed, 1)}
+            print(f"   端到端({'空缓存' if run == 'cold' else '重复爬取'}): {pages}次请求, 下载{downloaded / 1e6:.2f}MB, "
+                  f"保存{sum(saved.values())}条, {elapsed:.2f}秒")
+        db.close()
+        report['server'] = {'requests': server.requests, 'errors': server.errors, 'not_modified': server.not_modified}
+    finally:
+        server.stop()
+        workdir.cleanup()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"💾 结果已保存: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
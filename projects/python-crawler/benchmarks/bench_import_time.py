@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+服务冷启动导入耗时基准测试
+在子进程中用python -X importtime导入main，统计导入总耗时、耗时最多的模块和进程内存，
+并检查重量级库(pandas/sklearn/matplotlib/plotly等)没有在启动时被导入。
+超过耗时上限或导入了重量级库时以非零状态退出，可用于回归检查。
+"""
+import sys
+import os
+import json
+import argparse
+import subprocess
+import statistics
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 只应在对应接口第一次使用时才导入的库
+HEAVY_MODULES = ('pandas', 'sklearn', 'scipy', 'matplotlib', 'seaborn', 'plotly')
+
+# 子进程: 导入目标模块后输出已加载的重量级库和最大常驻内存
+PROBE = """
+import sys, json, resource
+import {module}
+print(json.dumps({{
+    'heavy': sorted(name for name in {heavy!r} if name in sys.modules),
+    'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+}}))
+"""
+
+
+def measure(module: str) -> dict:
+    """在新的解释器中导入模块一次，返回导入耗时明细"""
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=PROJECT_DIR, env=dict(os.environ, PYTHONPATH=PROJECT_DIR), capture_output=True, text=True
+    )
+    if process.returncode != 0:
+        raise RuntimeError(f"导入{module}失败:\n{process.stderr[-2000:]}")
+
+    # importtime输出格式: "import time: self [us] | cumulative | imported package"
+    modules = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules[name.strip()] = {'cumulative_ms': int(cumulative) / 1000, 'depth': depth}
+
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    result['total_ms'] = modules[module]['cumulative_ms']
+    result['modules'] = modules
+    return result
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="服务冷启动导入耗时基准测试")
+    parser.add_argument('--module', default='main', help='导入的模块')
+    parser.add_argument('--repeat', type=int, default=5, help='重复次数(取中位数)')
+    parser.add_argument('--top', type=int, default=10, help='显示耗时最多的直接依赖数')
+    parser.add_argument('--max-ms', type=float, default=1500, help='导入耗时上限(毫秒)，超过时退出码为1')
+    parser.add_argument('--json', action='store_true', help='以JSON格式输出结果')
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(args.repeat)]
+    total_ms = statistics.median(run['total_ms'] for run in runs)
+    heavy = sorted(set().union(*(run['heavy'] for run in runs)))
+    last = runs[-1]
+    top = sorted(((name, info['cumulative_ms']) for name, info in last['modules'].items() if info['depth'] == 1),
+                 key=lambda item: -item[1])[:args.top]
+    failed = total_ms > args.max_ms or bool(heavy)
+
+    if args.json:
+        print(json.dumps({'module': args.module, 'total_ms': total_ms, 'max_ms': args.max_ms,
+                          'max_rss_mb': last['max_rss_mb'], 'heavy_modules': heavy,
+                          'top_imports': dict(top), 'passed': not failed}, ensure_ascii=False, indent=2))
+    else:
+        print(f"🚀 导入{args.module}: {total_ms:.1f}毫秒(中位数, {args.repeat}次), "
+              f"常驻内存{last['max_rss_mb']}MB")
+        for name, cumulative_ms in top:
+            print(f"   {name:<28}{cumulative_ms:8.1f} 毫秒")
+        if heavy:
+            print(f"❌ 启动时导入了重量级库: {', '.join(heavy)}")
+        if total_ms > args.max_ms:
+            print(f"❌ 导入耗时超过上限{args.max_ms}毫秒")
+        if not failed:
+            print("✅ 导入耗时检查通过")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
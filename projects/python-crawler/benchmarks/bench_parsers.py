@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+页面解析吞吐量基准测试
+用合成开奖数据生成历史开奖页，对每个解析后端测量每秒解析的页数，
+并检查各后端的解析结果与生成页面的开奖记录完全一致。
+"""
+import sys
+import os
+import time
+import argparse
+import numpy as np
+
+# 添加项目目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import DATA_SOURCES
+from parsers import ParserFactory
+from replay_server import render_history_page
+from synthetic_data import generate_draws, to_results
+
+
+def build_pages(game: str, pages: int, rows: int, seed: int):
+    """生成pages个历史开奖页，返回(页面列表, 每页的开奖记录)"""
+    results = to_results(generate_draws(game, pages * rows, seed))
+    amounts = np.random.default_rng(seed).uniform(1e6, 1e8, size=(len(results), 2)).round(2)
+    for result, (sales_amount, prize_pool) in zip(results, amounts.tolist()):
+        result['sales_amount'], result['prize_pool'] = sales_amount, prize_pool
+    chunks = [results[index * rows:(index + 1) * rows] for index in range(pages)]
+    return [render_history_page(game, chunk, index + 1, pages) for index, chunk in enumerate(chunks)], chunks
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="页面解析吞吐量基准测试")
+    parser.add_argument('--pages', type=int, default=200, help='每个彩种的页数')
+    parser.add_argument('--rows', type=int, default=30, help='每页开奖期数')
+    parser.add_argument('--repeat', type=int, default=3, help='重复次数(取最快一次)')
+    parser.add_argument('--seed', type=int, default=2024, help='随机种子')
+    args = parser.parse_args()
+
+    print(f"🔍 解析基准测试: 每个彩种{args.pages}页×{args.rows}期")
+    failed = False
+    for game, source in DATA_SOURCES.items():
+        pages, expected = build_pages(game, args.pages, args.rows, args.seed)
+        megabytes = sum(len(page.encode('utf-8')) for page in pages) / 1e6
+        for backend in ParserFactory.BACKENDS:
+            page_parser = ParserFactory.create_parser(source['parser'], backend)
+            elapsed = float('inf')
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                parsed = [page_parser.parse(page) for page in pages]
+                elapsed = min(elapsed, time.perf_counter() - start)
+            correct = parsed == expected
+            failed = failed or not correct
+            print(f"   {game:<5}{backend:<6}{args.pages / elapsed:10.1f} 页/秒{megabytes / elapsed:8.1f} MB/秒"
+                  f"  {'✅' if correct else '❌ 解析结果不一致'}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
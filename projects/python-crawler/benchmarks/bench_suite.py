@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+分析、预测和数据库基准测试套件
+按彩种生成1千/1万/10万/100万期的合成开奖历史，分别计时:
+- 四项开奖分析(频率趋势、冷热号码、和值分布、奇偶分布)
+- 特征计算、频率模型训练/预测和批量评估
+- 批量入库、读取开奖结果和计算数据版本(使用SQLite本地数据库替身，不需要MySQL)
+结果以"彩种/期数/项目"为键输出JSON，可保存为基线；指定基线时耗时超过基线
+(1 + 容差)倍且多出min-delta-ms毫秒以上的项目视为性能回退，以非零状态退出。
+"""
+import sys
+import os
+import gc
+import json
+import time
+import argparse
+import statistics
+import numpy as np
+from loguru import logger
+
+# 添加项目目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from number_encoding import random_packed
+from feature_store import build_features
+from prediction_models import PredictionModelFactory, score_batch
+from data_analysis import LotteryDataAnalyzer
+from local_db import LocalDatabaseManager
+from synthetic_data import generate_draws, to_results
+from config import FEATURE_STORE_CONFIG, TRACING_CONFIG
+
+GAMES = ('DLT', 'SSQ', 'FC3D')
+DEFAULT_SIZES = (1000, 10000, 100000, 1000000)
+
+
+def measure(func, repeat: int) -> float:
+    """执行repeat次，返回耗时中位数(毫秒)"""
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def bench_game(game: str, size: int, repeat: int, seed: list) -> dict:
+    """对一个彩种的一种历史规模执行全部计时，返回{项目: 耗时毫秒}"""
+    draws = generate_draws(game, size, seed)
+    history, packed = to_results(draws), draws['packed']
+    rng = np.random.default_rng(seed)
+    db = LocalDatabaseManager()
+    lottery_type_id = {row['type_code']: row['id'] for row in db.get_lottery_types()}[game]
+    analyzer = LotteryDataAnalyzer(db)
+    timings = {}
+
+    # 开奖分析: (分析函数, 结果中的数据字段)，不支持该彩种(数据字段为空)的分析不计时，避免基线失效
+    analyses = {
+        'frequency': (analyzer.analyze_frequency_trends, 'frequency_data'),
+        'hot_cold': (analyzer.analyze_hot_cold_numbers, 'hot_cold_data'),
+        'sum': (analyzer.analyze_sum_distribution, 'sum_distribution'),
+        'odd_even': (analyzer.analyze_odd_even_distribution, 'odd_even_distribution')
+    }
+    for name, (analyze, data_key) in analyses.items():
+        if not analyze(lottery_type_id, size, results=history).get(data_key):
+            print(f"   ⏭️ {game}不支持{name}分析，跳过计时")
+            continue
+        timings[f'analysis.{name}'] = measure(lambda: analyze(lottery_type_id, size, results=history), repeat)
+
+    # 特征与模型
+    window = FEATURE_STORE_CONFIG['rolling_window']
+    timings['model.features'] = measure(lambda: build_features(game, packed, window), repeat)
+    features = build_features(game, packed, window)
+    model = PredictionModelFactory.create_model('FREQUENCY')
+    timings['model.train'] = measure(lambda: model.train(history, features), repeat)
+    timings['model.predict'] = measure(lambda: model.predict(history), repeat)
+    predicted = random_packed(game, rng, 1)
+    timings['model.evaluate'] = measure(lambda: score_batch(game, packed, predicted), repeat)
+
+    # 数据库: 第一次为插入，之后重复写入相同期号走更新路径
+    timings['db.insert'] = measure(lambda: db.insert_lottery_results(lottery_type_id, history), 1)
+    timings['db.upsert'] = measure(lambda: db.insert_lottery_results(lottery_type_id, history), repeat)
+    timings['db.read'] = measure(lambda: db.get_lottery_results(lottery_type_id, size), repeat)
+    timings['db.version'] = measure(lambda: db.get_data_version(lottery_type_id), repeat)
+    db.close()
+    return timings
+
+
+def compare(results: dict, baseline: dict, tolerance: float, min_delta_ms: float) -> list:
+    """与基线比较，返回性能回退的(键, 基线耗时, 当前耗时)列表"""
+    regressions = []
+    for key, elapsed in results.items():
+        expected = baseline.get(key)
+        if expected is None:
+            continue
+        if elapsed > expected * (1 + tolerance) and elapsed - expected > min_delta_ms:
+            regressions.append((key, expected, elapsed))
+    return regressions
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="分析、预测和数据库基准测试套件")
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)), help='历史期数，逗号分隔')
+    parser.add_argument('--games', default=','.join(GAMES), help='彩种，逗号分隔')
+    parser.add_argument('--repeat', type=int, default=3, help='每项重复次数(取中位数)')
+    parser.add_argument('--seed', type=int, default=2024, help='随机种子')
+    parser.add_argument('--output', help='结果JSON文件路径')
+    parser.add_argument('--baseline', help='基线JSON文件路径，指定时检查性能回退')
+    parser.add_argument('--save-baseline', action='store_true', help='把本次结果写入--baseline指定的文件')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='允许超出基线的比例')
+    parser.add_argument('--min-delta-ms', type=float, default=5, help='视为回退的最小耗时增量(毫秒)')
+    args = parser.parse_args()
+
+    logger.remove()  # 模型和数据库的日志会淹没计时输出
+    TRACING_CONFIG['enabled'] = False  # 批量写入的区间记录会写进项目的logs目录并计入耗时
+    sizes = [int(size) for size in args.sizes.split(',')]
+    games = [game.strip().upper() for game in args.games.split(',')]
+
+    results = {}
+    print(f"📊 基准测试: 彩种{','.join(games)}, 期数{','.join(map(str, sizes))}, 重复{args.repeat}次")
+    for game in games:
+        for size in sizes:
+            seed = [args.seed, size, GAMES.index(game)]  # 只测部分彩种时数据不变
+            print(f"🎯 {game} {size}期")
+            timings = bench_game(game, size, args.repeat, seed)
+            for name, elapsed in timings.items():
+                results[f"{game}/{size}/{name}"] = round(elapsed, 3)
+                print(f"   {name:<20}{elapsed:12.2f} 毫秒")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"💾 结果已保存: {args.output}")
+
+    if args.baseline and args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"💾 基线已保存: {args.baseline}")
+        return
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, args.min_delta_ms)
+        for key, expected, elapsed in regressions:
+            print(f"❌ {key}: {expected:.2f} → {elapsed:.2f} 毫秒 (+{(elapsed / expected - 1) * 100:.0f}%)")
+        if regressions:
+            sys.exit(1)
+        print("✅ 未发现性能回退")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+服务压力测试
+在临时目录中创建SQLite本地数据库替身并写入合成开奖历史，用它启动一个服务进程
+(DB_BACKEND=sqlite，关闭定时任务)，再以指定并发数持续发送分析、预测、图表和健康检查
+的混合请求，按接口统计吞吐量(请求/秒)和延迟百分位。也可用--url压测已启动的服务。
+"""
+import sys
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+import subprocess
+from collections import defaultdict
+import numpy as np
+import requests
+from loguru import logger
+
+# 添加项目目录到Python路径
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_DIR)
+
+from local_db import LocalDatabaseManager
+from synthetic_data import generate_draws, iter_rows
+
+# 请求类别 -> [(接口名, 方法, 路径模板, 查询参数)]，路径中的{id}替换为彩票类型ID
+WORKLOAD = {
+    'analysis': [
+        ('GET /analysis/frequency', 'GET', '/analysis/frequency/{id}', {'limit': (100, 500, 1000)}),
+        ('GET /analysis/hot_cold', 'GET', '/analysis/hot_cold/{id}', {'limit': (50, 200)}),
+        ('GET /analysis/sum_distribution', 'GET', '/analysis/sum_distribution/{id}', {'limit': (100, 500, 1000)})
+    ],
+    'prediction': [
+        ('POST /prediction/generate', 'POST', '/prediction/generate/{id}', {}),
+        ('POST /prediction/ensemble', 'POST', '/prediction/ensemble/{id}', {})
+    ],
+    'chart': [
+        ('GET /charts/frequency', 'GET', '/charts/frequency/{id}', {'format': ('png', 'svg')}),
+        ('GET /charts/sum_distribution', 'GET', '/charts/sum_distribution/{id}', {'format': ('png', 'svg')})
+    ],
+    'health': [
+        ('GET /health', 'GET', '/health', {})
+    ]
+}
+
+
+def seed_database(path: str, draws: int, seed: int) -> list:
+    """创建本地数据库并为每个彩种写入draws期合成开奖，返回彩票类型ID列表"""
+    db = LocalDatabaseManager(path)
+    try:
+        lottery_types = db.get_lottery_types()
+        for index, lottery_type in enumerate(lottery_types):
+            history = generate_draws(lottery_type['type_code'], draws, [seed, index])
+            db.insert_lottery_rows(iter_rows(lottery_type['id'], history))
+        return [lottery_type['id'] for lottery_type in lottery_types]
+    finally:
+        db.close()
+
+
+def start_server(workdir: str, db_path: str, port: int, log_file) -> subprocess.Popen:
+    """
+    用本地数据库替身启动服务进程，服务的输出写入log_file
+    工作目录为workdir，特征缓存、图表和日志都写在临时目录中，不影响项目目录
+    """
+    env = dict(os.environ, DB_BACKEND='sqlite', LOCAL_DB_PATH=db_path, SCHEDULER_ENABLED='false',
+               PYTHONPATH=PROJECT_DIR)
+    return subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1', '--port', str(port),
+         '--log-level', 'warning'],
+        cwd=workdir, env=env, stdout=log_file, stderr=subprocess.STDOUT
+    )
+
+
+def wait_ready(url: str, process: subprocess.Popen = None, timeout: float = 60) -> None:
+    """等待服务的健康检查接口可用"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"服务进程已退出，退出码{process.returncode}")
+        try:
+            if requests.get(f"{url}/health", timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"服务在{timeout}秒内未就绪: {url}")
+
+
+def parse_mix(mix: str) -> dict:
+    """解析请求类别权重，如analysis=50,prediction=20,chart=15,health=15"""
+    weights = {}
+    for item in mix.split(','):
+        category, _, weight = item.partition('=')
+        if category.strip() not in WORKLOAD:
+            raise ValueError(f"未知的请求类别: {category}")
+        weights[category.strip()] = float(weight)
+    return weights
+
+
+class LoadRunner:
+    """以固定并发数持续发送混合请求并记录每个请求的延迟"""
+
+    def __init__(self, url: str, lottery_type_ids: list, weights: dict, seed: int):
+        """初始化压测，weights为请求类别权重"""
+        self.url = url
+        self.lottery_type_ids = lottery_type_ids
+        self.categories = list(weights)
+        self.weights = [weights[category] for category in self.categories]
+        self.seed = seed
+        self.records = defaultdict(list)  # 接口名 -> [(延迟秒, 是否成功)]
+        self._lock = threading.Lock()
+
+    def _worker(self, worker_id: int, warmup_until: float, deadline: float) -> None:
+        """单个并发连接: 按权重随机选择接口，直到deadline"""
+        rng = random.Random(self.seed * 1000 + worker_id)
+        session = requests.Session()
+        records = defaultdict(list)
+        while True:
+            start = time.monotonic()
+            if start >= deadline:
+                break
+            category = rng.choices(self.categories, self.weights)[0]
+            name, method, path, params = rng.choice(WORKLOAD[category])
+            url = self.url + path.format(id=rng.choice(self.lottery_type_ids))
+            query = {key: rng.choice(values) for key, values in params.items()}
+            try:
+                response = session.request(method, url, params=query, timeout=60)
+                ok = response.status_code < 400
+            except requests.RequestException:
+                ok = False
+            if start >= warmup_until:
+                records[name].append((time.monotonic() - start, ok))
+        session.close()
+        with self._lock:
+            for name, values in records.items():
+                self.records[name].extend(values)
+
+    def run(self, concurrency: int, duration: float, warmup: float) -> float:
+        """运行压测，预热期内的请求不计入统计，返回计入统计的时长(秒)"""
+        now = time.monotonic()
+        warmup_until = now + warmup
+        deadline = warmup_until + duration
+        threads = [threading.Thread(target=self._worker, args=(worker_id, warmup_until, deadline))
+                   for worker_id in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.monotonic() - warmup_until
+
+    def report(self, elapsed: float) -> dict:
+        """按接口汇总吞吐量、失败数和延迟百分位(毫秒)"""
+        report = {}
+        all_records = []
+        for name in sorted(self.records):
+            all_records.extend(self.records[name])
+            report[name] = self._summarize(self.records[name], elapsed)
+        report['total'] = self._summarize(all_records, elapsed)
+        return report
+
+    @staticmethod
+    def _summarize(records: list, elapsed: float) -> dict:
+        """汇总一组请求记录"""
+        if not records:
+            return {'requests': 0, 'errors': 0, 'rps': 0.0}
+        latencies = np.array([latency for latency, _ in records]) * 1000
+        p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+        return {
+            'requests': len(records),
+            'errors': sum(1 for _, ok in records if not ok),
+            'rps': round(len(records) / elapsed, 2),
+            'p50_ms': round(float(p50), 2),
+            'p90_ms': round(float(p90), 2),
+            'p99_ms': round(float(p99), 2),
+            'max_ms': round(float(latencies.max()), 2)
+        }
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="服务压力测试")
+    parser.add_argument('--url', help='压测已启动的服务(如http://127.0.0.1:8000)，不启动本地服务')
+    parser.add_argument('--port', type=int, default=8765, help='本地服务端口')
+    parser.add_argument('--draws', type=int, default=5000, help='每个彩种的合成开奖期数')
+    parser.add_argument('--concurrency', type=int, default=8, help='并发连接数')
+    parser.add_argument('--duration', type=float, default=30, help='压测时长(秒)')
+    parser.add_argument('--warmup', type=float, default=3, help='预热时长(秒)，不计入统计')
+    parser.add_argument('--mix', default='analysis=50,prediction=20,chart=15,health=15', help='请求类别权重')
+    parser.add_argument('--seed', type=int, default=2024, help='随机种子')
+    parser.add_argument('--output', help='结果JSON文件路径')
+    args = parser.parse_args()
+
+    logger.remove()
+    weights = parse_mix(args.mix)
+    process = None
+    server_log = None
+    workdir = tempfile.TemporaryDirectory(prefix='lottery-load-')
+    try:
+        if args.url:
+            url = args.url.rstrip('/')
+            lottery_type_ids = [1, 2, 3]
+        else:
+            db_path = os.path.join(workdir.name, 'load_test.sqlite3')
+            print(f"🗄️ 写入合成数据: 每个彩种{args.draws}期")
+            lottery_type_ids = seed_database(db_path, args.draws, args.seed)
+            url = f"http://127.0.0.1:{args.port}"
+            server_log = open(os.path.join(workdir.name, 'server.log'), 'w+', encoding='utf-8')
+            process = start_server(workdir.name, db_path, args.port, server_log)
+            try:
+                wait_ready(url, process)
+            except RuntimeError:
+                server_log.seek(0)
+                print(server_log.read()[-3000:])
+                raise
+
+        print(f"🚀 压测{url}: 并发{args.concurrency}, 时长{args.duration}秒(预热{args.warmup}秒), 请求比例{args.mix}")
+        runner = LoadRunner(url, lottery_type_ids, weights, args.seed)
+        elapsed = runner.run(args.concurrency, args.duration, args.warmup)
+        report = runner.report(elapsed)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+        if server_log is not None:
+            server_log.close()
+        workdir.cleanup()
+
+    print(f"   {'接口':<32}{'请求数':>8}{'失败':>6}{'请求/秒':>10}{'P50':>10}{'P90':>10}{'P99':>10}")
+    for name, stats in report.items():
+        if stats['requests']:
+            print(f"   {name:<34}{stats['requests']:>8}{stats['errors']:>8}{stats['rps']:>10.1f}"
+                  f"{stats['p50_ms']:>10.1f}{stats['p90_ms']:>10.1f}{stats['p99_ms']:>10.1f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'url': url, 'concurrency': args.concurrency, 'duration': elapsed, 'mix': weights,
+                       'endpoints': report}, f, ensure_ascii=False, indent=2)
+        print(f"💾 结果已保存: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,399 @@
+"""
+图表渲染模块 - 彩票数据分析系统
+
+分析图表在进程池中用非交互的Agg后端渲染，渲染函数只接收分析结果，不访问数据库。
+支持PNG、SVG图片和Plotly JSON三种输出格式。
+渲染结果按(图表类型, 彩种, 期数窗口, 数据版本, 格式)缓存：最近使用的图表保存在内存中，
+同时写入大小受限的磁盘缓存目录，超出上限时淘汰最久未使用的文件；数据未变化时不重新渲染。
+matplotlib和plotly只在渲染进程第一次渲染时导入，接口进程本身不加载绘图库。
+"""
+import io
+import os
+import time
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, Future
+from typing import List, Dict, Any, Tuple, Optional
+from loguru import logger
+from config import CHART_CONFIG
+from metrics import CHART_RENDER_SECONDS, CHART_REQUESTS, CHART_RENDERS_IN_FLIGHT
+from response_cache import etag_matches
+
+# 图表类型 -> 默认期数窗口
+CHART_TYPES = {
+    'frequency': 50,
+    'hot_cold': 50,
+    'sum_distribution': 100
+}
+
+# 输出格式 -> 媒体类型
+CHART_FORMATS = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+    'json': 'application/json'
+}
+
+_fonts_ready = False
+
+
+def _setup_fonts() -> None:
+    """导入matplotlib并设置Agg后端和中文字体(每个进程一次)"""
+    global _fonts_ready
+    if not _fonts_ready:
+        import matplotlib
+        matplotlib.use('Agg')
+        matplotlib.rcParams['font.sans-serif'] = ['SimHei']
+        matplotlib.rcParams['axes.unicode_minus'] = False
+        _fonts_ready = True
+
+
+def _draw_frequency(ax, analysis: Dict[str, Any], limit: int) -> None:
+    """绘制号码出现频率柱状图"""
+    numbers, counts = zip(*analysis['frequency_data'][:20])  # 取前20个
+    bars = ax.bar(range(len(numbers)), counts, color='skyblue', alpha=0.7)
+    ax.set_xlabel('号码')
+    ax.set_ylabel('出现次数')
+    ax.set_title(f'号码出现频率分析 (最近{limit}期)')
+    ax.set_xticks(range(len(numbers)))
+    ax.set_xticklabels(numbers, rotation=45)
+
+    # 添加数值标签
+    for bar, count in zip(bars, counts):
+        ax.text(bar.get_x() + bar.get_width() / 2, bar.get_height() + 0.5,
+                str(count), ha='center', va='bottom')
+
+
+def _draw_hot_cold(ax, analysis: Dict[str, Any], limit: int) -> None:
+    """绘制号码冷热指数柱状图"""
+    numbers = [item[0] for item in analysis['hot_cold_data'][:20]]
+    indices = [item[1]['hot_cold_index'] for item in analysis['hot_cold_data'][:20]]
+    colors = ['red' if idx > 0.5 else 'blue' if idx < 0.3 else 'orange' for idx in indices]
+
+    ax.bar(range(len(numbers)), indices, color=colors, alpha=0.7)
+    ax.set_xlabel('号码')
+    ax.set_ylabel('冷热指数')
+    ax.set_title(f'号码冷热分析 (最近{limit}期)')
+    ax.set_xticks(range(len(numbers)))
+    ax.set_xticklabels(numbers, rotation=45)
+    ax.axhline(y=0.5, color='red', linestyle='--', alpha=0.5, label='热号分界线')
+    ax.axhline(y=0.3, color='blue', linestyle='--', alpha=0.5, label='冷号分界线')
+    ax.legend()
+
+
+def _draw_sum_distribution(ax, analysis: Dict[str, Any], limit: int) -> None:
+    """绘制和值分布直方图"""
+    total_sums = [item['total'] for item in analysis['sum_values']]
+    mean = analysis['sum_distribution']['mean']
+    ax.hist(total_sums, bins=20, color='lightgreen', alpha=0.7, edgecolor='black')
+    ax.set_xlabel('和值')
+    ax.set_ylabel('频次')
+    ax.set_title(f'和值分布分析 (最近{limit}期)')
+    ax.axvline(x=mean, color='red', linestyle='--', label=f'平均值: {mean}')
+    ax.legend()
+
+
+_DRAWERS = {
+    'frequency': _draw_frequency,
+    'hot_cold': _draw_hot_cold,
+    'sum_distribution': _draw_sum_distribution
+}
+
+
+def _plotly_figure(chart_type: str, analysis: Dict[str, Any], limit: int) -> Any:
+    """构建与matplotlib图表内容一致的Plotly图表"""
+    import plotly.graph_objects as go
+    figure = go.Figure()
+    if chart_type == 'frequency':
+        numbers, counts = zip(*analysis['frequency_data'][:20])
+        figure.add_bar(x=list(numbers), y=list(counts), text=list(counts), marker_color='skyblue')
+        figure.update_layout(title=f'号码出现频率分析 (最近{limit}期)', xaxis_title='号码', yaxis_title='出现次数')
+    elif chart_type == 'hot_cold':
+        numbers = [item[0] for item in analysis['hot_cold_data'][:20]]
+        indices = [item[1]['hot_cold_index'] for item in analysis['hot_cold_data'][:20]]
+        colors = ['red' if idx > 0.5 else 'blue' if idx < 0.3 else 'orange' for idx in indices]
+        figure.add_bar(x=numbers, y=indices, marker_color=colors)
+        figure.add_hline(y=0.5, line_dash='dash', line_color='red', annotation_text='热号分界线')
+        figure.add_hline(y=0.3, line_dash='dash', line_color='blue', annotation_text='冷号分界线')
+        figure.update_layout(title=f'号码冷热分析 (最近{limit}期)', xaxis_title='号码', yaxis_title='冷热指数')
+    elif chart_type == 'sum_distribution':
+        mean = analysis['sum_distribution']['mean']
+        figure.add_histogram(x=[item['total'] for item in analysis['sum_values']], nbinsx=20,
+                             marker_color='lightgreen')
+        figure.add_vline(x=mean, line_dash='dash', line_color='red', annotation_text=f'平均值: {mean}')
+        figure.update_layout(title=f'和值分布分析 (最近{limit}期)', xaxis_title='和值', yaxis_title='频次')
+    return figure
+
+
+def render_chart(chart_type: str, analysis: Dict[str, Any], limit: int, fmt: str = 'png',
+                 dpi: int = None) -> bytes:
+    """
+    把分析结果渲染为指定格式的字节内容
+    png/svg使用独立的Figure对象绘制，不依赖pyplot全局状态；json为Plotly图表JSON
+    """
+    if fmt == 'json':
+        return _plotly_figure(chart_type, analysis, limit).to_json().encode('utf-8')
+
+    _setup_fonts()
+    from matplotlib.figure import Figure
+    figure = Figure(figsize=(12, 6))
+    _DRAWERS[chart_type](figure.subplots(), analysis, limit)
+    figure.tight_layout()
+
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format=fmt, dpi=dpi or CHART_CONFIG['dpi'], bbox_inches='tight')
+    return buffer.getvalue()
+
+
+def _render_task(chart_type: str, analysis: Dict[str, Any], limit: int, fmt: str, dpi: int,
+                 path: str) -> bytes:
+    """进程任务: 渲染图表并写入磁盘缓存(先写临时文件再替换)，返回图表内容"""
+    content = render_chart(chart_type, analysis, limit, fmt, dpi)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(content)
+    os.replace(temp_path, path)
+    return content
+
+
+def chart_has_data(chart_type: str, analysis: Dict[str, Any]) -> bool:
+    """分析结果中是否有可绘制的数据"""
+    key = {'frequency': 'frequency_data', 'hot_cold': 'hot_cold_data', 'sum_distribution': 'sum_values'}[chart_type]
+    return bool(analysis and analysis.get(key))
+
+
+class ChartRenderer:
+    """图表渲染器: 进程池渲染 + 按数据版本缓存(内存 + 大小受限的磁盘目录)"""
+
+    def __init__(self, analyzer, cache_dir: str = None, workers: int = None):
+        """初始化渲染器，analyzer为LotteryDataAnalyzer实例(用于分析和查询数据库)"""
+        self.analyzer = analyzer
+        self.db = analyzer.db
+        self.cache_dir = cache_dir or CHART_CONFIG['cache_dir']
+        self.workers = workers or CHART_CONFIG['workers'] or os.cpu_count() or 1
+        self.dpi = CHART_CONFIG['dpi']
+        self.max_cache_bytes = CHART_CONFIG['max_cache_bytes']
+        self.max_memory_bytes = CHART_CONFIG['max_memory_bytes']
+        self._memory = OrderedDict()  # 缓存文件路径 -> 图表内容，按最近使用排序
+        self._memory_bytes = 0
+        self._executor = None
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        """按需创建的渲染进程池"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def cache_path(self, chart_type: str, game: str, limit: int, version: str, fmt: str = 'png') -> str:
+        """缓存文件路径: 由图表类型、彩种、期数窗口、数据版本和格式决定"""
+        return os.path.join(self.cache_dir, f"{chart_type}_{game}_{limit}_{version}.{fmt}")
+
+    @staticmethod
+    def etag(path: str) -> str:
+        """由缓存键生成强ETag(相同的键对应相同的图表内容)"""
+        return '"' + hashlib.sha1(os.path.basename(path).encode('utf-8')).hexdigest()[:20] + '"'
+
+    def _game_code(self, lottery_type_id: int) -> str:
+        """彩票类型ID对应的彩种代码"""
+        for lottery_type in self.db.get_lottery_types():
+            if lottery_type['id'] == lottery_type_id:
+                return lottery_type['type_code']
+        raise ValueError("彩票类型不存在")
+
+    def _analyze(self, chart_type: str, lottery_type_id: int, limit: int,
+                 results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """在已加载的开奖数据上运行图表对应的分析"""
+        if chart_type == 'frequency':
+            return self.analyzer.analyze_frequency_trends(lottery_type_id, limit, results)
+        elif chart_type == 'hot_cold':
+            return self.analyzer.analyze_hot_cold_numbers(lottery_type_id, limit, results)
+        elif chart_type == 'sum_distribution':
+            return self.analyzer.analyze_sum_distribution(lottery_type_id, limit, results)
+        raise ValueError(f"未知的图表类型: {chart_type}")
+
+    def _is_cached(self, path: str) -> bool:
+        """图表是否已在内存或磁盘缓存中"""
+        with self._lock:
+            if path in self._memory:
+                return True
+        return os.path.exists(path)
+
+    def submit(self, lottery_type_id: int, charts: List[Tuple[str, int]], fmt: str = 'png',
+               if_none_match: str = None, version: str = None) -> List[Dict[str, Any]]:
+        """
+        提交一个彩种的多张图表: 只查询一次数据库(按最大窗口)，缓存命中的图表不再渲染
+        if_none_match与图表ETag相同时标记为not_modified，不渲染也不读取缓存；
+        version为调用方已取得的数据版本，未指定时查询数据库
+        返回每张图表的任务信息，未命中缓存的带future
+        """
+        if fmt not in CHART_FORMATS:
+            raise ValueError(f"未知的图表格式: {fmt}")
+        for chart_type, _ in charts:
+            if chart_type not in CHART_TYPES:
+                raise ValueError(f"未知的图表类型: {chart_type}")
+
+        game = self._game_code(lottery_type_id)
+        version = version or self.db.get_data_version(lottery_type_id)
+        results = None
+
+        jobs = []
+        for chart_type, limit in charts:
+            path = self.cache_path(chart_type, game, limit, version, fmt)
+            job = {'chart_type': chart_type, 'lottery_type_id': lottery_type_id, 'game': game,
+                   'limit': limit, 'version': version, 'format': fmt, 'path': path, 'etag': self.etag(path)}
+            jobs.append(job)
+            if etag_matches(if_none_match, job['etag']):
+                job['not_modified'] = True
+                CHART_REQUESTS.inc(chart_type=chart_type, result='not_modified')
+                continue
+            if self._is_cached(path):
+                job['cached'] = True
+                CHART_REQUESTS.inc(chart_type=chart_type, result='cached')
+                continue
+
+            if results is None:
+                results = self.db.get_lottery_results(lottery_type_id, max(limit for _, limit in charts))
+            analysis = self._analyze(chart_type, lottery_type_id, limit, results)
+            if not chart_has_data(chart_type, analysis):
+                job['error'] = "没有可绘制的数据"
+                CHART_REQUESTS.inc(chart_type=chart_type, result='no_data')
+                continue
+
+            job['cached'] = False
+            job['future'] = self.executor.submit(_render_task, chart_type, analysis, limit, fmt, self.dpi, path)
+            CHART_REQUESTS.inc(chart_type=chart_type, result='rendered')
+            CHART_RENDERS_IN_FLIGHT.inc()
+            job['future'].add_done_callback(self._render_done(chart_type, fmt))
+        return jobs
+
+    @staticmethod
+    def _render_done(chart_type: str, fmt: str):
+        """渲染完成回调: 记录从提交到完成的耗时"""
+        submitted = time.perf_counter()
+        
+        def callback(_future: Future) -> None:
+            CHART_RENDER_SECONDS.observe(time.perf_counter() - submitted, chart_type=chart_type, format=fmt)
+            CHART_RENDERS_IN_FLIGHT.dec()
+        return callback
+    
+    def render(self, lottery_type_id: int, chart_type: str, limit: int = None) -> str:
+        """渲染单张PNG图表并返回缓存文件路径(阻塞等待)"""
+        job = self.submit(lottery_type_id, [(chart_type, limit or CHART_TYPES.get(chart_type))])[0]
+        self._content(job)
+        return job['path']
+
+    async def get_chart(self, lottery_type_id: int, chart_type: str, limit: int = None, fmt: str = 'png',
+                        if_none_match: str = None, version: str = None) -> Tuple[Optional[bytes], str]:
+        """
+        异步获取图表内容和ETag: 查询数据库、分析和读取缓存文件在线程中执行，
+        等待渲染进程时不阻塞事件循环；客户端的If-None-Match命中时内容为None
+        """
+        charts = [(chart_type, limit or CHART_TYPES.get(chart_type))]
+        job = (await asyncio.to_thread(self.submit, lottery_type_id, charts, fmt, if_none_match, version))[0]
+        if job.get('not_modified'):
+            return None, job['etag']
+        if 'future' in job:
+            await asyncio.wrap_future(job['future'])
+        return await asyncio.to_thread(self._content, job), job['etag']
+
+    def render_all(self, lottery_type_ids: List[int] = None) -> Dict[str, Any]:
+        """渲染所有彩种的全部图表(夜间任务)，所有彩种的渲染任务同时在进程池中执行"""
+        started = time.perf_counter()
+        if lottery_type_ids is None:
+            lottery_type_ids = [lottery_type['id'] for lottery_type in self.db.get_lottery_types()]
+
+        jobs = []
+        for lottery_type_id in lottery_type_ids:
+            try:
+                jobs.extend(self.submit(lottery_type_id, list(CHART_TYPES.items())))
+            except Exception as e:
+                logger.error(f"彩票类型{lottery_type_id}图表任务提交失败: {e}")
+
+        report = []
+        for job in jobs:
+            try:
+                self._content(job)
+            except Exception as e:
+                job['error'] = str(e)
+            report.append({key: value for key, value in job.items() if key != 'future'})
+
+        rendered = sum(1 for job in report if job.get('cached') is False and 'error' not in job)
+        cached = sum(1 for job in report if job.get('cached'))
+        seconds = round(time.perf_counter() - started, 4)
+        logger.info(f"图表渲染完成: 渲染{rendered}张, 复用缓存{cached}张, 耗时{seconds}秒")
+        return {'charts': report, 'rendered': rendered, 'cached': cached, 'seconds': seconds}
+
+    def _content(self, job: Dict[str, Any], retry: bool = True) -> bytes:
+        """
+        等待渲染完成并返回图表内容，依次查找内存缓存和磁盘缓存
+        提交时命中的缓存文件在读取前被淘汰时重新提交渲染
+        """
+        if 'error' in job:
+            raise ValueError(job['error'])
+
+        path = job['path']
+        future: Future = job.get('future')
+        if future is not None:
+            content = future.result()
+            self._enforce_disk_limit()
+        else:
+            with self._lock:
+                content = self._memory.get(path)
+                if content is not None:
+                    self._memory.move_to_end(path)
+                    return content
+            try:
+                with open(path, 'rb') as f:
+                    content = f.read()
+                os.utime(path)  # 更新修改时间，磁盘缓存按最近使用淘汰
+            except FileNotFoundError:
+                if not retry:
+                    raise
+                logger.info(f"图表缓存文件已被淘汰，重新渲染: {os.path.basename(path)}")
+                job.update(self.submit(job['lottery_type_id'], [(job['chart_type'], job['limit'])],
+                                       job['format'], version=job['version'])[0])
+                return self._content(job, retry=False)
+
+        self._remember(path, content)
+        return content
+
+    def _remember(self, path: str, content: bytes) -> None:
+        """放入内存缓存，超出上限时淘汰最久未使用的图表"""
+        with self._lock:
+            if path in self._memory:
+                return
+            self._memory[path] = content
+            self._memory_bytes += len(content)
+            while self._memory_bytes > self.max_memory_bytes and len(self._memory) > 1:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+
+    def _enforce_disk_limit(self) -> None:
+        """磁盘缓存超出上限时按修改时间删除最旧的图表文件"""
+        try:
+            entries = []
+            for entry in os.scandir(self.cache_dir):
+                if entry.is_file() and entry.name.rsplit('.', 1)[-1] in CHART_FORMATS:
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_cache_bytes:
+                    break
+                os.remove(path)
+                total -= size
+        except OSError as e:
+            logger.warning(f"图表缓存清理失败: {e}")
+
+    def close(self):
+        """关闭渲染进程池"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
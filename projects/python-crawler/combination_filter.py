@@ -0,0 +1,274 @@
+"""
+组合过滤模块 - 彩票数据分析系统
+
+分块枚举彩种的全部号码组合，按和值、奇偶、跨度、连号、排除号码等条件做向量化过滤。
+组合以number_encoding中的打包uint64表示，整个组合空间不会一次性展开到内存中：
+选号个数最多的号码区(如大乐透前区)的组合表作为内层只生成一次，
+其余号码区的组合作为外层逐个与内层组合拼接，按块分发到多个进程。
+"""
+import os
+import itertools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from math import comb
+from typing import List, Dict, Any, Iterator, Tuple
+from loguru import logger
+from config import COMBINATION_CONFIG
+from number_encoding import ZONE_LAYOUT, GAME_ZONES, format_number, pack_zone, unpack_matrices
+
+
+# 单个号码区支持的过滤条件: 区间条件为[最小值, 最大值]
+ZONE_RANGE_KEYS = ('sum', 'odd', 'span')
+# 跨号码区的过滤条件
+CROSS_RANGE_KEYS = ('total_sum', 'total_odd')
+
+
+@lru_cache(maxsize=None)
+def zone_combinations(game: str, zone_name: str) -> np.ndarray:
+    """按字典序生成某号码区的全部组合(组合数, 选号个数)，每个进程只生成一次"""
+    zone = next(z for z in ZONE_LAYOUT[game] if z['name'] == zone_name)
+    count = comb(zone['width'], zone['picks'])
+    flat = np.fromiter(
+        itertools.chain.from_iterable(itertools.combinations(range(zone['low'], zone['high'] + 1), zone['picks'])),
+        dtype=np.int16, count=count * zone['picks'])
+    return flat.reshape(count, zone['picks'])
+
+
+def max_consecutive(matrix: np.ndarray) -> np.ndarray:
+    """计算每个升序组合中最长连号的长度"""
+    best = np.ones(len(matrix), dtype=np.int16)
+    current = np.ones(len(matrix), dtype=np.int16)
+    for column in range(1, matrix.shape[1]):
+        current = np.where(matrix[:, column] - matrix[:, column - 1] == 1, current + 1, 1)
+        np.maximum(best, current, out=best)
+    return best
+
+
+def zone_features(game: str, zone_name: str, matrix: np.ndarray) -> Dict[str, np.ndarray]:
+    """计算某号码区组合的过滤特征"""
+    return {
+        'bits': pack_zone(game, zone_name, matrix),
+        'sum': matrix.sum(axis=1, dtype=np.int32),
+        'odd': (matrix & 1).sum(axis=1, dtype=np.int16),
+        'span': (matrix[:, -1] - matrix[:, 0]).astype(np.int16),
+        'max_consecutive': max_consecutive(matrix)
+    }
+
+
+def _numbers_to_bits(game: str, zone_name: str, numbers: List[Any]) -> np.uint64:
+    """把号码列表(字符串或整数)转换为该号码区的位掩码"""
+    if not numbers:
+        return np.uint64(0)
+    return pack_zone(game, zone_name, np.array([[int(num) for num in numbers]]))[0]
+
+
+def zone_filter_mask(game: str, zone_name: str, features: Dict[str, np.ndarray],
+                     constraints: Dict[str, Any]) -> np.ndarray:
+    """按单个号码区的过滤条件计算组合掩码"""
+    mask = np.ones(len(features['bits']), dtype=bool)
+    if not constraints:
+        return mask
+
+    for key in ZONE_RANGE_KEYS:
+        if key in constraints:
+            low, high = constraints[key]
+            mask &= (features[key] >= low) & (features[key] <= high)
+
+    if 'max_consecutive' in constraints:
+        mask &= features['max_consecutive'] <= constraints['max_consecutive']
+
+    exclude_bits = _numbers_to_bits(game, zone_name, constraints.get('exclude'))
+    if exclude_bits:
+        mask &= (features['bits'] & exclude_bits) == 0
+
+    include_bits = _numbers_to_bits(game, zone_name, constraints.get('include'))
+    if include_bits:
+        mask &= (features['bits'] & include_bits) == include_bits
+
+    return mask
+
+
+def _split_zones(game: str) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """选出组合数最多的号码区作为内层，其余作为外层"""
+    layout = ZONE_LAYOUT[game]
+    inner = max(layout, key=lambda zone: comb(zone['width'], zone['picks']))
+    return inner, [zone for zone in layout if zone is not inner]
+
+
+def _outer_combinations(game: str, constraints: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    """生成外层号码区(笛卡尔积)中通过各自过滤条件的组合特征"""
+    _, outer_zones = _split_zones(game)
+
+    per_zone = []
+    for zone in outer_zones:
+        features = zone_features(game, zone['name'], zone_combinations(game, zone['name']))
+        mask = zone_filter_mask(game, zone['name'], features, constraints.get(zone['name']))
+        per_zone.append({key: value[mask] for key, value in features.items()})
+
+    outer = {'bits': np.zeros(1, dtype=np.uint64),
+             'sum': np.zeros(1, dtype=np.int32),
+             'odd': np.zeros(1, dtype=np.int16)}
+    for features in per_zone:
+        left = np.repeat(np.arange(len(outer['bits'])), len(features['bits']))
+        right = np.tile(np.arange(len(features['bits'])), len(outer['bits']))
+        outer = {
+            'bits': outer['bits'][left] | features['bits'][right],
+            'sum': outer['sum'][left] + features['sum'][right],
+            'odd': outer['odd'][left] + features['odd'][right]
+        }
+    return outer
+
+
+def _filter_task(game: str, constraints: Dict[str, Any], outer: Dict[str, np.ndarray],
+                 count_only: bool) -> Any:
+    """
+    进程任务: 内层组合与一块外层组合拼接后按条件过滤
+    count_only为True时只返回通过的注数，否则返回打包彩票数组
+    """
+    inner_zone, _ = _split_zones(game)
+    features = zone_features(game, inner_zone['name'], zone_combinations(game, inner_zone['name']))
+    mask = zone_filter_mask(game, inner_zone['name'], features, constraints.get(inner_zone['name']))
+    inner = {key: value[mask] for key, value in features.items()}
+
+    total = 0
+    pieces = []
+    for index in range(len(outer['bits'])):
+        cross = np.ones(len(inner['bits']), dtype=bool)
+        if 'total_sum' in constraints:
+            low, high = constraints['total_sum']
+            total_sum = inner['sum'] + outer['sum'][index]
+            cross &= (total_sum >= low) & (total_sum <= high)
+        if 'total_odd' in constraints:
+            low, high = constraints['total_odd']
+            total_odd = inner['odd'] + outer['odd'][index]
+            cross &= (total_odd >= low) & (total_odd <= high)
+
+        if count_only:
+            total += int(np.count_nonzero(cross))
+        else:
+            pieces.append(inner['bits'][cross] | outer['bits'][index])
+
+    if count_only:
+        return total
+    return np.concatenate(pieces) if pieces else np.empty(0, dtype=np.uint64)
+
+
+class CombinationFilter:
+    """组合枚举与条件过滤引擎"""
+
+    def __init__(self, game: str, constraints: Dict[str, Any] = None, workers: int = None):
+        """
+        初始化过滤引擎
+        constraints示例(大乐透):
+        {
+            'front': {'sum': [60, 120], 'odd': [2, 3], 'span': [15, 34],
+                      'max_consecutive': 2, 'exclude': ['01', '07'], 'include': []},
+            'back': {'sum': [5, 20]},
+            'total_sum': [70, 140],
+            'total_odd': [2, 5]
+        }
+        """
+        if game not in GAME_ZONES:
+            raise ValueError(f"未知的彩票类型: {game}")
+
+        self.game = game
+        self.constraints = constraints or {}
+        self.workers = workers or COMBINATION_CONFIG['workers'] or os.cpu_count() or 1
+        self.chunk_size = COMBINATION_CONFIG['chunk_size']
+
+        unknown = set(self.constraints) - {zone['name'] for zone in ZONE_LAYOUT[game]} - set(CROSS_RANGE_KEYS)
+        if unknown:
+            raise ValueError(f"未知的过滤条件: {', '.join(sorted(unknown))}")
+
+    def space_size(self) -> int:
+        """组合空间总注数"""
+        size = 1
+        for zone in ZONE_LAYOUT[self.game]:
+            size *= comb(zone['width'], zone['picks'])
+        return size
+
+    def count(self) -> int:
+        """统计满足条件的注数"""
+        return sum(self._run(count_only=True))
+
+    def iter_tickets(self) -> Iterator[np.ndarray]:
+        """分批输出满足条件的打包彩票，每批不超过chunk_size注"""
+        for tickets in self._run(count_only=False):
+            for start in range(0, len(tickets), self.chunk_size):
+                yield tickets[start:start + self.chunk_size]
+
+    def _tasks(self) -> List[Dict[str, np.ndarray]]:
+        """把外层组合切分为任务块"""
+        outer = _outer_combinations(self.game, self.constraints)
+        task_count = max(1, min(len(outer['bits']), self.workers * COMBINATION_CONFIG['tasks_per_worker']))
+        bounds = np.linspace(0, len(outer['bits']), task_count + 1).astype(int)
+        return [{key: value[start:end] for key, value in outer.items()}
+                for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+    def _run(self, count_only: bool) -> Iterator[Any]:
+        """按任务块执行过滤，多进程时限制在途任务数以控制内存"""
+        tasks = self._tasks()
+
+        if self.workers == 1:
+            for outer in tasks:
+                yield _filter_task(self.game, self.constraints, outer, count_only)
+            return
+
+        logger.info(f"组合过滤开始: {self.game}, {len(tasks)}个任务块, {self.workers}个进程")
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            pending = []
+            for outer in tasks:
+                pending.append(executor.submit(_filter_task, self.game, self.constraints, outer, count_only))
+                if len(pending) >= self.workers * 2:
+                    yield pending.pop(0).result()
+            for future in pending:
+                yield future.result()
+
+
+def cold_numbers(game: str, features: Dict[str, np.ndarray], count: int) -> Dict[str, List[str]]:
+    """
+    按号码区取冷热指数最低的count个号码，用作排除条件
+    features为特征存储中按时间升序的特征矩阵，冷热指数与冷热号码分析相同:
+    出现频率 × 0.7 + 1 / (1 + 当前遗漏期数) × 0.3；每区最多排除到只剩选号个数
+    """
+    cold = {}
+    for zone in ZONE_LAYOUT[game]:
+        size = min(max(count, 0), zone['width'] - zone['picks'])
+        if size == 0:
+            cold[zone['name']] = []
+            continue
+        frequency = features[f"{zone['name']}_onehot"].mean(axis=0)
+        gaps = features[f"{zone['name']}_gaps"][-1]
+        index = frequency * 0.7 + 0.3 / (1 + gaps)
+        coldest = np.argsort(index, kind='stable')[:size]
+        cold[zone['name']] = [format_number(game, int(offset) + zone['low']) for offset in sorted(coldest)]
+    return cold
+
+
+def format_ticket_lines(game: str, tickets: np.ndarray) -> bytes:
+    """
+    把打包彩票批量格式化为文本行(与兑奖引擎的输入格式一致)
+    大乐透/双色球: "01 05 12 23 35 + 03 08"，福彩3D: "123"
+    """
+    if len(tickets) == 0:
+        return b''
+
+    matrices = unpack_matrices(game, tickets)
+    count = len(tickets)
+    space = np.full(count, ord(' '), dtype=np.uint8)
+    columns = []
+    for index, zone in enumerate(ZONE_LAYOUT[game]):
+        matrix = matrices[zone['name']]
+        if game == 'FC3D':
+            columns.append((matrix[:, 0] + ord('0')).astype(np.uint8))
+            continue
+        if index > 0:
+            columns.extend([space, np.full(count, ord('+'), dtype=np.uint8), space])
+        for column in range(matrix.shape[1]):
+            if column > 0:
+                columns.append(space)
+            columns.append((matrix[:, column] // 10 + ord('0')).astype(np.uint8))
+            columns.append((matrix[:, column] % 10 + ord('0')).astype(np.uint8))
+    columns.append(np.full(count, ord('\n'), dtype=np.uint8))
+    return np.column_stack(columns).tobytes()
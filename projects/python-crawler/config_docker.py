@@ -13,11 +13,26 @@ DATABASE_CONFIG = {
     'charset': 'utf8mb4'
 }
 
+# 本地数据库替身(SQLite)，用于压力测试和没有MySQL的开发环境
+LOCAL_DB_CONFIG = {
+    'enabled': os.getenv('DB_BACKEND', 'mysql').lower() == 'sqlite',  # DB_BACKEND=sqlite时启用
+    'path': os.getenv('LOCAL_DB_PATH', 'cache/local_db.sqlite3')     # SQLite数据库文件
+}
+
 # 爬虫配置
 CRAWLER_CONFIG = {
     'request_delay': int(os.getenv('REQUEST_DELAY', 2)),
     'max_retries': int(os.getenv('MAX_RETRIES', 3)),
     'timeout': int(os.getenv('TIMEOUT', 30)),
+    'connect_timeout': int(os.getenv('CONNECT_TIMEOUT', 5)),  # 连接超时时间(秒)
+    'backoff_base': float(os.getenv('BACKOFF_BASE', 0.5)),    # 重试退避基数(秒)
+    'backoff_max': float(os.getenv('BACKOFF_MAX', 30)),       # 单次重试最长等待(秒)，含Retry-After
+    'breaker_failures': int(os.getenv('BREAKER_FAILURES', 5)),  # 数据源连续失败该次数后熔断
+    'breaker_reset': int(os.getenv('BREAKER_RESET', 60)),       # 熔断后经过该秒数放行试探请求
+    'checkpoint_file': 'cache/crawl_checkpoint.json',  # 历史页爬取进度文件
+    'simulate': os.getenv('CRAWLER_SIMULATE', 'true').lower() == 'true',  # 使用模拟数据，不请求数据源
+    'pages': int(os.getenv('CRAWLER_PAGES', 10)),
+    'parser_backend': os.getenv('PARSER_BACKEND', 'lxml'),  # 页面解析后端: lxml或bs4
     'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
 }
 
@@ -40,6 +55,25 @@ DATA_SOURCES = {
     }
 }
 
+# 数据源录制回放配置
+REPLAY_CONFIG = {
+    'enabled': os.getenv('CRAWLER_REPLAY', 'false').lower() == 'true',  # 爬虫请求改发到回放服务器
+    'record': os.getenv('CRAWLER_RECORD', 'false').lower() == 'true',   # 把数据源的真实响应写入样本库
+    'base_url': os.getenv('REPLAY_BASE_URL', 'http://127.0.0.1:8808'),
+    'fixture_dir': 'cache/fixtures',   # 样本库目录
+    'latency': float(os.getenv('REPLAY_LATENCY', 0.05)),       # 平均响应延迟(秒)
+    'jitter': 0.5,                     # 延迟随机浮动比例
+    'error_rate': float(os.getenv('REPLAY_ERROR_RATE', 0))     # 返回503的概率
+}
+
+# 爬虫HTTP缓存配置
+HTTP_CACHE_CONFIG = {
+    'enabled': os.getenv('CRAWLER_CACHE', 'true').lower() == 'true',  # 缓存数据源响应并发条件请求
+    'cache_dir': 'cache/http',         # 缓存目录
+    'max_bytes': int(os.getenv('CRAWLER_CACHE_MAX_BYTES', 256 * 1024 * 1024)),  # 缓存总大小上限(字节)
+    'settled_days': 7                  # 开奖日期早于该天数的开奖视为已结算，只含已结算开奖的页面永久缓存
+}
+
 # 预测模型配置
 MODEL_CONFIG = {
     'frequency_model': {
@@ -78,6 +112,114 @@ SERVICE_CONFIG = {
 
 # 定时任务配置
 SCHEDULER_CONFIG = {
+    'enabled': os.getenv('SCHEDULER_ENABLED', 'true').lower() == 'true',  # 多个进程部署时只在一个进程中启用
     'daily_crawl_time': os.getenv('DAILY_CRAWL_TIME', '09:00'),
-    'daily_analysis_time': os.getenv('DAILY_ANALYSIS_TIME', '21:00')
+    'daily_analysis_time': os.getenv('DAILY_ANALYSIS_TIME', '21:00'),
+    'jitter': int(os.getenv('SCHEDULER_JITTER', 300)),  # 执行时间随机推迟的最大秒数
+    'workers': 2,                      # 执行定时任务的线程数
+    'check_interval': 60,              # 调度循环最长休眠时间(秒)
+    'state_file': 'cache/scheduler_state.json'  # 最近执行时间记录
+}
+
+# 奖级配置(一、二等奖为浮动奖，金额为估算值)
+PRIZE_CONFIG = {
+    'ticket_price': 2,  # 单注价格(元)
+    'check_chunk_size': 1000000,  # 批量兑奖每批注数
+    'DLT': {1: 10000000, 2: 200000, 3: 10000, 4: 3000, 5: 300, 6: 200, 7: 100, 8: 15, 9: 5},
+    'SSQ': {1: 5000000, 2: 150000, 3: 3000, 4: 200, 5: 10, 6: 5},
+    'FC3D': {1: 1040, 2: 346, 3: 173}  # 直选、组选3、组选6
+}
+
+# 组合过滤配置
+COMBINATION_CONFIG = {
+    'workers': int(os.getenv('COMBINATION_WORKERS', 0)) or None,  # 进程数，None为CPU核数
+    'tasks_per_worker': 4,    # 每个进程分配的任务块数
+    'chunk_size': 1000000,    # 流式输出每批注数
+    'cold_window': 50         # 排除冷号时统计的最近开奖期数
+}
+
+# 蒙特卡洛策略模拟配置
+SIMULATION_CONFIG = {
+    'workers': int(os.getenv('SIMULATION_WORKERS', 0)) or None,  # 进程数，None为CPU核数
+    'block_size': 100000,     # 每个任务块模拟的彩票注数(每期多注时每块期数相应减少)
+    'seed': 20240101,         # 默认随机种子
+    'hot_pool_ratio': 0.4,    # 热号策略候选池占号码区的比例
+    'max_draws': 10000000,    # 单次请求最多模拟的开奖期数
+    'max_tickets_per_draw': 100  # 每期最多投注数
+}
+
+# 特征存储配置
+FEATURE_STORE_CONFIG = {
+    'cache_dir': os.getenv('FEATURE_CACHE_DIR', 'cache/features'),  # 内存映射缓存目录
+    'rolling_window': 10,           # 滚动频率窗口(期)
+    'max_extend_rows': 10           # 增量追加的最大期数，超过则整体重建
+}
+
+# 预测服务配置
+PREDICTION_CONFIG = {
+    'history_limit': int(os.getenv('PREDICTION_HISTORY_LIMIT', 100)),  # 训练使用的历史期数
+    'workers': int(os.getenv('PREDICTION_WORKERS', 0)) or None,  # 并行训练的线程数，None为按模型数
+    'evaluation_window': 30,  # 集成权重参考最近多少期评估
+    'min_weight': 0.05,       # 单个模型的最小权重
+    'predict_after_crawl': os.getenv('PREDICT_AFTER_CRAWL', 'true').lower() == 'true'  # 爬取完成后自动批量预测
+}
+
+# 模型调参配置
+TUNING_CONFIG = {
+    'workers': int(os.getenv('TUNING_WORKERS', 0)) or None,  # 进程数，None为CPU核数
+    'history_limit': 500,     # 回测使用的历史期数
+    'test_draws': 50,         # 滚动回测的期数
+    'min_train_draws': 30,    # 回测时最少的训练期数
+    'random_samples': 20,     # 随机搜索抽取的参数组数
+    'max_samples': 200,       # 单次请求最多评估的参数组数(网格搜索的组合数和随机搜索的抽取数)
+    'seed': 20240101,         # 随机搜索的随机种子
+    'search_spaces': {
+        'FREQUENCY': {
+            'window_size': [10, 20, 30, 50, 80, 100, 150, 200],
+            'weight_factor': [0.8]
+        }
+    }
+}
+
+# 图表渲染配置
+CHART_CONFIG = {
+    'cache_dir': os.getenv('CHART_CACHE_DIR', 'charts'),  # 图表缓存目录
+    'workers': int(os.getenv('CHART_WORKERS', 0)) or None,  # 渲染进程数，None为CPU核数
+    'dpi': 150,               # 图片分辨率
+    'max_cache_bytes': 200 * 1024 * 1024,  # 磁盘缓存目录上限
+    'max_memory_bytes': 32 * 1024 * 1024,  # 内存缓存上限
+    'max_age': 3600           # 响应的Cache-Control有效期(秒)
+}
+
+# 响应缓存配置
+CACHE_CONFIG = {
+    'paths': ('/analysis/',),  # 缓存的接口路径前缀(图表由chart_renderer按数据版本缓存并生成ETag)
+    'coalesce_paths': ('/prediction/generate/', '/prediction/ensemble/'),  # 合并并发请求的POST接口
+    'ttl': int(os.getenv('RESPONSE_CACHE_TTL', 600)),  # 响应缓存有效期(秒)
+    'version_ttl': 30,        # 数据版本缓存有效期(秒)
+    'max_entries': 1024       # 最多缓存的响应数
+}
+
+# 监控指标配置
+METRICS_CONFIG = {
+    'enabled': os.getenv('METRICS_ENABLED', 'true').lower() == 'true',  # 关闭后各处记录指标直接返回
+    'buckets': (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)  # 耗时直方图桶上限(秒)
+}
+
+# 性能剖析配置
+PROFILING_CONFIG = {
+    'enabled': os.getenv('PROFILING_ENABLED', 'false').lower() == 'true',  # 未启用时不注册剖析钩子
+    'token': os.getenv('PROFILING_TOKEN', ''),          # 非空时请求须携带相同的X-Profile-Token
+    'dir': 'cache/profiles',           # 剖析结果目录
+    'min_interval': int(os.getenv('PROFILING_MIN_INTERVAL', 60)),  # 两次剖析的最小间隔(秒)
+    'sample_interval': 0.005,          # 采样间隔(秒)
+    'max_seconds': 120,                # 单次采样的最长时间(秒)
+    'max_files': 20                    # 保留的剖析结果数
+}
+
+# 链路追踪配置
+TRACING_CONFIG = {
+    'enabled': os.getenv('TRACING_ENABLED', 'true').lower() == 'true',
+    'file': 'logs/traces.jsonl',       # 区间记录(每行一个JSON)
+    'max_bytes': 50 * 1024 * 1024      # 超过后轮转为.1文件
 }
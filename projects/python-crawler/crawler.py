@@ -5,23 +5,191 @@ import requests
 import time
 import re
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
-from bs4 import BeautifulSoup
+from typing import List, Dict, Any, Optional, Tuple
 from loguru import logger
-from config import CRAWLER_CONFIG, DATA_SOURCES
-from database import DatabaseManager
+from config import CRAWLER_CONFIG, DATA_SOURCES, REPLAY_CONFIG, HTTP_CACHE_CONFIG
+from database import DatabaseManager, create_database
+from feature_store import get_feature_store
+from http_cache import HttpCache
+from number_encoding import detect_game
+from prediction_service import PredictionService
+from metrics import CRAWLER_FETCH_SECONDS, CRAWLER_FETCHES, CRAWLER_PARSE_SECONDS, CRAWLER_CRAWL_SECONDS, CRAWLER_RETRIES
+from parsers import ParserFactory
+from replay_server import FixtureStore, fixture_key, replay_url
+from resilience import CrawlCheckpoint, get_circuit_breaker, retry_delay
+from tracing import span, traced
 
 
 class LotteryCrawler:
     """彩票数据爬虫"""
     
-    def __init__(self):
-        """初始化爬虫"""
+    def __init__(self, db: DatabaseManager = None):
+        """初始化爬虫，未指定db时按配置创建数据库连接"""
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': CRAWLER_CONFIG['user_agent']
         })
-        self.db = DatabaseManager()
+        self.db = db or create_database()
+        self.fixtures = FixtureStore() if REPLAY_CONFIG['record'] else None
+        self.cache = HttpCache() if HTTP_CACHE_CONFIG['enabled'] else None
+        self.checkpoint = CrawlCheckpoint()
+    
+    @staticmethod
+    def _request_url(source: str, url: str, params: Dict[str, Any] = None) -> str:
+        """实际请求的完整地址(启用回放时为回放服务器上的地址)，也是HTTP缓存的键"""
+        if REPLAY_CONFIG['enabled']:
+            url = replay_url(source, url)
+        return requests.Request('GET', url, params=params).prepare().url
+    
+    def fetch_page(self, source: str, url: str, params: Dict[str, Any] = None) -> str:
+        """请求数据源页面并返回页面内容"""
+        return self.fetch_cached(source, url, params)[0]
+    
+    def fetch_cached(self, source: str, url: str, params: Dict[str, Any] = None,
+                     use_pinned: bool = False) -> Tuple[str, bool]:
+        """
+        请求数据源页面，返回(页面内容, 是否与缓存的内容相同)
+        启用HTTP缓存时带条件请求头，数据源返回304时使用缓存内容；use_pinned为True时永久缓存的页面直接返回不发请求
+        连接失败、超时、429和5xx按指数退避重试max_retries次(遵循Retry-After)；
+        数据源熔断期间直接抛出CircuitOpenError，不再等待超时
+        """
+        url = self._request_url(source, url, params)
+        entry = self.cache.get(url) if self.cache is not None else None
+        if use_pinned and entry is not None and entry['permanent']:
+            CRAWLER_FETCHES.inc(source=source, status='cached')
+            return entry['body'], True
+        
+        breaker = get_circuit_breaker(source)
+        for attempt in range(CRAWLER_CONFIG['max_retries'] + 1):
+            breaker.before_request()
+            try:
+                body = self._fetch(source, url, entry)
+            except requests.RequestException as e:
+                response = e.response
+                if response is not None and response.status_code != 429 and response.status_code < 500:
+                    breaker.record_success()  # 数据源正常响应，只是页面不可用，不重试
+                    raise
+                breaker.record_failure()
+                if attempt == CRAWLER_CONFIG['max_retries']:
+                    raise
+                reason = str(response.status_code) if response is not None else type(e).__name__
+                delay = retry_delay(attempt + 1, response.headers.get('Retry-After') if response is not None else None)
+                CRAWLER_RETRIES.inc(source=source, reason=reason)
+                logger.warning(f"{source}请求失败({reason})，{delay:.1f}秒后第{attempt + 1}次重试: {url}")
+                time.sleep(delay)
+            else:
+                breaker.record_success()
+                return body, entry is not None and body == entry['body']
+    
+    def _fetch(self, source: str, url: str, entry: Optional[Dict[str, Any]]) -> str:
+        """
+        请求一次页面，记录请求耗时和响应状态
+        启用回放时url已改写为回放服务器上的地址，启用录制时把成功的响应写入样本库
+        """
+        status = 'error'
+        with span('http_fetch', source=source, url=url) as fetch_span:
+            try:
+                with CRAWLER_FETCH_SECONDS.time(source=source):
+                    response = self.session.get(url, headers=HttpCache.conditional_headers(entry),
+                                                timeout=(CRAWLER_CONFIG['connect_timeout'], CRAWLER_CONFIG['timeout']))
+                status = str(response.status_code)
+                if response.status_code == 304 and entry is not None:
+                    return entry['body']
+                response.raise_for_status()
+                fetch_span.set('bytes', len(response.content))
+                if self.fixtures is not None:
+                    self.fixtures.put(fixture_key(source, response.url), response.text, response.status_code,
+                                      response.headers.get('Content-Type', 'text/html'))
+                if self.cache is not None:
+                    # 内容未变的永久缓存页面保持永久
+                    self.cache.put(url, response.text, response.headers,
+                                   permanent=entry is not None and entry['permanent'] and entry['body'] == response.text)
+                return response.text
+            finally:
+                fetch_span.set('status', status)
+                CRAWLER_FETCHES.inc(source=source, status=status)
+    
+    def settle_page(self, source: str, url: str, params: Dict[str, Any], rows: List[Dict[str, Any]]) -> None:
+        """
+        页面中的开奖都已结算(早于HTTP_CACHE_CONFIG['settled_days']天)时，把该页标记为永久缓存
+        只在本次爬取也请求了前一页时调用，第1页不标记(新开奖总是出现在第1页)
+        """
+        if self.cache is None or not rows:
+            return
+        cutoff = (datetime.now() - timedelta(days=HTTP_CACHE_CONFIG['settled_days'])).strftime('%Y-%m-%d')
+        if all(row['draw_date'] < cutoff for row in rows):
+            url = self._request_url(source, url, params)
+            entry = self.cache.get(url)
+            if entry is not None:
+                self.cache.pin(url, entry)
+    
+    def crawl_history(self, game: str, pages: int = None) -> List[Dict[str, Any]]:
+        """
+        按页请求数据源的历史开奖页并解析，某页没有开奖记录时停止
+        某页重试后仍请求失败时返回已爬取的开奖并记录进度；下次仍从第1页开始补齐新开奖，
+        读到上次的最新期号后跳到中断的页继续回填(新开奖把旧开奖推后了几页，回填的页数也相应增加)；
+        完整爬取后清除进度
+        """
+        source = DATA_SOURCES[game]
+        parser = ParserFactory.create_parser(source['parser'])
+        resume = self.checkpoint.get(game)  # 还没有跳到中断的页时为上次的进度
+        if resume:
+            logger.info(f"开始爬取{source['name']}数据，补齐新开奖后从上次中断的第{resume['page']}页继续")
+        else:
+            logger.info(f"开始爬取{source['name']}数据")
+        results = []
+        last_page = pages or CRAWLER_CONFIG['pages']
+        latest = None  # 本次第1页的最新期号
+        page, previous = 1, 0  # previous: 本次请求的上一页
+        unchanged = False  # 本次请求的上一页与缓存的内容相同，分页没有移动
+        
+        try:
+            while page <= last_page:
+                with span('crawl_page', game=game, page=page) as page_span:
+                    try:
+                        # 上一页没有变化时该页也没有变化，可以直接使用永久缓存
+                        html, unchanged = self.fetch_cached(game, source['url'], {'page': page},
+                                                            use_pinned=unchanged and previous == page - 1)
+                    except requests.HTTPError as e:
+                        if e.response is None or e.response.status_code != 404:
+                            raise
+                        html, unchanged = '', False  # 页面不存在，历史页已到末尾
+                    with CRAWLER_PARSE_SECONDS.time(source=game):
+                        rows = parser.parse(html)
+                    page_span.set('rows', len(rows))
+                if not rows:
+                    break
+                if latest is None:
+                    latest, page_rows = rows[0]['draw_number'], len(rows)
+                if page > 1 and previous == page - 1:
+                    self.settle_page(game, source['url'], {'page': page}, rows)
+                results.extend(rows)
+                logger.info(f"{source['name']}第{page}页数据爬取完成")
+                previous, page = page, page + 1
+                
+                shifted = next((index for index, row in enumerate(results) if row['draw_number'] == resume['latest']),
+                               None) if resume else None
+                if shifted is not None:
+                    # 新开奖已补齐，上次已读到的页不再请求；旧开奖被推后了shifted期，回填的页数相应增加
+                    last_page += -(-shifted // page_rows)
+                    page = max(page, resume['page'])
+                    resume = None
+                
+                if CRAWLER_CONFIG['request_delay']:
+                    time.sleep(CRAWLER_CONFIG['request_delay'])
+        
+        except requests.RequestException as e:
+            if resume:
+                logger.error(f"{source['name']}第{page}页爬取失败，保留上次的进度: {e}")
+            elif latest is not None:
+                logger.error(f"{source['name']}第{page}页爬取失败，已保存进度，下次从该页继续回填: {e}")
+                self.checkpoint.update(game, page, latest)
+            else:
+                logger.error(f"{source['name']}第{page}页爬取失败: {e}")
+        else:
+            self.checkpoint.clear(game)
+        
+        return results
     
     def crawl_dlt_data(self, pages: int = 10) -> List[Dict[str, Any]]:
         """
@@ -34,27 +202,30 @@ class LotteryCrawler:
         try:
             # 这里使用模拟数据，实际项目中需要根据真实网站调整
             for page in range(1, pages + 1):
-                # 模拟数据生成
-                for i in range(10):  # 每页10条记录
-                    draw_number = f"{(page-1)*10 + i + 1:04d}"
-                    draw_date = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
-                    
-                    # 生成模拟开奖号码
-                    front_numbers = sorted([f"{n:02d}" for n in np.random.choice(range(1, 36), 5, replace=False)])
-                    back_numbers = sorted([f"{n:02d}" for n in np.random.choice(range(1, 13), 2, replace=False)])
+                with span('crawl_page', game='DLT', page=page) as page_span:
+                    page_start = len(results)
+                    # 模拟数据生成
+                    for i in range(10):  # 每页10条记录
+                        draw_number = f"{(page-1)*10 + i + 1:04d}"
+                        draw_date = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
+                        
+                        # 生成模拟开奖号码
+                        front_numbers = sorted([f"{n:02d}" for n in np.random.choice(range(1, 36), 5, replace=False)])
+                        back_numbers = sorted([f"{n:02d}" for n in np.random.choice(range(1, 13), 2, replace=False)])
+                        
+                        result = {
+                            'draw_number': draw_number,
+                            'draw_date': draw_date,
+                            'numbers': {
+                                'front': front_numbers,
+                                'back': back_numbers
+                            },
+                            'sales_amount': round(np.random.uniform(1000000, 5000000), 2),
+                            'prize_pool': round(np.random.uniform(10000000, 100000000), 2)
+                        }
+                        results.append(result)
+                    page_span.set('rows', len(results) - page_start)
                     
-                    result = {
-                        'draw_number': draw_number,
-                        'draw_date': draw_date,
-                        'numbers': {
-                            'front': front_numbers,
-                            'back': back_numbers
-                        },
-                        'sales_amount': round(np.random.uniform(1000000, 5000000), 2),
-                        'prize_pool': round(np.random.uniform(10000000, 100000000), 2)
-                    }
-                    results.append(result)
-                
                 time.sleep(CRAWLER_CONFIG['request_delay'])
                 logger.info(f"大乐透第{page}页数据爬取完成")
         
@@ -73,27 +244,30 @@ class LotteryCrawler:
         
         try:
             for page in range(1, pages + 1):
-                for i in range(10):
-                    draw_number = f"{(page-1)*10 + i + 1:04d}"
-                    draw_date = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
+                with span('crawl_page', game='FC3D', page=page) as page_span:
+                    page_start = len(results)
+                    for i in range(10):
+                        draw_number = f"{(page-1)*10 + i + 1:04d}"
+                        draw_date = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
+                        
+                        # 生成模拟开奖号码
+                        number = f"{np.random.randint(0, 1000):03d}"
+                        
+                        result = {
+                            'draw_number': draw_number,
+                            'draw_date': draw_date,
+                            'numbers': {
+                                'main': number,
+                                'hundred': int(number[0]),
+                                'ten': int(number[1]),
+                                'unit': int(number[2])
+                            },
+                            'sales_amount': round(np.random.uniform(500000, 2000000), 2),
+                            'prize_pool': round(np.random.uniform(5000000, 50000000), 2)
+                        }
+                        results.append(result)
+                    page_span.set('rows', len(results) - page_start)
                     
-                    # 生成模拟开奖号码
-                    number = f"{np.random.randint(0, 1000):03d}"
-                    
-                    result = {
-                        'draw_number': draw_number,
-                        'draw_date': draw_date,
-                        'numbers': {
-                            'main': number,
-                            'hundred': int(number[0]),
-                            'ten': int(number[1]),
-                            'unit': int(number[2])
-                        },
-                        'sales_amount': round(np.random.uniform(500000, 2000000), 2),
-                        'prize_pool': round(np.random.uniform(5000000, 50000000), 2)
-                    }
-                    results.append(result)
-                
                 time.sleep(CRAWLER_CONFIG['request_delay'])
                 logger.info(f"福彩3D第{page}页数据爬取完成")
         
@@ -112,26 +286,29 @@ class LotteryCrawler:
         
         try:
             for page in range(1, pages + 1):
-                for i in range(10):
-                    draw_number = f"{(page-1)*10 + i + 1:04d}"
-                    draw_date = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
-                    
-                    # 生成模拟开奖号码
-                    red_numbers = sorted([f"{n:02d}" for n in np.random.choice(range(1, 34), 6, replace=False)])
-                    blue_number = f"{np.random.randint(1, 17):02d}"
+                with span('crawl_page', game='SSQ', page=page) as page_span:
+                    page_start = len(results)
+                    for i in range(10):
+                        draw_number = f"{(page-1)*10 + i + 1:04d}"
+                        draw_date = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
+                        
+                        # 生成模拟开奖号码
+                        red_numbers = sorted([f"{n:02d}" for n in np.random.choice(range(1, 34), 6, replace=False)])
+                        blue_number = f"{np.random.randint(1, 17):02d}"
+                        
+                        result = {
+                            'draw_number': draw_number,
+                            'draw_date': draw_date,
+                            'numbers': {
+                                'red': red_numbers,
+                                'blue': blue_number
+                            },
+                            'sales_amount': round(np.random.uniform(800000, 4000000), 2),
+                            'prize_pool': round(np.random.uniform(15000000, 150000000), 2)
+                        }
+                        results.append(result)
+                    page_span.set('rows', len(results) - page_start)
                     
-                    result = {
-                        'draw_number': draw_number,
-                        'draw_date': draw_date,
-                        'numbers': {
-                            'red': red_numbers,
-                            'blue': blue_number
-                        },
-                        'sales_amount': round(np.random.uniform(800000, 4000000), 2),
-                        'prize_pool': round(np.random.uniform(15000000, 150000000), 2)
-                    }
-                    results.append(result)
-                
                 time.sleep(CRAWLER_CONFIG['request_delay'])
                 logger.info(f"双色球第{page}页数据爬取完成")
         
@@ -143,49 +320,76 @@ class LotteryCrawler:
     def save_to_database(self, lottery_type_id: int, results: List[Dict[str, Any]]) -> int:
         """保存数据到数据库"""
         success_count = 0
+        saved_results = []
         
-        for result in results:
-            try:
-                success = self.db.insert_lottery_result(
-                    lottery_type_id=lottery_type_id,
-                    draw_number=result['draw_number'],
-                    draw_date=result['draw_date'],
-                    numbers=result['numbers'],
-                    sales_amount=result.get('sales_amount'),
-                    prize_pool=result.get('prize_pool')
-                )
-                if success:
-                    success_count += 1
-            except Exception as e:
-                logger.error(f"保存数据失败: {e}")
+        with span('save_results', lottery_type_id=lottery_type_id, rows=len(results)) as save_span:
+            for result in results:
+                try:
+                    success = self.db.insert_lottery_result(
+                        lottery_type_id=lottery_type_id,
+                        draw_number=result['draw_number'],
+                        draw_date=result['draw_date'],
+                        numbers=result['numbers'],
+                        sales_amount=result.get('sales_amount'),
+                        prize_pool=result.get('prize_pool')
+                    )
+                    if success:
+                        success_count += 1
+                        saved_results.append(result)
+                except Exception as e:
+                    logger.error(f"保存数据失败: {e}")
+            save_span.set('saved', success_count)
         
         logger.info(f"数据保存完成，成功保存{success_count}条记录")
+        self.update_features(saved_results)
+        if saved_results:
+            self.evaluate_predictions(lottery_type_id)
         return success_count
     
+    def update_features(self, results: List[Dict[str, Any]]):
+        """把新开奖数据按期号顺序追加到特征存储"""
+        if not results:
+            return
+        
+        try:
+            game = detect_game(results[0]['numbers'])
+            with span('update_features', game=game, rows=len(results)):
+                feature_store = get_feature_store()
+                for result in sorted(results, key=lambda x: x['draw_number']):
+                    feature_store.append_draw(game, result)
+        except Exception as e:
+            logger.error(f"特征存储更新失败: {e}")
+    
+    def evaluate_predictions(self, lottery_type_id: int):
+        """新开奖数据入库后评估已开奖的预测"""
+        try:
+            with span('evaluate_predictions', lottery_type_id=lottery_type_id) as evaluate_span:
+                report = PredictionService(self.db).evaluate_pending(lottery_type_id)
+                evaluate_span.set('evaluated', report['evaluated'])
+        except Exception as e:
+            logger.error(f"预测评估失败: {e}")
+    
+    @traced('crawl_all_data')
     def crawl_all_data(self) -> Dict[str, int]:
         """爬取所有彩票类型的数据"""
         logger.info("开始爬取所有彩票数据")
         
         # 获取彩票类型
         lottery_types = self.db.get_lottery_types()
+        simulated = {'DLT': self.crawl_dlt_data, 'FC3D': self.crawl_fc3d_data, 'SSQ': self.crawl_ssq_data}
         results = {}
         
         for lottery_type in lottery_types:
             try:
-                if lottery_type['type_code'] == 'DLT':
-                    data = self.crawl_dlt_data()
-                    success_count = self.save_to_database(lottery_type['id'], data)
-                    results['DLT'] = success_count
-                
-                elif lottery_type['type_code'] == 'FC3D':
-                    data = self.crawl_fc3d_data()
-                    success_count = self.save_to_database(lottery_type['id'], data)
-                    results['FC3D'] = success_count
-                
-                elif lottery_type['type_code'] == 'SSQ':
-                    data = self.crawl_ssq_data()
-                    success_count = self.save_to_database(lottery_type['id'], data)
-                    results['SSQ'] = success_count
+                with span('crawl_source', game=lottery_type['type_code']) as source_span:
+                    started = time.perf_counter()
+                    type_code = lottery_type['type_code']
+                    if type_code in simulated:
+                        # 未接入真实数据源前使用模拟数据，关闭simulate后请求数据源(或回放服务器)
+                        data = simulated[type_code]() if CRAWLER_CONFIG['simulate'] else self.crawl_history(type_code)
+                        results[type_code] = self.save_to_database(lottery_type['id'], data)
+                    source_span.set('saved', results.get(type_code, 0))
+                CRAWLER_CRAWL_SECONDS.observe(time.perf_counter() - started, source=lottery_type['type_code'])
                 
                 logger.info(f"{lottery_type['type_name']}数据爬取完成，保存{results.get(lottery_type['type_code'], 0)}条")
                 
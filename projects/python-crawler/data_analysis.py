@@ -2,30 +2,35 @@
 数据分析模块 - 彩票数据分析系统
 """
 import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import plotly.graph_objects as go
-import plotly.express as px
+from collections import Counter
 from typing import List, Dict, Any, Tuple
 from datetime import datetime, timedelta
 from loguru import logger
-from database import DatabaseManager
+from database import DatabaseManager, create_database
+from metrics import ANALYSIS_SECONDS, timed
 
 
 class LotteryDataAnalyzer:
     """彩票数据分析器"""
     
-    def __init__(self):
-        """初始化分析器"""
-        self.db = DatabaseManager()
-        plt.rcParams['font.sans-serif'] = ['SimHei']  # 设置中文字体
-        plt.rcParams['axes.unicode_minus'] = False
+    def __init__(self, db: DatabaseManager = None):
+        """初始化分析器，未指定db时按配置创建数据库连接"""
+        self.db = db or create_database()
+        self._chart_renderer = None
     
-    def analyze_frequency_trends(self, lottery_type_id: int, limit: int = 100) -> Dict[str, Any]:
+    def _load_results(self, lottery_type_id: int, limit: int,
+                      results: List[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """获取分析用的开奖数据，已传入results(最新一期在前)时直接截取，不再查询数据库"""
+        if results is None:
+            return self.db.get_lottery_results(lottery_type_id, limit)
+        return results[:limit]
+    
+    @timed(ANALYSIS_SECONDS, kernel='frequency')
+    def analyze_frequency_trends(self, lottery_type_id: int, limit: int = 100,
+                                 results: List[Dict[str, Any]] = None) -> Dict[str, Any]:
         """分析号码频率趋势"""
         try:
-            results = self.db.get_lottery_results(lottery_type_id, limit)
+            results = self._load_results(lottery_type_id, limit, results)
             if not results:
                 return {}
             
@@ -62,10 +67,12 @@ class LotteryDataAnalyzer:
             logger.error(f"频率趋势分析失败: {e}")
             return {}
     
-    def analyze_hot_cold_numbers(self, lottery_type_id: int, limit: int = 50) -> Dict[str, Any]:
+    @timed(ANALYSIS_SECONDS, kernel='hot_cold')
+    def analyze_hot_cold_numbers(self, lottery_type_id: int, limit: int = 50,
+                                 results: List[Dict[str, Any]] = None) -> Dict[str, Any]:
         """分析冷热号码"""
         try:
-            results = self.db.get_lottery_results(lottery_type_id, limit)
+            results = self._load_results(lottery_type_id, limit, results)
             if not results:
                 return {}
             
@@ -115,10 +122,12 @@ class LotteryDataAnalyzer:
             logger.error(f"冷热号码分析失败: {e}")
             return {}
     
-    def analyze_sum_distribution(self, lottery_type_id: int, limit: int = 100) -> Dict[str, Any]:
+    @timed(ANALYSIS_SECONDS, kernel='sum_distribution')
+    def analyze_sum_distribution(self, lottery_type_id: int, limit: int = 100,
+                                 results: List[Dict[str, Any]] = None) -> Dict[str, Any]:
         """分析和值分布"""
         try:
-            results = self.db.get_lottery_results(lottery_type_id, limit)
+            results = self._load_results(lottery_type_id, limit, results)
             if not results:
                 return {}
             
@@ -149,7 +158,7 @@ class LotteryDataAnalyzer:
                     'mean': round(np.mean(total_sums), 2),
                     'median': round(np.median(total_sums), 2),
                     'std': round(np.std(total_sums), 2),
-                    'distribution': pd.Series(total_sums).value_counts().to_dict()
+                    'distribution': dict(Counter(total_sums).most_common())
                 }
                 
                 return {
@@ -165,10 +174,12 @@ class LotteryDataAnalyzer:
             logger.error(f"和值分布分析失败: {e}")
             return {}
     
-    def analyze_odd_even_distribution(self, lottery_type_id: int, limit: int = 100) -> Dict[str, Any]:
+    @timed(ANALYSIS_SECONDS, kernel='odd_even')
+    def analyze_odd_even_distribution(self, lottery_type_id: int, limit: int = 100,
+                                      results: List[Dict[str, Any]] = None) -> Dict[str, Any]:
         """分析奇偶分布"""
         try:
-            results = self.db.get_lottery_results(lottery_type_id, limit)
+            results = self._load_results(lottery_type_id, limit, results)
             if not results:
                 return {}
             
@@ -222,7 +233,7 @@ class LotteryDataAnalyzer:
                 for key in odd_even_stats[0].keys():
                     values = [item[key] for item in odd_even_stats]
                     distribution[key] = {
-                        'counts': pd.Series(values).value_counts().to_dict(),
+                        'counts': dict(Counter(values).most_common()),
                         'mean': round(np.mean(values), 2)
                     }
                 
@@ -239,112 +250,42 @@ class LotteryDataAnalyzer:
             logger.error(f"奇偶分布分析失败: {e}")
             return {}
     
+    @property
+    def chart_renderer(self):
+        """图表渲染器(按需创建，渲染在进程池中进行)"""
+        if self._chart_renderer is None:
+            from chart_renderer import ChartRenderer
+            self._chart_renderer = ChartRenderer(self)
+        return self._chart_renderer
+    
     def generate_frequency_chart(self, lottery_type_id: int, limit: int = 50) -> str:
-        """生成频率分析图表"""
+        """生成频率分析图表，返回缓存文件路径"""
         try:
-            frequency_data = self.analyze_frequency_trends(lottery_type_id, limit)
-            if not frequency_data:
-                return ""
-            
-            # 创建图表
-            numbers, counts = zip(*frequency_data['frequency_data'][:20])  # 取前20个
-            
-            plt.figure(figsize=(12, 6))
-            bars = plt.bar(range(len(numbers)), counts, color='skyblue', alpha=0.7)
-            plt.xlabel('号码')
-            plt.ylabel('出现次数')
-            plt.title(f'号码出现频率分析 (最近{limit}期)')
-            plt.xticks(range(len(numbers)), numbers, rotation=45)
-            
-            # 添加数值标签
-            for bar, count in zip(bars, counts):
-                plt.text(bar.get_x() + bar.get_width()/2, bar.get_height() + 0.5,
-                        str(count), ha='center', va='bottom')
-            
-            plt.tight_layout()
-            
-            # 保存图表
-            filename = f"frequency_chart_{lottery_type_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-            plt.savefig(filename, dpi=300, bbox_inches='tight')
-            plt.close()
-            
-            return filename
-            
+            return self.chart_renderer.render(lottery_type_id, 'frequency', limit)
         except Exception as e:
             logger.error(f"生成频率图表失败: {e}")
             return ""
     
     def generate_hot_cold_chart(self, lottery_type_id: int, limit: int = 50) -> str:
-        """生成冷热号码图表"""
+        """生成冷热号码图表，返回缓存文件路径"""
         try:
-            hot_cold_data = self.analyze_hot_cold_numbers(lottery_type_id, limit)
-            if not hot_cold_data:
-                return ""
-            
-            # 创建图表
-            numbers = [item[0] for item in hot_cold_data['hot_cold_data'][:20]]
-            indices = [item[1]['hot_cold_index'] for item in hot_cold_data['hot_cold_data'][:20]]
-            
-            plt.figure(figsize=(12, 6))
-            colors = ['red' if idx > 0.5 else 'blue' if idx < 0.3 else 'orange' 
-                     for idx in indices]
-            
-            bars = plt.bar(range(len(numbers)), indices, color=colors, alpha=0.7)
-            plt.xlabel('号码')
-            plt.ylabel('冷热指数')
-            plt.title(f'号码冷热分析 (最近{limit}期)')
-            plt.xticks(range(len(numbers)), numbers, rotation=45)
-            plt.axhline(y=0.5, color='red', linestyle='--', alpha=0.5, label='热号分界线')
-            plt.axhline(y=0.3, color='blue', linestyle='--', alpha=0.5, label='冷号分界线')
-            plt.legend()
-            
-            plt.tight_layout()
-            
-            # 保存图表
-            filename = f"hot_cold_chart_{lottery_type_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-            plt.savefig(filename, dpi=300, bbox_inches='tight')
-            plt.close()
-            
-            return filename
-            
+            return self.chart_renderer.render(lottery_type_id, 'hot_cold', limit)
         except Exception as e:
             logger.error(f"生成冷热号码图表失败: {e}")
             return ""
     
     def generate_sum_distribution_chart(self, lottery_type_id: int, limit: int = 100) -> str:
-        """生成和值分布图表"""
+        """生成和值分布图表，返回缓存文件路径"""
         try:
-            sum_data = self.analyze_sum_distribution(lottery_type_id, limit)
-            if not sum_data:
-                return ""
-            
-            # 创建图表
-            total_sums = [item['total'] for item in sum_data['sum_values']]
-            
-            plt.figure(figsize=(12, 6))
-            plt.hist(total_sums, bins=20, color='lightgreen', alpha=0.7, edgecolor='black')
-            plt.xlabel('和值')
-            plt.ylabel('频次')
-            plt.title(f'和值分布分析 (最近{limit}期)')
-            plt.axvline(x=sum_data['sum_distribution']['mean'], color='red', 
-                       linestyle='--', label=f'平均值: {sum_data["sum_distribution"]["mean"]}')
-            plt.legend()
-            
-            plt.tight_layout()
-            
-            # 保存图表
-            filename = f"sum_distribution_chart_{lottery_type_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-            plt.savefig(filename, dpi=300, bbox_inches='tight')
-            plt.close()
-            
-            return filename
-            
+            return self.chart_renderer.render(lottery_type_id, 'sum_distribution', limit)
         except Exception as e:
             logger.error(f"生成和值分布图表失败: {e}")
             return ""
     
     def close(self):
         """关闭分析器"""
+        if self._chart_renderer is not None:
+            self._chart_renderer.close()
         self.db.close()
     
     def __enter__(self):
@@ -2,10 +2,21 @@
 数据库操作模块 - 彩票数据分析系统
 """
 import json
+import time
+import weakref
+import threading
 import pymysql
-from typing import List, Dict, Any, Optional
+from contextlib import contextmanager
+from itertools import islice
+from typing import List, Dict, Any, Optional, Iterable
 from loguru import logger
-from config import DATABASE_CONFIG
+from config import DATABASE_CONFIG, LOCAL_DB_CONFIG
+from metrics import DB_STATEMENT_SECONDS, DB_ERRORS, DB_LOCK_WAIT_SECONDS, DB_IN_FLIGHT, DB_CONNECTIONS, \
+    statement_label
+from tracing import span
+
+# 进程内的全部数据库管理器，用于统计已打开的连接数
+_managers = weakref.WeakSet()
 
 
 class DatabaseManager:
@@ -14,6 +25,8 @@ class DatabaseManager:
     def __init__(self):
         """初始化数据库连接"""
         self.connection = None
+        self._lock = threading.RLock()  # 连接在线程间共享，同一时刻只执行一条语句
+        _managers.add(self)
         self.connect()
     
     def connect(self):
@@ -25,36 +38,76 @@ class DatabaseManager:
             logger.error(f"数据库连接失败: {e}")
             raise
     
+    @contextmanager
+    def _statement(self, method: str, query: str):
+        """独占共享连接执行一条语句，记录等待连接和执行的耗时"""
+        statement = statement_label(query)
+        DB_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            with self._lock:
+                DB_LOCK_WAIT_SECONDS.observe(time.perf_counter() - start)
+                yield
+        except Exception:
+            DB_ERRORS.inc(method=method, statement=statement)
+            raise
+        finally:
+            DB_STATEMENT_SECONDS.observe(time.perf_counter() - start, method=method, statement=statement)
+            DB_IN_FLIGHT.dec()
+    
     def execute_query(self, query: str, params: tuple = None) -> List[Dict[str, Any]]:
         """执行查询语句"""
-        try:
-            if not self.connection or not self.connection.open:
-                self.connect()
+        with self._statement('execute_query', query):
+            try:
+                if not self.connection or not self.connection.open:
+                    self.connect()
             
-            with self.connection.cursor(pymysql.cursors.DictCursor) as cursor:
-                cursor.execute(query, params)
-                result = cursor.fetchall()
-                return result
-        except Exception as e:
-            logger.error(f"查询执行失败: {e}")
-            self.connect()  # 重新连接
-            raise
+                with self.connection.cursor(pymysql.cursors.DictCursor) as cursor:
+                    cursor.execute(query, params)
+                    result = cursor.fetchall()
+                    return result
+            except Exception as e:
+                logger.error(f"查询执行失败: {e}")
+                self.connect()  # 重新连接
+                raise
     
     def execute_update(self, query: str, params: tuple = None) -> int:
         """执行更新语句"""
-        try:
-            if not self.connection or not self.connection.open:
-                self.connect()
+        with self._statement('execute_update', query):
+            try:
+                if not self.connection or not self.connection.open:
+                    self.connect()
             
-            with self.connection.cursor() as cursor:
-                affected_rows = cursor.execute(query, params)
-                self.connection.commit()
-                return affected_rows
-        except Exception as e:
-            logger.error(f"更新执行失败: {e}")
-            self.connection.rollback()
-            self.connect()  # 重新连接
-            raise
+                with self.connection.cursor() as cursor:
+                    affected_rows = cursor.execute(query, params)
+                    self.connection.commit()
+                    return affected_rows
+            except Exception as e:
+                logger.error(f"更新执行失败: {e}")
+                self.connection.rollback()
+                self.connect()  # 重新连接
+                raise
+    
+    def execute_many(self, query: str, params_list: List[tuple]) -> int:
+        """批量执行同一更新语句，全部成功后一次提交"""
+        if not params_list:
+            return 0
+            
+        with span('db_batch', statement=statement_label(query), rows=len(params_list)), \
+                self._statement('execute_many', query):
+            try:
+                if not self.connection or not self.connection.open:
+                    self.connect()
+            
+                with self.connection.cursor() as cursor:
+                    affected_rows = cursor.executemany(query, params_list)
+                    self.connection.commit()
+                    return affected_rows
+            except Exception as e:
+                logger.error(f"批量更新执行失败: {e}")
+                self.connection.rollback()
+                self.connect()  # 重新连接
+                raise
     
     def insert_lottery_result(self, lottery_type_id: int, draw_number: str, 
                             draw_date: str, numbers: Dict[str, Any], 
@@ -80,6 +133,45 @@ class DatabaseManager:
             logger.error(f"开奖结果插入失败: {e}")
             return False
     
+    def insert_lottery_results(self, lottery_type_id: int, results: List[Dict[str, Any]],
+                               batch_size: int = 10000) -> int:
+        """
+        批量插入开奖结果，已存在的期号更新号码和金额
+        每batch_size条一个事务，返回影响的行数
+        """
+        rows = [(lottery_type_id, result['draw_number'], result['draw_date'],
+                 json.dumps(result['numbers'], ensure_ascii=False),
+                 result.get('sales_amount'), result.get('prize_pool'))
+                for result in results]
+        return self.insert_lottery_rows(rows, batch_size)
+    
+    def insert_lottery_rows(self, rows: Iterable[tuple], batch_size: int = 10000) -> int:
+        """
+        批量写入已序列化的开奖行(彩票类型ID, 期号, 开奖日期, 号码JSON, 销售额, 奖池)
+        rows可以是生成器，按batch_size分批取出写入，返回影响的行数
+        """
+        query = """
+        INSERT INTO lottery_results 
+        (lottery_type_id, draw_number, draw_date, numbers, sales_amount, prize_pool)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+        numbers = VALUES(numbers),
+        sales_amount = VALUES(sales_amount),
+        prize_pool = VALUES(prize_pool)
+        """
+        
+        affected_rows = 0
+        count = 0
+        rows = iter(rows)
+        while True:
+            params_list = list(islice(rows, batch_size))
+            if not params_list:
+                break
+            affected_rows += self.execute_many(query, params_list)
+            count += len(params_list)
+        logger.info(f"批量插入开奖结果成功: {count}条")
+        return affected_rows
+    
     def get_lottery_results(self, lottery_type_id: int, limit: int = 100) -> List[Dict[str, Any]]:
         """获取开奖结果"""
         query = """
@@ -100,6 +192,48 @@ class DatabaseManager:
             logger.error(f"获取开奖结果失败: {e}")
             return []
     
+    def get_lottery_results_by_draw_numbers(self, lottery_type_id: int,
+                                            draw_numbers: List[str]) -> List[Dict[str, Any]]:
+        """按期号获取开奖结果"""
+        if not draw_numbers:
+            return []
+        
+        placeholders = ', '.join(['%s'] * len(draw_numbers))
+        query = f"""
+        SELECT * FROM lottery_results
+        WHERE lottery_type_id = %s AND draw_number IN ({placeholders})
+        ORDER BY draw_date DESC
+        """
+        
+        try:
+            results = self.execute_query(query, (lottery_type_id, *draw_numbers))
+            for result in results:
+                if result.get('numbers'):
+                    result['numbers'] = json.loads(result['numbers'])
+            return results
+        except Exception as e:
+            logger.error(f"按期号获取开奖结果失败: {e}")
+            return []
+    
+    def get_data_version(self, lottery_type_id: int) -> str:
+        """
+        获取某彩种开奖数据的版本号: 期数-最新期号-号码校验和
+        新增开奖或更新已有开奖号码后版本号都会变化，用于缓存失效
+        """
+        query = """
+        SELECT COUNT(*) AS draws, MAX(draw_number) AS latest,
+               COALESCE(SUM(CRC32(numbers)), 0) AS checksum
+        FROM lottery_results
+        WHERE lottery_type_id = %s
+        """
+        
+        try:
+            result = self.execute_query(query, (lottery_type_id,))[0]
+            return f"{result['draws']}-{result['latest'] or 0}-{int(result['checksum']) & 0xffffffff:08x}"
+        except Exception as e:
+            logger.error(f"获取数据版本失败: {e}")
+            raise
+    
     def get_lottery_types(self) -> List[Dict[str, Any]]:
         """获取彩票类型列表"""
         query = "SELECT * FROM lottery_types"
@@ -130,6 +264,43 @@ class DatabaseManager:
             logger.error(f"预测结果插入失败: {e}")
             return False
     
+    def insert_predictions(self, predictions: List[Dict[str, Any]]) -> int:
+        """
+        批量插入预测结果(单个事务)
+        每条预测包含model_id、lottery_type_id、draw_number、predicted_numbers、confidence_score
+        """
+        query = """
+        INSERT INTO predictions 
+        (model_id, lottery_type_id, draw_number, predicted_numbers, confidence_score)
+        VALUES (%s, %s, %s, %s, %s)
+        """
+        
+        params_list = [(prediction['model_id'], prediction['lottery_type_id'], prediction['draw_number'],
+                        json.dumps(prediction['predicted_numbers'], ensure_ascii=False),
+                        prediction.get('confidence_score'))
+                       for prediction in predictions]
+        
+        try:
+            affected_rows = self.execute_many(query, params_list)
+            logger.info(f"批量插入预测结果成功: {len(params_list)}条")
+            return affected_rows
+        except Exception as e:
+            logger.error(f"批量插入预测结果失败: {e}")
+            return 0
+    
+    def get_predicted_model_ids(self, lottery_type_id: int, draw_number: str) -> set:
+        """获取已对某期做过预测的模型ID"""
+        query = """
+        SELECT DISTINCT model_id FROM predictions
+        WHERE lottery_type_id = %s AND draw_number = %s
+        """
+        
+        try:
+            return {result['model_id'] for result in self.execute_query(query, (lottery_type_id, draw_number))}
+        except Exception as e:
+            logger.error(f"获取已预测模型失败: {e}")
+            return set()
+    
     def insert_model_evaluation(self, model_id: int, lottery_type_id: int, 
                               draw_number: str, actual_numbers: Dict[str, Any], 
                               predicted_numbers: Dict[str, Any], accuracy_score: float) -> bool:
@@ -151,6 +322,57 @@ class DatabaseManager:
             logger.error(f"模型评估结果插入失败: {e}")
             return False
     
+    def get_pending_evaluations(self, lottery_type_id: int) -> List[Dict[str, Any]]:
+        """
+        获取已开奖但尚未评估的预测(一次查询)
+        以(模型, 彩种, 期号)判断是否已评估(走model_evaluations的idx_eval_model_draw索引)，重复爬取不会重复计入；
+        某期开奖入库后该期的全部预测在同一次评估中写入
+        """
+        query = """
+        SELECT DISTINCT p.model_id, p.lottery_type_id, p.draw_number,
+               p.predicted_numbers, r.numbers AS actual_numbers
+        FROM predictions p
+        JOIN lottery_results r
+          ON r.lottery_type_id = p.lottery_type_id AND r.draw_number = p.draw_number
+        WHERE p.lottery_type_id = %s
+          AND NOT EXISTS (
+              SELECT 1 FROM model_evaluations e
+              WHERE e.model_id = p.model_id
+                AND e.lottery_type_id = p.lottery_type_id
+                AND e.draw_number = p.draw_number
+          )
+        """
+        
+        try:
+            return self.execute_query(query, (lottery_type_id,))
+        except Exception as e:
+            logger.error(f"获取待评估预测失败: {e}")
+            return []
+    
+    def insert_model_evaluations(self, evaluations: List[Dict[str, Any]]) -> int:
+        """
+        批量插入模型评估结果(单个事务)
+        actual_numbers和predicted_numbers为数据库中的JSON字符串，原样写入
+        """
+        query = """
+        INSERT INTO model_evaluations 
+        (model_id, lottery_type_id, draw_number, actual_numbers, predicted_numbers, accuracy_score)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        """
+        
+        params_list = [(evaluation['model_id'], evaluation['lottery_type_id'], evaluation['draw_number'],
+                        evaluation['actual_numbers'], evaluation['predicted_numbers'],
+                        evaluation['accuracy_score'])
+                       for evaluation in evaluations]
+        
+        try:
+            affected_rows = self.execute_many(query, params_list)
+            logger.info(f"批量插入模型评估结果成功: {len(params_list)}条")
+            return affected_rows
+        except Exception as e:
+            logger.error(f"批量插入模型评估结果失败: {e}")
+            return 0
+    
     def get_prediction_models(self) -> List[Dict[str, Any]]:
         """获取预测模型列表"""
         query = "SELECT * FROM prediction_models WHERE is_active = 1"
@@ -166,6 +388,41 @@ class DatabaseManager:
             logger.error(f"获取预测模型失败: {e}")
             return []
     
+    def update_model_parameters(self, model_id: int, parameters: Dict[str, Any]) -> bool:
+        """更新预测模型参数"""
+        query = "UPDATE prediction_models SET parameters = %s WHERE id = %s"
+        
+        try:
+            self.execute_update(query, (json.dumps(parameters, ensure_ascii=False), model_id))
+            logger.info(f"模型参数更新成功: {model_id}")
+            return True
+        except Exception as e:
+            logger.error(f"模型参数更新失败: {e}")
+            return False
+    
+    def get_model_accuracy(self, lottery_type_id: int, recent: int = 30) -> Dict[int, Dict[str, Any]]:
+        """获取各模型最近recent期评估的平均准确率"""
+        query = """
+        SELECT model_id, AVG(accuracy_score) AS accuracy, COUNT(*) AS evaluations
+        FROM (
+            SELECT model_id, accuracy_score,
+                   ROW_NUMBER() OVER (PARTITION BY model_id ORDER BY draw_number DESC) AS row_num
+            FROM model_evaluations
+            WHERE lottery_type_id = %s
+        ) recent_evaluations
+        WHERE row_num <= %s
+        GROUP BY model_id
+        """
+        
+        try:
+            results = self.execute_query(query, (lottery_type_id, recent))
+            return {result['model_id']: {'accuracy': float(result['accuracy'] or 0),
+                                         'evaluations': result['evaluations']}
+                    for result in results}
+        except Exception as e:
+            logger.error(f"获取模型准确率失败: {e}")
+            return {}
+    
     def close(self):
         """关闭数据库连接"""
         if self.connection and self.connection.open:
@@ -176,4 +433,16 @@ class DatabaseManager:
         return self
     
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.close() 
\ No newline at end of file
+        self.close() 
+
+
+def create_database() -> DatabaseManager:
+    """按配置创建数据库管理器，启用LOCAL_DB_CONFIG时使用SQLite本地替身"""
+    if LOCAL_DB_CONFIG['enabled']:
+        from local_db import LocalDatabaseManager  # local_db依赖本模块，按需导入
+        return LocalDatabaseManager(LOCAL_DB_CONFIG['path'])
+    return DatabaseManager()
+
+
+DB_CONNECTIONS.callback = lambda: {(): sum(1 for manager in list(_managers)
+                                           if manager.connection and manager.connection.open)}
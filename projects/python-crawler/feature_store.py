@@ -0,0 +1,298 @@
+"""
+特征存储模块 - 彩票数据分析系统
+
+为预测模型统一计算并缓存各彩种的特征矩阵，避免每个模型重复解析历史开奖数据。
+每个彩种维护一条按开奖时间升序、只追加的特征序列：
+- 内存中常驻，新开奖数据到达时按行增量追加；
+- 复用缓存前同时比较期号和打包号码，已有期号的号码被更正时重建；
+- 同时写入磁盘缓存目录(每次写入一个新的版本目录，由meta.json原子切换)，进程重启后以内存映射方式加载。
+
+每个号码区的特征(行为开奖期，列为号码):
+- {区}_onehot: 当期是否开出(0/1)
+- {区}_gaps: 截至当期的遗漏期数(当期开出为0)
+- {区}_rolling: 最近rolling_window期(含当期)的出现频率
+- {区}_sums: 当期该区号码和值(一维)
+另有packed: 当期打包号码(一维uint64)
+"""
+import os
+import json
+import time
+import shutil
+import zlib
+import threading
+import numpy as np
+from typing import List, Dict, Any, Optional
+from loguru import logger
+from config import FEATURE_STORE_CONFIG
+from number_encoding import ZONE_LAYOUT, detect_game, encode_batch
+
+
+def build_features(game: str, packed: np.ndarray, window: int) -> Dict[str, np.ndarray]:
+    """从按时间升序的打包号码一次性计算全部特征矩阵"""
+    packed = np.ascontiguousarray(packed, dtype=np.uint64)
+    rows = len(packed)
+    bits = np.unpackbits(packed.view(np.uint8).reshape(-1, 8), axis=1, bitorder='little')
+    index = np.arange(rows)[:, None]
+
+    features = {'packed': packed}
+    for zone in ZONE_LAYOUT[game]:
+        name = zone['name']
+        onehot = np.ascontiguousarray(bits[:, zone['offset']:zone['offset'] + zone['width']])
+
+        # 遗漏: 当期序号减去最近一次开出的序号，从未开出时按序列起点计
+        last_seen = np.maximum.accumulate(np.where(onehot == 1, index, -1), axis=0)
+        gaps = np.where(last_seen >= 0, index - last_seen, index + 1).astype(np.int32)
+
+        # 滚动频率: 用累计和做差得到窗口内出现次数
+        cumulative = np.cumsum(onehot, axis=0, dtype=np.int32)
+        lagged = np.zeros_like(cumulative)
+        if rows > window:
+            lagged[window:] = cumulative[:-window]
+        rolling = (cumulative - lagged) / np.minimum(index + 1, window)
+
+        numbers = np.arange(zone['low'], zone['high'] + 1, dtype=np.int32)
+        features[f'{name}_onehot'] = onehot
+        features[f'{name}_gaps'] = gaps
+        features[f'{name}_rolling'] = rolling.astype(np.float32)
+        features[f'{name}_sums'] = (onehot @ numbers).astype(np.int32)
+    return features
+
+
+def extend_features(game: str, features: Dict[str, np.ndarray], packed: np.ndarray,
+                    window: int) -> Dict[str, np.ndarray]:
+    """在已有特征序列末尾按行追加新开奖期，只计算新增行"""
+    extended = {key: [value] for key, value in features.items()}
+    tail = {key: value[-window:] for key, value in features.items() if key.endswith('_onehot')}
+    last_gaps = {key: value[-1] for key, value in features.items() if key.endswith('_gaps')}
+    rows = len(features['packed'])
+
+    for code in np.asarray(packed, dtype=np.uint64):
+        new_rows = build_features(game, np.array([code], dtype=np.uint64), window)
+        extended['packed'].append(new_rows['packed'])
+        rows += 1
+
+        for zone in ZONE_LAYOUT[game]:
+            name = zone['name']
+            onehot = new_rows[f'{name}_onehot']
+            previous = tail.get(f'{name}_onehot')
+            history = onehot if previous is None else np.concatenate([previous, onehot])[-window:]
+            tail[f'{name}_onehot'] = history
+
+            if f'{name}_gaps' in last_gaps:
+                gaps = np.where(onehot[0] == 1, 0, last_gaps[f'{name}_gaps'] + 1).astype(np.int32)
+            else:
+                gaps = np.where(onehot[0] == 1, 0, 1).astype(np.int32)
+            last_gaps[f'{name}_gaps'] = gaps
+
+            rolling = history.sum(axis=0, dtype=np.int32) / min(rows, window)
+            extended[f'{name}_onehot'].append(onehot)
+            extended[f'{name}_gaps'].append(gaps[None, :])
+            extended[f'{name}_rolling'].append(rolling[None, :].astype(np.float32))
+            extended[f'{name}_sums'].append(new_rows[f'{name}_sums'])
+
+    return {key: np.concatenate(parts) for key, parts in extended.items()}
+
+
+def _is_newer(draw_number: str, latest: str) -> bool:
+    """判断期号是否晚于当前最新期号"""
+    if draw_number.isdigit() and latest.isdigit():
+        return int(draw_number) > int(latest)
+    return draw_number > latest
+
+
+class FeatureStore:
+    """特征存储"""
+
+    def __init__(self, cache_dir: str = None, window: int = None):
+        """初始化特征存储"""
+        self.cache_dir = cache_dir or FEATURE_STORE_CONFIG['cache_dir']
+        self.window = window or FEATURE_STORE_CONFIG['rolling_window']
+        self.max_extend_rows = FEATURE_STORE_CONFIG['max_extend_rows']
+        self._series = {}  # 彩种 -> {'draw_numbers': [...], 'features': {...}}
+        self._lock = threading.Lock()
+
+    def get_features(self, game: str, history: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+        """
+        获取与历史开奖数据对应的特征矩阵(按时间升序，行数与history相同)
+        history为数据库返回的开奖结果(最新一期在前)
+        """
+        if not history:
+            raise ValueError("历史数据为空")
+
+        draw_numbers = [result.get('draw_number') for result in reversed(history)]
+        packed = self._encode(game, history[::-1])
+        if None in draw_numbers:
+            # 没有期号无法与缓存序列对齐，直接计算
+            return build_features(game, packed, self.window)
+
+        with self._lock:
+            series = self._series.get(game) or self._load(game)
+            series = self._sync(game, series, packed, draw_numbers)
+            self._series[game] = series
+
+        start = len(series['draw_numbers']) - len(draw_numbers)
+        return {key: value[start:] for key, value in series['features'].items()}
+
+    def append_draw(self, game: str, result: Dict[str, Any]) -> None:
+        """新开奖数据到达时追加一行特征；已有期号的号码被更正时丢弃内存中的序列，下次取特征时重建"""
+        with self._lock:
+            series = self._series.get(game) or self._load(game)
+            if not series:
+                return
+            packed = self._encode(game, [result])
+            if not _is_newer(result['draw_number'], series['draw_numbers'][-1]):
+                if self._row_changed(series, result['draw_number'], packed[0]):
+                    logger.info(f"{game}第{result['draw_number']}期号码已更正，特征序列将重建")
+                    self._series.pop(game, None)
+                return
+            features = extend_features(game, series['features'], packed, self.window)
+            series = {'draw_numbers': series['draw_numbers'] + [result['draw_number']], 'features': features}
+            self._series[game] = series
+            self._save(game, series)
+
+    def version(self, game: str) -> Optional[str]:
+        """当前特征序列的数据版本(期数-最新期号-号码校验和)"""
+        series = self._series.get(game)
+        if not series:
+            return None
+        checksum = zlib.crc32(np.ascontiguousarray(series['features']['packed']).tobytes())
+        return f"{len(series['draw_numbers'])}-{series['draw_numbers'][-1]}-{checksum:08x}"
+
+    @staticmethod
+    def _row_changed(series: Dict[str, Any], draw_number: str, code: np.uint64) -> bool:
+        """缓存序列中该期的打包号码与code不同(不在序列中时为False)"""
+        draw_numbers = series['draw_numbers']
+        for index in range(len(draw_numbers) - 1, -1, -1):
+            if draw_numbers[index] == draw_number:
+                return series['features']['packed'][index] != code
+        return False
+    
+    def _sync(self, game: str, series: Optional[Dict[str, Any]], packed: np.ndarray,
+              draw_numbers: List[str]) -> Dict[str, Any]:
+        """
+        让缓存序列覆盖history(按时间升序的打包号码packed和期号draw_numbers)：
+        期号和号码都与缓存序列的尾部一致时直接复用或增量追加，否则重建
+        """
+        if series:
+            cached = series['draw_numbers']
+            cached_packed = series['features']['packed']
+            # 情况1: history是缓存序列的尾部
+            if (len(draw_numbers) <= len(cached) and cached[-len(draw_numbers):] == draw_numbers
+                    and np.array_equal(cached_packed[-len(packed):], packed)):
+                return series
+
+            # 情况2: history末尾有少量新开奖期，其余部分是缓存序列的尾部
+            for new_rows in range(1, min(self.max_extend_rows, len(draw_numbers)) + 1):
+                overlap = draw_numbers[:-new_rows]
+                if (overlap and len(overlap) <= len(cached) and cached[-len(overlap):] == overlap
+                        and np.array_equal(cached_packed[-len(overlap):], packed[:-new_rows])):
+                    features = extend_features(game, series['features'], packed[-new_rows:], self.window)
+                    series = {'draw_numbers': cached + draw_numbers[-new_rows:], 'features': features}
+                    logger.info(f"{game}特征序列追加{new_rows}期")
+                    self._save(game, series)
+                    return series
+
+        # 其他情况按history整体重建
+        features = build_features(game, packed, self.window)
+        series = {'draw_numbers': draw_numbers, 'features': features}
+        logger.info(f"{game}特征序列重建: {len(draw_numbers)}期")
+        self._save(game, series)
+        return series
+
+    @staticmethod
+    def _encode(game: str, results: List[Dict[str, Any]]) -> np.ndarray:
+        """把开奖结果编码为打包号码"""
+        return encode_batch(game, [result['numbers'] for result in results])
+
+    def _game_dir(self, game: str) -> str:
+        """彩种的磁盘缓存目录"""
+        return os.path.join(self.cache_dir, game)
+
+    def _save(self, game: str, series: Dict[str, Any]) -> None:
+        """
+        把特征序列写入磁盘缓存
+        特征矩阵写入新的版本目录，再用一次os.replace替换指向该目录的meta.json，
+        并发读取时meta.json与特征矩阵总是同一版本；保留上一个版本供正在加载的读取方使用
+        """
+        try:
+            game_dir = self._game_dir(game)
+            version = f"v{len(series['draw_numbers'])}-{time.time_ns()}"
+            version_dir = os.path.join(game_dir, version)
+            os.makedirs(version_dir)
+            for key, value in series['features'].items():
+                np.save(os.path.join(version_dir, f'{key}.npy'), value)
+
+            meta_path = os.path.join(game_dir, 'meta.json')
+            previous = self._read_meta(meta_path).get('version')
+            meta = {'version': version, 'draw_numbers': series['draw_numbers'], 'window': self.window,
+                    'keys': sorted(series['features'])}
+            temp_path = os.path.join(game_dir, 'meta.json.tmp')
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False)
+            os.replace(temp_path, meta_path)
+            self._remove_stale(game_dir, {version, previous, 'meta.json'})
+        except Exception as e:
+            logger.warning(f"{game}特征缓存写入失败: {e}")
+
+    @staticmethod
+    def _read_meta(meta_path: str) -> Dict[str, Any]:
+        """读取meta.json，不存在时为空"""
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+    
+    @staticmethod
+    def _remove_stale(game_dir: str, keep: set) -> None:
+        """删除不再使用的旧版本目录和旧格式的缓存文件"""
+        for entry in os.scandir(game_dir):
+            if entry.name in keep:
+                continue
+            if entry.is_dir():
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                os.remove(entry.path)
+    
+    def _load(self, game: str) -> Optional[Dict[str, Any]]:
+        """以内存映射方式加载磁盘缓存，特征矩阵的行数与期号数不一致时视为无效"""
+        meta_path = os.path.join(self._game_dir(game), 'meta.json')
+        if not os.path.exists(meta_path):
+            return None
+
+        try:
+            meta = self._read_meta(meta_path)
+            if meta.get('window') != self.window or 'version' not in meta:
+                return None
+
+            version_dir = os.path.join(self._game_dir(game), meta['version'])
+            features = {key: np.load(os.path.join(version_dir, f'{key}.npy'), mmap_mode='r')
+                        for key in meta['keys']}
+            if any(len(value) != len(meta['draw_numbers']) for value in features.values()):
+                logger.warning(f"{game}特征缓存行数与期号数不一致，已忽略")
+                return None
+            logger.info(f"{game}特征缓存加载成功: {len(meta['draw_numbers'])}期")
+            return {'draw_numbers': meta['draw_numbers'], 'features': features}
+        except Exception as e:
+            logger.warning(f"{game}特征缓存加载失败: {e}")
+            return None
+
+
+_feature_store = None
+_feature_store_lock = threading.Lock()
+
+
+def get_feature_store() -> FeatureStore:
+    """获取进程内共享的特征存储"""
+    global _feature_store
+    if _feature_store is None:
+        with _feature_store_lock:
+            if _feature_store is None:
+                _feature_store = FeatureStore()
+    return _feature_store
+
+
+def features_for(history: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """根据历史开奖数据判断彩种并从共享特征存储中取特征"""
+    game = detect_game(history[0]['numbers'])
+    return get_feature_store().get_features(game, history)
@@ -0,0 +1,112 @@
+"""
+爬虫HTTP缓存模块 - 彩票数据分析系统
+
+把数据源的响应持久化到本地磁盘，重复爬取时尽量不再下载相同的页面:
+- 每个响应一个gzip压缩的JSON文件，保存页面内容和响应的ETag/Last-Modified
+- 再次请求时带If-None-Match/If-Modified-Since发条件请求，数据源返回304时直接使用缓存内容
+- 只包含已结算开奖(开奖日期早于settled_days天)的历史页标记为永久缓存，第1页从不标记；
+  历史页按最新开奖在前分页，新开奖会把旧开奖推到后面的页，所以永久缓存只在本次爬取中前一页
+  与缓存内容相同(分页没有移动)时才直接使用，否则仍发条件请求
+- 缓存总大小超过max_bytes时按最近使用时间(文件修改时间)淘汰最旧的缓存
+"""
+import os
+import gzip
+import json
+import time
+import hashlib
+from typing import Dict, Any, Optional
+from loguru import logger
+from config import HTTP_CACHE_CONFIG
+
+
+class HttpCache:
+    """磁盘上的压缩HTTP响应缓存"""
+
+    def __init__(self, directory: str = None, max_bytes: int = None):
+        """初始化缓存"""
+        self.directory = directory or HTTP_CACHE_CONFIG['cache_dir']
+        self.max_bytes = max_bytes or HTTP_CACHE_CONFIG['max_bytes']
+        self._sizes = None  # 文件名 -> 文件大小，第一次写入时扫描目录
+
+    def _path(self, key: str) -> str:
+        """缓存文件路径"""
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json.gz')
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取缓存条目，不存在或已损坏时返回None"""
+        path = self._path(key)
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"HTTP缓存文件损坏，已忽略: {path}: {e}")
+            return None
+        os.utime(path)  # 记录最近使用时间，供淘汰使用
+        return entry
+
+    @staticmethod
+    def conditional_headers(entry: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        """条件请求头: 有ETag时带If-None-Match，有Last-Modified时带If-Modified-Since"""
+        headers = {}
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def put(self, key: str, body: str, headers: Dict[str, str], permanent: bool = False) -> Dict[str, Any]:
+        """保存响应(先写临时文件再替换)，超出大小上限时淘汰最久未使用的缓存"""
+        entry = {
+            'key': key,
+            'body': body,
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'stored_at': time.time(),
+            'permanent': permanent
+        }
+        self._write(key, entry)
+        return entry
+
+    def pin(self, key: str, entry: Dict[str, Any]) -> None:
+        """把条目标记为永久缓存，之后直接使用不再发请求"""
+        if not entry.get('permanent'):
+            self._write(key, dict(entry, permanent=True))
+
+    def _write(self, key: str, entry: Dict[str, Any]) -> None:
+        """写入缓存文件并更新总大小"""
+        os.makedirs(self.directory, exist_ok=True)
+        if self._sizes is None:
+            self._sizes = {item.name: item.stat().st_size for item in os.scandir(self.directory)
+                           if item.name.endswith('.json.gz')}
+        path = self._path(key)
+        with gzip.open(f"{path}.tmp", 'wt', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(f"{path}.tmp", path)
+        self._sizes[os.path.basename(path)] = os.path.getsize(path)
+        if sum(self._sizes.values()) > self.max_bytes:
+            self._evict(os.path.basename(path))
+
+    def _evict(self, keep: str) -> None:
+        """按最近使用时间从旧到新删除缓存文件，直到总大小不超过上限"""
+        total = sum(self._sizes.values())
+        ordered = sorted(self._sizes, key=lambda name: self._mtime(name))
+        for name in ordered:
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total -= self._sizes.pop(name)
+        logger.info(f"HTTP缓存已淘汰至{total / 1e6:.1f}MB")
+
+    def _mtime(self, name: str) -> float:
+        """缓存文件的修改时间，文件已不存在时为0"""
+        try:
+            return os.path.getmtime(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            return 0.0
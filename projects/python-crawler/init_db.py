@@ -84,6 +84,12 @@ DDL_STATEMENTS = [
     """
 ]
 
+# 二级索引: MySQL不支持CREATE INDEX IF NOT EXISTS，已存在时(错误1061)跳过，已有的数据库重新初始化时也会补建
+INDEX_STATEMENTS = [
+    # 按(模型, 彩种, 期号)判断预测是否已评估
+    "CREATE INDEX idx_eval_model_draw ON model_evaluations (model_id, lottery_type_id, draw_number)"
+]
+
 SEED_STATEMENTS = [
     # 彩票类型
     ("INSERT IGNORE INTO lottery_types(type_code, type_name, description) VALUES(%s,%s,%s)",
@@ -107,6 +113,12 @@ def main():
         with conn.cursor() as cur:
             for ddl in DDL_STATEMENTS:
                 cur.execute(ddl)
+            for ddl in INDEX_STATEMENTS:
+                try:
+                    cur.execute(ddl)
+                except pymysql.err.OperationalError as e:
+                    if e.args[0] != 1061:  # 索引已存在
+                        raise
             conn.commit()
             print("✅ 表结构创建完成")
             
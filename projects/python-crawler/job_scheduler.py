@@ -0,0 +1,203 @@
+"""
+定时任务模块 - 彩票数据分析系统
+
+在应用的事件循环中调度每日任务，随应用启动和关闭，不依赖单独的轮询线程：
+任务在调度器自己的线程池中执行，不占用事件循环和处理接口请求的线程；
+同一任务上一次还未结束时跳过本次执行；执行时间加随机抖动；
+每个任务最近一次的执行时间保存在状态文件中，重启后补跑停机期间错过的一次执行。
+"""
+import os
+import json
+import time
+import random
+import asyncio
+import functools
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, List
+from loguru import logger
+from config import SCHEDULER_CONFIG
+from profiling import get_profiling
+
+
+def previous_occurrence(at: str, now: datetime) -> datetime:
+    """每日at(HH:MM)时刻中不晚于now的最近一次"""
+    hour, minute = (int(part) for part in at.split(':'))
+    occurrence = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if occurrence > now:
+        occurrence -= timedelta(days=1)
+    return occurrence
+
+
+class ScheduledJob:
+    """每日定时任务"""
+
+    def __init__(self, name: str, at: str, func: Callable[[], Any], jitter: int):
+        """初始化任务，func为在线程池中执行的同步函数"""
+        self.name = name
+        self.at = at
+        self.func = func
+        self.jitter = jitter
+        self.running = False
+        self.next_run = None
+        self.last_run = None      # 最近一次开始执行的时间
+        self.last_status = None
+        self.last_seconds = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """任务状态"""
+        return {
+            'name': self.name,
+            'at': self.at,
+            'running': self.running,
+            'next_run': self.next_run.isoformat() if self.next_run else None,
+            'last_run': self.last_run.isoformat() if self.last_run else None,
+            'last_status': self.last_status,
+            'last_seconds': self.last_seconds
+        }
+
+
+class JobScheduler:
+    """基于asyncio的每日任务调度器"""
+
+    def __init__(self, state_file: str = None, workers: int = None, jitter: int = None):
+        """初始化调度器"""
+        self.state_file = state_file or SCHEDULER_CONFIG['state_file']
+        self.workers = workers or SCHEDULER_CONFIG['workers']
+        self.jitter = SCHEDULER_CONFIG['jitter'] if jitter is None else jitter
+        self.jobs = {}
+        self._state = self._load_state()
+        self._executor = None
+        self._loop_task = None
+        self._runs = set()  # 正在执行的任务协程，保持引用直到结束
+
+    def add_job(self, name: str, at: str, func: Callable[[], Any], jitter: int = None) -> ScheduledJob:
+        """添加每日在at(HH:MM)执行的任务"""
+        job = ScheduledJob(name, at, func, self.jitter if jitter is None else jitter)
+        state = self._state.get(name, {})
+        if state.get('last_run'):
+            job.last_run = datetime.fromisoformat(state['last_run'])
+            job.last_status = state.get('status')
+            job.last_seconds = state.get('seconds')
+        job.next_run = self._next_run(job, datetime.now())
+        self.jobs[name] = job
+        return job
+
+    def _next_run(self, job: ScheduledJob, now: datetime) -> datetime:
+        """
+        计算下一次执行时间
+        有执行记录且错过了最近一次计划时间时立即补跑，否则为下一个计划时间加随机抖动
+        """
+        due = previous_occurrence(job.at, now)
+        if job.last_run is not None and job.last_run < due:
+            return now
+        return due + timedelta(days=1, seconds=random.uniform(0, job.jitter))
+
+    async def start(self) -> None:
+        """启动调度循环"""
+        if self._loop_task is not None:
+            return
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='scheduler')
+        self._loop_task = asyncio.create_task(self._run_loop())
+        for job in self.jobs.values():
+            logger.info(f"定时任务{job.name}下次执行时间: {job.next_run:%Y-%m-%d %H:%M:%S}")
+
+    async def stop(self) -> None:
+        """停止调度循环，不等待正在执行的任务"""
+        if self._loop_task is None:
+            return
+        self._loop_task.cancel()
+        try:
+            await self._loop_task
+        except asyncio.CancelledError:
+            pass
+        self._loop_task = None
+        self._executor.shutdown(wait=False)
+        self._executor = None
+
+    def run_now(self, name: str) -> bool:
+        """立即执行任务，任务正在执行时返回False"""
+        job = self.jobs[name]
+        if job.running:
+            return False
+        self._launch(job)
+        return True
+
+    def status(self) -> List[Dict[str, Any]]:
+        """所有任务的状态"""
+        return [job.to_dict() for job in self.jobs.values()]
+
+    async def _run_loop(self) -> None:
+        """到期的任务放入线程池执行，然后休眠到最近的下一次执行时间(最长check_interval秒)"""
+        while True:
+            now = datetime.now()
+            for job in self.jobs.values():
+                if job.next_run > now:
+                    continue
+                if job.running:
+                    logger.warning(f"定时任务{job.name}上一次执行尚未结束，跳过本次执行")
+                else:
+                    self._launch(job)
+                job.next_run = previous_occurrence(job.at, now) + timedelta(
+                    days=1, seconds=random.uniform(0, job.jitter))
+
+            wait = min((job.next_run - datetime.now()).total_seconds() for job in self.jobs.values()) \
+                if self.jobs else SCHEDULER_CONFIG['check_interval']
+            await asyncio.sleep(min(max(wait, 0), SCHEDULER_CONFIG['check_interval']))
+
+    def _launch(self, job: ScheduledJob) -> None:
+        """在事件循环中创建任务执行协程"""
+        job.running = True
+        run = asyncio.create_task(self._execute(job))
+        self._runs.add(run)
+        run.add_done_callback(self._runs.discard)
+
+    async def _execute(self, job: ScheduledJob) -> None:
+        """在线程池中执行任务并记录执行结果"""
+        started = datetime.now()
+        start = time.perf_counter()
+        func = job.func
+        profiling = get_profiling()
+        profile_mode = profiling.take_job(job.name) if profiling else None
+        if profile_mode:
+            func = functools.partial(profiling.run, job.func, f"job-{job.name}", profile_mode)
+        logger.info(f"开始执行定时任务{job.name}" + (f"(剖析方式: {profile_mode})" if profile_mode else ""))
+        try:
+            await asyncio.get_running_loop().run_in_executor(self._executor, func)
+            job.last_status = 'success'
+        except Exception as e:
+            logger.error(f"定时任务{job.name}执行失败: {e}")
+            job.last_status = 'failed'
+        finally:
+            job.running = False
+            job.last_run = started
+            job.last_seconds = round(time.perf_counter() - start, 3)
+            self._save_state()
+        logger.info(f"定时任务{job.name}执行结束: {job.last_status}, 耗时{job.last_seconds}秒")
+
+    def _load_state(self) -> Dict[str, Any]:
+        """读取任务执行记录"""
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取定时任务状态失败: {e}")
+            return {}
+
+    def _save_state(self) -> None:
+        """先写临时文件再替换，保存任务执行记录"""
+        self._state.update({job.name: {'last_run': job.last_run.isoformat(), 'status': job.last_status,
+                                       'seconds': job.last_seconds}
+                            for job in self.jobs.values() if job.last_run is not None})
+        try:
+            directory = os.path.dirname(self.state_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temp_file = f"{self.state_file}.tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(self._state, f, ensure_ascii=False, indent=2)
+            os.replace(temp_file, self.state_file)
+        except OSError as e:
+            logger.warning(f"保存定时任务状态失败: {e}")
@@ -0,0 +1,120 @@
+"""
+本地数据库替身 - 彩票数据分析系统
+
+基于SQLite实现DatabaseManager的接口，用于基准测试和压力测试，不需要连接MySQL。
+只替换连接和三个执行方法，语句中的MySQL写法在执行前转换为SQLite写法，
+上层的查询和写入方法(以及它们的指标和追踪)与生产环境使用同一份代码。
+表结构和初始数据由init_db中的建表语句和种子数据转换得到。
+"""
+import os
+import re
+import zlib
+import sqlite3
+from functools import lru_cache
+from typing import List, Dict, Any
+from loguru import logger
+from database import DatabaseManager
+from metrics import statement_label
+from tracing import span
+from init_db import DDL_STATEMENTS, INDEX_STATEMENTS, SEED_STATEMENTS
+
+
+class _LocalConnection(sqlite3.Connection):
+    """带open属性的SQLite连接，与pymysql连接的用法一致"""
+
+    open = True
+
+    def close(self):
+        self.open = False
+        super().close()
+
+
+@lru_cache(maxsize=256)
+def to_sqlite(statement: str) -> str:
+    """把MySQL语句转换为SQLite语句"""
+    statement = re.sub(r'\bINT PRIMARY KEY AUTO_INCREMENT\b', 'INTEGER PRIMARY KEY AUTOINCREMENT', statement)
+    statement = re.sub(r'\s+ON UPDATE CURRENT_TIMESTAMP\b', '', statement)
+    statement = re.sub(r'\)\s*ENGINE=\w+[^;]*;', ');', statement)
+    statement = re.sub(r'\bUNIQUE KEY \w+\s*\(', 'UNIQUE (', statement)
+    statement = re.sub(r'^\s*CREATE INDEX\b', 'CREATE INDEX IF NOT EXISTS', statement)
+    statement = re.sub(r'\bINSERT IGNORE\b', 'INSERT OR IGNORE', statement)
+    statement = re.sub(r'\bON DUPLICATE KEY UPDATE\b', 'ON CONFLICT DO UPDATE SET', statement)
+    statement = re.sub(r'\bVALUES\((\w+)\)', r'excluded.\1', statement)
+    return statement.replace('%s', '?')
+
+
+class LocalDatabaseManager(DatabaseManager):
+    """SQLite数据库替身"""
+
+    def __init__(self, path: str = ':memory:', seed: bool = True):
+        """
+        初始化替身数据库，path为SQLite文件路径(默认内存数据库)
+        seed为True时建表并写入彩票类型和预测模型的初始数据
+        """
+        self.path = path
+        super().__init__()
+        if seed:
+            self.create_schema()
+
+    def connect(self):
+        """
+        打开SQLite连接(允许在线程间共享，由DatabaseManager的锁串行化)
+        使用数据库文件时多个管理器可同时连接，写入冲突时最多等待30秒
+        """
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self.connection = sqlite3.connect(self.path, factory=_LocalConnection, check_same_thread=False, timeout=30)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.create_function('CRC32', 1, lambda value: zlib.crc32(str(value).encode('utf-8')),
+                                        deterministic=True)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        logger.info(f"本地数据库连接成功: {self.path}")
+
+    def create_schema(self):
+        """建表，预测模型表为空时写入初始数据"""
+        with self._lock:
+            for ddl in DDL_STATEMENTS + INDEX_STATEMENTS:
+                self.connection.execute(to_sqlite(ddl))
+            if not self.connection.execute("SELECT 1 FROM prediction_models LIMIT 1").fetchone():
+                for sql, params_list in SEED_STATEMENTS:
+                    self.connection.executemany(to_sqlite(sql), params_list)
+            self.connection.commit()
+
+    def execute_query(self, query: str, params: tuple = None) -> List[Dict[str, Any]]:
+        """执行查询语句"""
+        with self._statement('execute_query', query):
+            try:
+                cursor = self.connection.execute(to_sqlite(query), params or ())
+                return [dict(row) for row in cursor.fetchall()]
+            except Exception as e:
+                logger.error(f"查询执行失败: {e}")
+                raise
+
+    def execute_update(self, query: str, params: tuple = None) -> int:
+        """执行更新语句"""
+        with self._statement('execute_update', query):
+            try:
+                affected_rows = self.connection.execute(to_sqlite(query), params or ()).rowcount
+                self.connection.commit()
+                return affected_rows
+            except Exception as e:
+                logger.error(f"更新执行失败: {e}")
+                self.connection.rollback()
+                raise
+
+    def execute_many(self, query: str, params_list: List[tuple]) -> int:
+        """批量执行同一更新语句，全部成功后一次提交"""
+        if not params_list:
+            return 0
+
+        with span('db_batch', statement=statement_label(query), rows=len(params_list)), \
+                self._statement('execute_many', query):
+            try:
+                affected_rows = self.connection.executemany(to_sqlite(query), params_list).rowcount
+                self.connection.commit()
+                return affected_rows
+            except Exception as e:
+                logger.error(f"批量更新执行失败: {e}")
+                self.connection.rollback()
+                raise
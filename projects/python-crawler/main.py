@@ -3,22 +3,43 @@
 """
 import os
 import sys
-import time
-import schedule
+import json
+import asyncio
+from contextlib import asynccontextmanager
 from datetime import datetime
 from loguru import logger
-from fastapi import FastAPI, HTTPException
+from typing import Dict, Any
+from fastapi import FastAPI, HTTPException, Request, Body, Query
+from fastapi.responses import StreamingResponse, Response, JSONResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
 from uvicorn import run
 import uvicorn
 
 # 添加当前目录到Python路径
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from config import LOG_CONFIG
+from config import LOG_CONFIG, PRIZE_CONFIG, PREDICTION_CONFIG, TUNING_CONFIG, CHART_CONFIG, \
+    CACHE_CONFIG, SCHEDULER_CONFIG, PROFILING_CONFIG, COMBINATION_CONFIG, SIMULATION_CONFIG
 from crawler import LotteryCrawler
 from data_analysis import LotteryDataAnalyzer
 from prediction_models import PredictionModelFactory
-from database import DatabaseManager
+from prediction_service import PredictionService, next_draw_number
+from model_tuning import ParameterSweep
+from database import create_database
+from number_encoding import ZONE_LAYOUT, detect_game, encode_batch
+from prize_checker import PrizeChecker, TicketStreamParser, merge_summaries
+from combination_filter import CombinationFilter, cold_numbers, format_ticket_lines
+from feature_store import get_feature_store
+from strategy_simulator import StrategySimulator, build_strategies
+from chart_renderer import CHART_FORMATS
+from response_cache import ResponseCache, DataVersionCache, etag_matches
+from single_flight import SingleFlight
+from job_scheduler import JobScheduler
+from profiling import PROFILE_MODES, SamplingProfiler, get_profiling
+from tracing import span
+import metrics
+from metrics import MODEL_SECONDS, CallbackMetric
 
 # 配置日志
 logger.add(LOG_CONFIG['file'], 
@@ -27,45 +48,61 @@ logger.add(LOG_CONFIG['file'],
           rotation="1 day",
           retention="30 days")
 
-# 创建FastAPI应用
-app = FastAPI(
-    title="彩票数据分析系统",
-    description="彩票数据爬取、分析和预测的综合系统",
-    version="1.0.0"
-)
-
 # 全局变量
 crawler = None
 analyzer = None
 db = None
+prediction_service = None
+scheduler = None
+crawl_lock = asyncio.Lock()  # 未启用定时任务时防止接口重复触发爬取
+response_cache = ResponseCache()
+single_flight = SingleFlight()
+profiling = get_profiling()
+data_versions = DataVersionCache(lambda lottery_type_id: db.get_data_version(lottery_type_id))
+
+# 缓存和请求合并的统计由各自对象维护，抓取指标时读取
+CallbackMetric('lottery_response_cache_requests', '响应缓存查找次数', 'counter', ('result',),
+               lambda: {('hit',): response_cache.hits, ('miss',): response_cache.misses})
+CallbackMetric('lottery_response_cache_hit_ratio', '响应缓存命中率', 'gauge',
+               callback=lambda: {(): response_cache.stats()['hit_rate']})
+CallbackMetric('lottery_response_cache_entries', '响应缓存条目数', 'gauge',
+               callback=lambda: {(): response_cache.stats()['entries']})
+CallbackMetric('lottery_single_flight_requests', '请求合并次数(executed为实际执行, coalesced为共享结果)',
+               'counter', ('result',),
+               lambda: {('executed',): single_flight.executed, ('coalesced',): single_flight.coalesced})
+CallbackMetric('lottery_single_flight_in_flight', '正在执行的合并请求数', 'gauge',
+               callback=lambda: {(): single_flight.stats()['in_flight']})
 
-@app.on_event("startup")
-async def startup_event():
-    """应用启动事件"""
-    global crawler, analyzer, db
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期: 启动时初始化组件和定时任务，关闭时释放资源"""
+    global crawler, analyzer, db, prediction_service, scheduler
     
     try:
         # 初始化组件
         crawler = LotteryCrawler()
         analyzer = LotteryDataAnalyzer()
-        db = DatabaseManager()
-        
-        logger.info("彩票数据分析系统启动成功")
+        db = create_database()
+        prediction_service = PredictionService(db)
         
         # 启动定时任务
-        schedule.every().day.at("09:00").do(daily_crawl_task)
-        schedule.every().day.at("21:00").do(daily_analysis_task)
+        if SCHEDULER_CONFIG['enabled']:
+            scheduler = JobScheduler()
+            scheduler.add_job('daily_crawl', SCHEDULER_CONFIG['daily_crawl_time'], daily_crawl_task)
+            scheduler.add_job('daily_analysis', SCHEDULER_CONFIG['daily_analysis_time'], daily_analysis_task)
+            await scheduler.start()
+        
+        logger.info("彩票数据分析系统启动成功")
         
     except Exception as e:
         logger.error(f"系统启动失败: {e}")
         raise
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    """应用关闭事件"""
-    global crawler, analyzer, db
+    
+    yield
     
     try:
+        if scheduler:
+            await scheduler.stop()
         if crawler:
             crawler.close()
         if analyzer:
@@ -78,6 +115,122 @@ async def shutdown_event():
     except Exception as e:
         logger.error(f"系统关闭失败: {e}")
 
+# 创建FastAPI应用
+app = FastAPI(
+    title="彩票数据分析系统",
+    description="彩票数据爬取、分析和预测的综合系统",
+    version="1.0.0",
+    lifespan=lifespan
+)
+
+async def read_response(request: Request, call_next) -> Dict[str, Any]:
+    """执行请求并读出完整响应，便于缓存或在合并的请求间共享"""
+    response = await call_next(request)
+    body = b''.join([chunk async for chunk in response.body_iterator])
+    headers = {name: value for name, value in response.headers.items() if name.lower() != 'content-length'}
+    return {'status_code': response.status_code, 'body': body, 'headers': headers,
+            'media_type': response.media_type}
+
+@app.middleware("http")
+async def response_cache_middleware(request: Request, call_next):
+    """
+    分析接口的响应缓存与请求合并
+    按路径、查询参数和彩种数据版本缓存成功的GET响应，If-None-Match命中时返回304；
+    图表接口不经过这里，由图表渲染器自己的缓存和ETag处理，避免两层缓存的验证器不一致；
+    缓存未命中时相同的并发请求只计算一次，相同的并发预测请求也只执行一次
+    """
+    path = request.url.path
+    if request.method == "POST" and path.startswith(CACHE_CONFIG['coalesce_paths']) \
+            and request.headers.get("content-length", "0") == "0":
+        result = await single_flight.do(f"POST {path}?{request.url.query}",
+                                        lambda: read_response(request, call_next))
+        return Response(content=result['body'], status_code=result['status_code'],
+                        headers=result['headers'], media_type=result['media_type'])
+    
+    if request.method != "GET" or not path.startswith(CACHE_CONFIG['paths']) or not db:
+        return await call_next(request)
+    
+    # 分析接口的最后一段路径为彩票类型ID；版本缓存过期时在线程池中查询数据库，不阻塞事件循环
+    try:
+        lottery_type_id = int(path.rstrip('/').rsplit('/', 1)[-1])
+        version = data_versions.cached(lottery_type_id) or await run_in_threadpool(data_versions.get, lottery_type_id)
+    except Exception:
+        return await call_next(request)
+    
+    key = response_cache.key(path, request.url.query, version)
+    entry = response_cache.get(key)
+    if entry is None:
+        async def compute() -> Dict[str, Any]:
+            result = await read_response(request, call_next)
+            if result['status_code'] != 200:
+                return result
+            return response_cache.put(key, result['body'], result['headers'], result['media_type'])
+        
+        entry = await single_flight.do(key, compute)
+        if 'etag' not in entry:
+            return Response(content=entry['body'], status_code=entry['status_code'],
+                            headers=entry['headers'], media_type=entry['media_type'])
+    
+    headers = response_cache.cache_headers(entry)
+    if etag_matches(request.headers.get("if-none-match"), entry['etag']):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry['body'], media_type=entry['media_type'], headers={**entry['headers'], **headers})
+
+def profile_token_valid(request: Request) -> bool:
+    """配置了剖析令牌时，请求须携带相同的X-Profile-Token"""
+    token = PROFILING_CONFIG['token']
+    return not token or request.headers.get("x-profile-token") == token
+
+async def profile_middleware(request: Request, call_next):
+    """
+    携带X-Profile请求头的请求在执行期间采样调用栈(仅在启用剖析时注册)
+    剖析ID通过X-Profile-Id响应头返回，被限流时通过X-Profile-Skipped说明
+    """
+    if "x-profile" not in request.headers:
+        return await call_next(request)
+    if not profile_token_valid(request):
+        return JSONResponse(status_code=403, content={"detail": "剖析令牌无效"})
+    if not profiling.acquire():
+        response = await call_next(request)
+        response.headers["X-Profile-Skipped"] = "rate-limited"
+        return response
+    
+    try:
+        profiler = SamplingProfiler()
+        profiler.start()
+        try:
+            response = await call_next(request)
+        finally:
+            folded = profiler.stop()
+        profile_id = profiling.save(f"{request.method}-{request.url.path}", folded.encode('utf-8'), 'folded')
+        response.headers["X-Profile-Id"] = profile_id
+        return response
+    finally:
+        profiling.release()
+
+if profiling:
+    app.middleware("http")(profile_middleware)
+
+def predict_after_crawl(service: PredictionService) -> Dict[str, Any]:
+    """爬取完成后批量预测；预测失败只返回错误信息，不影响已完成的爬取"""
+    try:
+        return service.predict_all()
+    except Exception as e:
+        logger.error(f"爬取后批量预测失败: {e}")
+        return {"error": str(e)}
+
+def get_lottery_game(lottery_type_id: int) -> str:
+    """根据彩票类型ID获取彩种代码"""
+    for lottery_type in db.get_lottery_types():
+        if lottery_type['id'] == lottery_type_id:
+            return lottery_type['type_code']
+    raise HTTPException(status_code=404, detail="彩票类型不存在")
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus格式的监控指标"""
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/")
 async def root():
     """根路径"""
@@ -108,17 +261,32 @@ async def health_check():
 
 @app.post("/crawl/start")
 async def start_crawling():
-    """开始数据爬取"""
+    """
+    开始数据爬取
+    启用定时任务时交给调度器线程池执行daily_crawl任务并立即返回，执行结果见GET /scheduler/jobs；
+    未启用时在线程池中执行并返回爬取结果；爬取正在执行时返回409
+    """
+    if scheduler and 'daily_crawl' in scheduler.jobs:
+        if not scheduler.run_now('daily_crawl'):
+            raise HTTPException(status_code=409, detail="数据爬取任务正在执行")
+        return {
+            "message": "数据爬取任务已开始执行",
+            "job": "daily_crawl",
+            "timestamp": datetime.now().isoformat()
+        }
+    
+    if not crawler:
+        raise HTTPException(status_code=500, detail="爬虫未初始化")
+    if crawl_lock.locked():
+        raise HTTPException(status_code=409, detail="数据爬取任务正在执行")
+    
     try:
-        if not crawler:
-            raise HTTPException(status_code=500, detail="爬虫未初始化")
-        
-        logger.info("开始执行数据爬取任务")
-        results = crawler.crawl_all_data()
-        
+        async with crawl_lock:
+            logger.info("开始执行数据爬取任务")
+            report = await run_in_threadpool(run_crawl_pipeline, crawler, prediction_service, 'api')
         return {
             "message": "数据爬取完成",
-            "results": results,
+            **report,
             "timestamp": datetime.now().isoformat()
         }
         
@@ -127,7 +295,7 @@ async def start_crawling():
         raise HTTPException(status_code=500, detail=f"数据爬取失败: {e}")
 
 @app.get("/analysis/frequency/{lottery_type_id}")
-async def get_frequency_analysis(lottery_type_id: int, limit: int = 100):
+def get_frequency_analysis(lottery_type_id: int, limit: int = 100):
     """获取频率分析结果"""
     try:
         if not analyzer:
@@ -147,7 +315,7 @@ async def get_frequency_analysis(lottery_type_id: int, limit: int = 100):
         raise HTTPException(status_code=500, detail=f"频率分析失败: {e}")
 
 @app.get("/analysis/hot_cold/{lottery_type_id}")
-async def get_hot_cold_analysis(lottery_type_id: int, limit: int = 50):
+def get_hot_cold_analysis(lottery_type_id: int, limit: int = 50):
     """获取冷热号码分析结果"""
     try:
         if not analyzer:
@@ -167,7 +335,7 @@ async def get_hot_cold_analysis(lottery_type_id: int, limit: int = 50):
         raise HTTPException(status_code=500, detail=f"冷热号码分析失败: {e}")
 
 @app.get("/analysis/sum_distribution/{lottery_type_id}")
-async def get_sum_distribution_analysis(lottery_type_id: int, limit: int = 100):
+def get_sum_distribution_analysis(lottery_type_id: int, limit: int = 100):
     """获取和值分布分析结果"""
     try:
         if not analyzer:
@@ -187,7 +355,7 @@ async def get_sum_distribution_analysis(lottery_type_id: int, limit: int = 100):
         raise HTTPException(status_code=500, detail=f"和值分布分析失败: {e}")
 
 @app.post("/prediction/generate/{lottery_type_id}")
-async def generate_prediction(lottery_type_id: int, model_type: str = "FREQUENCY"):
+def generate_prediction(lottery_type_id: int, model_type: str = "FREQUENCY"):
     """生成预测结果"""
     try:
         if not crawler or not analyzer:
@@ -198,24 +366,32 @@ async def generate_prediction(lottery_type_id: int, model_type: str = "FREQUENCY
         if not historical_data:
             raise HTTPException(status_code=400, detail="历史数据不足")
         
+        # 查找启用的模型及其参数
+        model_info = prediction_service.find_model(model_type)
+        if not model_info:
+            raise HTTPException(status_code=400, detail=f"模型未启用或未实现: {model_type}")
+        
         # 创建预测模型
-        model = PredictionModelFactory.create_model(model_type)
+        model = PredictionModelFactory.create_model(model_type, model_info.get('parameters'))
         
         # 训练模型
-        if not model.train(historical_data):
+        with MODEL_SECONDS.time(model_type=model_type, phase='train'):
+            trained = model.train(historical_data)
+        if not trained:
             raise HTTPException(status_code=500, detail="模型训练失败")
         
         # 生成预测
-        prediction = model.predict(historical_data)
+        with MODEL_SECONDS.time(model_type=model_type, phase='predict'):
+            prediction = model.predict(historical_data)
         if not prediction:
             raise HTTPException(status_code=500, detail="预测生成失败")
         
         # 保存预测结果
-        next_draw_number = str(int(historical_data[0]['draw_number']) + 1).zfill(4)
+        draw_number = next_draw_number(historical_data)
         db.insert_prediction(
-            model_id=1,  # 默认模型ID
+            model_id=model_info['id'],
             lottery_type_id=lottery_type_id,
-            draw_number=next_draw_number,
+            draw_number=draw_number,
             predicted_numbers=prediction,
             confidence_score=prediction.get('confidence', 0.5)
         )
@@ -223,87 +399,435 @@ async def generate_prediction(lottery_type_id: int, model_type: str = "FREQUENCY
         return {
             "lottery_type_id": lottery_type_id,
             "model_type": model_type,
-            "next_draw_number": next_draw_number,
+            "next_draw_number": draw_number,
             "prediction": prediction,
             "timestamp": datetime.now().isoformat()
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"预测生成失败: {e}")
         raise HTTPException(status_code=500, detail=f"预测生成失败: {e}")
 
-@app.get("/charts/frequency/{lottery_type_id}")
-async def generate_frequency_chart(lottery_type_id: int, limit: int = 50):
-    """生成频率分析图表"""
+@app.post("/prediction/ensemble/{lottery_type_id}")
+def ensemble_prediction(lottery_type_id: int, history_limit: int = None):
+    """
+    集成预测
+    所有启用模型共用一次历史数据查询和特征构建并行预测，各模型预测按model_id批量保存，
+    再按最近评估准确率加权合并得到集成号码
+    """
     try:
-        if not analyzer:
-            raise HTTPException(status_code=500, detail="分析器未初始化")
+        if not prediction_service:
+            raise HTTPException(status_code=500, detail="系统组件未初始化")
         
-        filename = analyzer.generate_frequency_chart(lottery_type_id, limit)
-        if not filename:
-            raise HTTPException(status_code=500, detail="图表生成失败")
+        result = prediction_service.ensemble(lottery_type_id, history_limit)
         
         return {
-            "message": "图表生成成功",
-            "filename": filename,
             "lottery_type_id": lottery_type_id,
+            **result,
             "timestamp": datetime.now().isoformat()
         }
         
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"图表生成失败: {e}")
-        raise HTTPException(status_code=500, detail=f"图表生成失败: {e}")
+        logger.error(f"集成预测失败: {e}")
+        raise HTTPException(status_code=500, detail=f"集成预测失败: {e}")
 
-def daily_crawl_task():
-    """每日数据爬取任务"""
+@app.post("/prediction/batch")
+def batch_prediction(lottery_type_id: int = None, history_limit: int = None, force: bool = False):
+    """
+    批量预测
+    为所有彩种(或指定彩种)的所有启用模型生成下一期预测，返回每个组合的耗时；
+    已有下一期预测的组合默认跳过，force=true时重新预测
+    """
     try:
-        logger.info("执行每日数据爬取任务")
-        if crawler:
-            results = crawler.crawl_all_data()
-            logger.info(f"每日爬取任务完成: {results}")
+        if not prediction_service:
+            raise HTTPException(status_code=500, detail="系统组件未初始化")
+        
+        lottery_type_ids = [lottery_type_id] if lottery_type_id is not None else None
+        result = prediction_service.predict_all(lottery_type_ids, history_limit, force)
+        
+        return {
+            **result,
+            "timestamp": datetime.now().isoformat()
+        }
+        
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"每日爬取任务失败: {e}")
+        logger.error(f"批量预测失败: {e}")
+        raise HTTPException(status_code=500, detail=f"批量预测失败: {e}")
 
-def daily_analysis_task():
-    """每日数据分析任务"""
+@app.post("/prediction/tune/{model_id}")
+def tune_model(model_id: int, search_space: Dict[str, Any] = Body(None), lottery_type_id: int = None,
+               mode: str = "grid", samples: int = Query(None, ge=1, le=TUNING_CONFIG['max_samples']),
+               test_draws: int = Query(None, ge=1, le=TUNING_CONFIG['history_limit'] - TUNING_CONFIG['min_train_draws']),
+               apply: bool = True):
+    """
+    模型参数搜索
+    请求体为参数搜索空间(如{"window_size": [20, 50, 100]})，为空时使用TUNING_CONFIG中的默认值；
+    网格搜索的参数组合数不超过TUNING_CONFIG['max_samples']；
+    在指定彩种(默认全部彩种)上滚动回测每组参数，apply为true时把最优参数写回prediction_models
+    """
     try:
-        logger.info("执行每日数据分析任务")
-        if analyzer and db:
-            lottery_types = db.get_lottery_types()
-            for lottery_type in lottery_types:
-                try:
-                    # 生成各种分析图表
-                    analyzer.generate_frequency_chart(lottery_type['id'])
-                    analyzer.generate_hot_cold_chart(lottery_type['id'])
-                    analyzer.generate_sum_distribution_chart(lottery_type['id'])
-                    logger.info(f"{lottery_type['type_name']}分析任务完成")
-                except Exception as e:
-                    logger.error(f"{lottery_type['type_name']}分析任务失败: {e}")
+        if not db:
+            raise HTTPException(status_code=500, detail="数据库未初始化")
+        
+        model_info = next((model for model in db.get_prediction_models() if model['id'] == model_id), None)
+        if not model_info:
+            raise HTTPException(status_code=404, detail="模型不存在或未启用")
+        
+        lottery_types = [lottery_type for lottery_type in db.get_lottery_types()
+                         if lottery_type_id is None or lottery_type['id'] == lottery_type_id]
+        histories = [db.get_lottery_results(lottery_type['id'], TUNING_CONFIG['history_limit'])
+                     for lottery_type in lottery_types]
+        
+        sweep = ParameterSweep(model_info['model_type'], search_space, mode, samples, test_draws=test_draws)
+        result = sweep.run(histories)
+        
+        if apply:
+            parameters = {**(model_info.get('parameters') or {}), **result['best_parameters']}
+            result['applied'] = db.update_model_parameters(model_id, parameters)
+        
+        return {
+            "model_id": model_id,
+            **result,
+            "timestamp": datetime.now().isoformat()
+        }
+        
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"每日分析任务失败: {e}")
+        logger.error(f"模型参数搜索失败: {e}")
+        raise HTTPException(status_code=500, detail=f"模型参数搜索失败: {e}")
+
+class BodyStreamingResponse(StreamingResponse):
+    """
+    边读取请求体边输出的流式响应
+    StreamingResponse在ASGI spec 2.4以下会另起任务监听客户端断开，该任务会读走尚未读取的请求体；
+    这里只输出内容，客户端断开时读取请求体抛出ClientDisconnect结束输出
+    """
+    
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
 
-def run_scheduler():
-    """运行定时任务调度器"""
-    while True:
+@app.post("/tickets/check/{lottery_type_id}")
+async def check_tickets(lottery_type_id: int, request: Request,
+                        draw_numbers: str = None, play: str = "direct"):
+    """
+    批量兑奖
+    请求体为文本彩票，每行一注，按批流式读取并逐批兑奖；draw_numbers为逗号分隔的期号，默认最新一期。
+    响应为NDJSON，边读取请求体边输出，每批彩票输出一行统计，最后输出一行总计。
+    解析和兑奖在线程池中执行，不阻塞事件循环。
+    """
+    try:
+        if not db:
+            raise HTTPException(status_code=500, detail="数据库未初始化")
+        
+        if draw_numbers:
+            draws = await run_in_threadpool(db.get_lottery_results_by_draw_numbers, lottery_type_id,
+                                            draw_numbers.split(','))
+        else:
+            draws = await run_in_threadpool(db.get_lottery_results, lottery_type_id, 1)
+        if not draws:
+            raise HTTPException(status_code=400, detail="开奖数据不存在")
+        
+        game = detect_game(draws[0]['numbers'])
+        checker = PrizeChecker(game, fc3d_play=play)
+        draw_codes = encode_batch(game, [draw['numbers'] for draw in draws])
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"批量兑奖失败: {e}")
+        raise HTTPException(status_code=500, detail=f"批量兑奖失败: {e}")
+    
+    parser = TicketStreamParser(game, PRIZE_CONFIG['check_chunk_size'])
+    totals = [{} for _ in draws]
+    progress = {"chunks": 0, "invalid": 0}
+    
+    def check_chunks(batches) -> str:
+        """解析并兑奖已读到的各批彩票，返回各批的统计行"""
+        lines = []
+        for tickets, invalid in batches:
+            summaries = checker.summarize(tickets, draw_codes)
+            for total, summary in zip(totals, summaries):
+                merge_summaries(total, summary)
+            lines.append(json.dumps({
+                "chunk": progress["chunks"],
+                "tickets": int(len(tickets)),
+                "invalid": invalid,
+                "draws": [dict(summary, draw_number=draw['draw_number'])
+                          for draw, summary in zip(draws, summaries)]
+            }, ensure_ascii=False) + "\n")
+            progress["chunks"] += 1
+            progress["invalid"] += invalid
+        return ''.join(lines)
+    
+    async def generate():
         try:
-            schedule.run_pending()
-            time.sleep(60)  # 每分钟检查一次
+            async for data in request.stream():
+                lines = await run_in_threadpool(check_chunks, parser.feed(data))
+                if lines:
+                    yield lines
+            lines = await run_in_threadpool(check_chunks, parser.flush())
+            if lines:
+                yield lines
+        except ClientDisconnect:
+            logger.info("批量兑奖客户端已断开")
+            return
         except Exception as e:
-            logger.error(f"调度器运行失败: {e}")
-            time.sleep(60)
+            logger.error(f"批量兑奖失败: {e}")
+            yield json.dumps({"error": f"批量兑奖失败: {e}"}, ensure_ascii=False) + "\n"
+            return
+        
+        yield json.dumps({
+            "summary": True,
+            "lottery_type_id": lottery_type_id,
+            "play": play,
+            "invalid": progress["invalid"],
+            "draws": [dict(total, draw_number=draw['draw_number'])
+                      for draw, total in zip(draws, totals) if total],
+            "timestamp": datetime.now().isoformat()
+        }, ensure_ascii=False) + "\n"
+    
+    return BodyStreamingResponse(generate(), media_type="application/x-ndjson")
 
-if __name__ == "__main__":
-    import threading
+@app.post("/combinations/filter/{lottery_type_id}")
+def filter_combinations(lottery_type_id: int, constraints: Dict[str, Any] = Body(default={}),
+                        mode: str = "count", exclude_cold: int = 0):
+    """
+    组合过滤
+    请求体为过滤条件(见CombinationFilter)；exclude_cold为排除的冷号个数(作用于第一号码区，
+    按该彩种最近COMBINATION_CONFIG['cold_window']期的特征计算)。
+    mode为count时返回满足条件的注数，为tickets时流式返回彩票文本(每行一注)。
+    计数在进程池中执行，接口本身在线程池中等待，不阻塞事件循环
+    """
+    try:
+        if not db or not analyzer:
+            raise HTTPException(status_code=500, detail="系统组件未初始化")
+        
+        game = get_lottery_game(lottery_type_id)
+        if exclude_cold > 0:
+            history = db.get_lottery_results(lottery_type_id, COMBINATION_CONFIG['cold_window'])
+            if not history:
+                raise HTTPException(status_code=400, detail="历史数据不足，无法排除冷号")
+            first_zone = ZONE_LAYOUT[game][0]['name']
+            zone_constraints = dict(constraints.get(first_zone, {}))
+            zone_constraints['exclude'] = list(zone_constraints.get('exclude', [])) + cold_numbers(
+                game, get_feature_store().get_features(game, history), exclude_cold)[first_zone]
+            constraints = dict(constraints, **{first_zone: zone_constraints})
+        
+        combination_filter = CombinationFilter(game, constraints)
+        
+        if mode == "tickets":
+            def ticket_stream():
+                for tickets in combination_filter.iter_tickets():
+                    yield format_ticket_lines(game, tickets)
+            return StreamingResponse(ticket_stream(), media_type="text/plain")
+        
+        if mode != "count":
+            raise HTTPException(status_code=400, detail=f"未知的输出模式: {mode}")
+        
+        count = combination_filter.count()
+        space_size = combination_filter.space_size()
+        return {
+            "lottery_type_id": lottery_type_id,
+            "constraints": constraints,
+            "count": count,
+            "space_size": space_size,
+            "ratio": round(count / space_size, 6),
+            "timestamp": datetime.now().isoformat()
+        }
+        
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"组合过滤失败: {e}")
+        raise HTTPException(status_code=500, detail=f"组合过滤失败: {e}")
+
+@app.post("/simulation/strategies/{lottery_type_id}")
+def simulate_strategies(lottery_type_id: int, draws: int = Query(1000000, ge=1, le=SIMULATION_CONFIG['max_draws']),
+                        tickets_per_draw: int = Query(1, ge=1, le=SIMULATION_CONFIG['max_tickets_per_draw']),
+                        seed: int = None, history_limit: int = 100, play: str = "direct"):
+    """
+    蒙特卡洛比较模型选号、随机选号和热号选号策略的期望收益与方差
+    模拟在进程池中执行，接口本身在线程池中等待，不阻塞事件循环
+    """
+    try:
+        if not db:
+            raise HTTPException(status_code=500, detail="数据库未初始化")
+        
+        historical_data = db.get_lottery_results(lottery_type_id, history_limit)
+        if not historical_data:
+            raise HTTPException(status_code=400, detail="历史数据不足")
+        
+        game = detect_game(historical_data[0]['numbers'])
+        strategies = build_strategies(historical_data, tickets_per_draw)
+        report = StrategySimulator(game, strategies, seed=seed, fc3d_play=play).run(draws)
+        
+        return {
+            "lottery_type_id": lottery_type_id,
+            "simulation": report,
+            "timestamp": datetime.now().isoformat()
+        }
+        
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"策略模拟失败: {e}")
+        raise HTTPException(status_code=500, detail=f"策略模拟失败: {e}")
+
+@app.get("/charts/{chart_type}/{lottery_type_id}")
+async def get_chart(chart_type: str, lottery_type_id: int, request: Request, limit: int = None,
+                    fmt: str = Query("png", alias="format")):
+    """
+    获取分析图表(frequency/hot_cold/sum_distribution)
+    format为png、svg或json(Plotly图表JSON)，直接返回图表内容；
+    图表按数据版本缓存，响应带ETag，If-None-Match命中时返回304；
+    数据版本取自data_versions，查询数据库和渲染都不在事件循环中执行
+    """
+    try:
+        if not analyzer:
+            raise HTTPException(status_code=500, detail="分析器未初始化")
+        
+        version = data_versions.cached(lottery_type_id) or await run_in_threadpool(data_versions.get, lottery_type_id)
+        content, etag = await analyzer.chart_renderer.get_chart(
+            lottery_type_id, chart_type, limit, fmt, request.headers.get("if-none-match"), version)
+        headers = {
+            "ETag": etag,
+            "Cache-Control": f"public, max-age={CHART_CONFIG['max_age']}"
+        }
+        if content is None:
+            return Response(status_code=304, headers=headers)
+        
+        return Response(content=content, media_type=CHART_FORMATS[fmt], headers=headers)
+        
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"图表生成失败: {e}")
+        raise HTTPException(status_code=500, detail=f"图表生成失败: {e}")
+
+@app.get("/scheduler/jobs")
+async def get_scheduler_jobs():
+    """定时任务状态"""
+    return {
+        "enabled": scheduler is not None,
+        "jobs": scheduler.status() if scheduler else [],
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.post("/scheduler/jobs/{job_name}/run")
+async def run_scheduler_job(job_name: str):
+    """立即在定时任务线程池中执行任务"""
+    if not scheduler:
+        raise HTTPException(status_code=400, detail="定时任务未启用")
+    if job_name not in scheduler.jobs:
+        raise HTTPException(status_code=404, detail=f"未知的定时任务: {job_name}")
+    if not scheduler.run_now(job_name):
+        raise HTTPException(status_code=409, detail=f"定时任务{job_name}正在执行")
+    return {"message": f"定时任务{job_name}已开始执行", "timestamp": datetime.now().isoformat()}
+
+@app.get("/profiling")
+async def list_profiles(request: Request):
+    """已保存的剖析结果和已预约剖析的定时任务"""
+    if not profiling:
+        raise HTTPException(status_code=404, detail="剖析未启用")
+    if not profile_token_valid(request):
+        raise HTTPException(status_code=403, detail="剖析令牌无效")
+    return {
+        "profiles": profiling.list(),
+        "armed_jobs": profiling.armed_jobs(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/profiling/{profile_id}")
+async def get_profile(profile_id: str, request: Request):
+    """下载剖析结果(.prof为pstats文件，.folded为火焰图折叠栈)"""
+    if not profiling:
+        raise HTTPException(status_code=404, detail="剖析未启用")
+    if not profile_token_valid(request):
+        raise HTTPException(status_code=403, detail="剖析令牌无效")
+    try:
+        path = profiling.path(profile_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     
-    # 启动定时任务调度器
-    scheduler_thread = threading.Thread(target=run_scheduler, daemon=True)
-    scheduler_thread.start()
+    with open(path, 'rb') as f:
+        content = f.read()
+    media_type = "text/plain; charset=utf-8" if profile_id.endswith('.folded') else "application/octet-stream"
+    return Response(content=content, media_type=media_type,
+                    headers={"Content-Disposition": f'attachment; filename="{profile_id}"'})
+
+@app.post("/profiling/jobs/{job_name}")
+async def profile_scheduler_job(job_name: str, request: Request, mode: str = Query("cprofile")):
+    """预约剖析定时任务的下一次执行(mode: cprofile或sample)"""
+    if not profiling:
+        raise HTTPException(status_code=404, detail="剖析未启用")
+    if not profile_token_valid(request):
+        raise HTTPException(status_code=403, detail="剖析令牌无效")
+    if not scheduler or job_name not in scheduler.jobs:
+        raise HTTPException(status_code=404, detail=f"未知的定时任务: {job_name}")
+    if mode not in PROFILE_MODES:
+        raise HTTPException(status_code=400, detail=f"未知的剖析方式: {mode}")
     
-    # 启动FastAPI服务
+    profiling.arm_job(job_name, mode)
+    return {"message": f"定时任务{job_name}的下一次执行将被剖析", "mode": mode,
+            "timestamp": datetime.now().isoformat()}
+
+# 定时任务在调度器的线程池中执行，使用各自的爬虫、分析器和数据库连接，不与接口共享
+def run_crawl_pipeline(task_crawler: LotteryCrawler, service: PredictionService, trigger: str) -> Dict[str, Any]:
+    """爬取全部彩种并使分析缓存失效，按配置在爬取后批量预测"""
+    with span('crawl_pipeline', trigger=trigger):
+        report = {"results": task_crawler.crawl_all_data()}
+        with span('invalidate_cache'):
+            data_versions.invalidate()
+        if PREDICTION_CONFIG['predict_after_crawl'] and service:
+            report["predictions"] = predict_after_crawl(service)
+    return report
+
+def daily_crawl_task():
+    """每日数据爬取任务"""
+    task_crawler = LotteryCrawler()
+    try:
+        report = run_crawl_pipeline(task_crawler, PredictionService(task_crawler.db), 'scheduler')
+        logger.info(f"每日爬取任务完成: {report['results']}")
+    finally:
+        task_crawler.close()
+
+def daily_analysis_task():
+    """每日数据分析任务"""
+    task_analyzer = LotteryDataAnalyzer()
+    try:
+        # 所有彩种的图表在进程池中并行渲染，数据未变化的图表直接复用缓存
+        with span('render_charts') as render_span:
+            report = task_analyzer.chart_renderer.render_all()
+            render_span.set('rendered', report['rendered'])
+            render_span.set('cached', report['cached'])
+        for chart in report['charts']:
+            if 'error' in chart:
+                logger.error(f"{chart['game']}{chart['chart_type']}图表生成失败: {chart['error']}")
+    finally:
+        task_analyzer.close()
+
+if __name__ == "__main__":
+    # 启动FastAPI服务(定时任务随应用生命周期启动)
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
         port=8000,
         reload=False,
         log_level="info"
-    ) 
\ No newline at end of file
+    ) 
@@ -0,0 +1,255 @@
+"""
+监控指标模块 - 彩票数据分析系统
+
+进程内的计数器、直方图和仪表，由GET /metrics按Prometheus文本格式导出。
+记录一次观测只是加锁累加几个数字，没有抓取时不做任何额外工作；
+缓存命中数、连接数等由已有对象统计的值在抓取时通过回调读取，不在热路径上维护。
+渲染进程池等子进程中的观测不会汇总到主进程，相关耗时在主进程中按提交到完成计时。
+"""
+import re
+import time
+import threading
+from bisect import bisect_left
+from functools import lru_cache, wraps
+from typing import Callable, Dict, Any, List, Tuple
+from config import METRICS_CONFIG
+
+_registry = []  # 按注册顺序导出的全部指标
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    """格式化标签: {name="value",...}"""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value: Any) -> str:
+    """转义标签值中的反斜杠、双引号和换行"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value: float) -> str:
+    """格式化样本值"""
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """指标基类"""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        """初始化并注册指标"""
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        """按标签名顺序生成标签值元组"""
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        """(名称后缀, 标签, 值)样本列表"""
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        """导出为Prometheus文本格式的行"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        """计数增加amount"""
+        if not METRICS_CONFIG['enabled']:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        """计数样本"""
+        with self._lock:
+            values = list(self._values.items())
+        return [('_total', _format_labels(self.labelnames, key), value) for key, value in values]
+
+
+class Gauge(_Metric):
+    """可增可减的仪表"""
+
+    kind = 'gauge'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        """数值增加amount"""
+        if not METRICS_CONFIG['enabled']:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        """数值减少amount"""
+        self.inc(-amount, **labels)
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        """当前值样本"""
+        with self._lock:
+            values = list(self._values.items())
+        return [('', _format_labels(self.labelnames, key), value) for key, value in values]
+
+
+class _Timer:
+    """计时上下文管理器，退出时把耗时记录到直方图"""
+
+    __slots__ = ('histogram', 'labels', 'start')
+
+    def __init__(self, histogram: 'Histogram', labels: Dict[str, Any]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> '_Timer':
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+class Histogram(_Metric):
+    """耗时直方图(按桶上限累计计数，附带总和与总次数)"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = None):
+        """初始化直方图，buckets为递增的桶上限(秒)"""
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets or METRICS_CONFIG['buckets'])
+
+    def observe(self, value: float, **labels) -> None:
+        """记录一次观测值"""
+        if not METRICS_CONFIG['enabled']:
+            return
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def time(self, **labels) -> _Timer:
+        """计时上下文管理器: with histogram.time(label=value): ..."""
+        return _Timer(self, labels)
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        """各桶的累计计数、总和与总次数"""
+        with self._lock:
+            values = [(key, list(state[0]), state[1], state[2]) for key, state in self._values.items()]
+
+        samples = []
+        for key, counts, total, count in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = 'le="' + _format_value(bound) + '"'
+                samples.append(('_bucket', _format_labels(self.labelnames, key, le), cumulative))
+            labels = _format_labels(self.labelnames, key)
+            samples.append(('_sum', labels, total))
+            samples.append(('_count', labels, count))
+        return samples
+
+
+class CallbackMetric(_Metric):
+    """抓取时调用回调函数取值的指标，回调返回{标签值元组: 值}"""
+
+    def __init__(self, name: str, documentation: str, kind: str, labelnames: Tuple[str, ...] = (),
+                 callback: Callable[[], Dict[Tuple[str, ...], float]] = None):
+        """初始化指标，kind为counter或gauge"""
+        super().__init__(name, documentation, labelnames)
+        self.kind = kind
+        self.callback = callback
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        """调用回调函数生成样本，回调失败时不导出样本"""
+        if self.callback is None:
+            return []
+        try:
+            values = self.callback()
+        except Exception:
+            return []
+        suffix = '_total' if self.kind == 'counter' else ''
+        return [(suffix, _format_labels(self.labelnames, key), value) for key, value in values.items()]
+
+
+def timed(histogram: Histogram, **labels) -> Callable:
+    """装饰器: 把函数每次调用的耗时记录到直方图"""
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with histogram.time(**labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@lru_cache(maxsize=256)
+def statement_label(query: str) -> str:
+    """SQL语句的标签: 语句类型 + 第一个表名，如select lottery_results"""
+    match = re.match(r'\s*(\w+)', query)
+    operation = match.group(1).lower() if match else 'unknown'
+    table = re.search(r'\b(?:FROM|INTO|UPDATE|JOIN)\s+`?(\w+)', query, re.IGNORECASE)
+    return f"{operation} {table.group(1)}" if table else operation
+
+
+def render() -> str:
+    """导出全部指标的Prometheus文本格式"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+# 爬虫
+CRAWLER_FETCH_SECONDS = Histogram('lottery_crawler_fetch_seconds', '爬虫页面请求耗时(秒)', ('source',))
+CRAWLER_FETCHES = Counter('lottery_crawler_fetches', '爬虫页面请求次数', ('source', 'status'))
+CRAWLER_PARSE_SECONDS = Histogram('lottery_crawler_parse_seconds', '爬虫页面解析耗时(秒)', ('source',))
+CRAWLER_RETRIES = Counter('lottery_crawler_retries', '爬虫页面请求重试次数', ('source', 'reason'))
+CRAWLER_CIRCUIT_OPEN = CallbackMetric('lottery_crawler_circuit_open', '数据源熔断器是否打开(1为打开或试探中)', 'gauge',
+                                      ('source',))
+CRAWLER_CRAWL_SECONDS = Histogram('lottery_crawler_crawl_seconds', '单个彩种爬取并入库的耗时(秒)', ('source',),
+                                  buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600))
+
+# 数据库
+DB_STATEMENT_SECONDS = Histogram('lottery_db_statement_seconds', '数据库语句执行耗时(秒)，含等待连接',
+                                 ('method', 'statement'))
+DB_ERRORS = Counter('lottery_db_errors', '数据库语句执行失败次数', ('method', 'statement'))
+DB_LOCK_WAIT_SECONDS = Histogram('lottery_db_connection_wait_seconds', '等待共享数据库连接的耗时(秒)')
+DB_IN_FLIGHT = Gauge('lottery_db_statements_in_flight', '正在执行或等待连接的数据库语句数')
+DB_CONNECTIONS = CallbackMetric('lottery_db_connections', '已打开的数据库连接数', 'gauge')
+
+# 分析与预测
+ANALYSIS_SECONDS = Histogram('lottery_analysis_seconds', '分析计算耗时(秒)', ('kernel',))
+MODEL_SECONDS = Histogram('lottery_model_seconds', '模型训练和预测耗时(秒)', ('model_type', 'phase'))
+MODEL_ERRORS = Counter('lottery_model_errors', '模型训练或预测失败次数', ('model_type',))
+
+# 图表
+CHART_RENDER_SECONDS = Histogram('lottery_chart_render_seconds', '图表从提交到渲染完成的耗时(秒)',
+                                 ('chart_type', 'format'))
+CHART_REQUESTS = Counter('lottery_chart_requests', '图表请求次数(按缓存结果)', ('chart_type', 'result'))
+CHART_RENDERS_IN_FLIGHT = Gauge('lottery_chart_renders_in_flight', '渲染进程池中排队或正在渲染的图表数')
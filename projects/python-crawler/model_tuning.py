@@ -0,0 +1,199 @@
+"""
+模型调参模块 - 彩票数据分析系统
+
+对预测模型的参数做网格搜索或随机搜索，用滚动回测(walk-forward)评估每组参数：
+在回测区间内逐期只用该期之前的数据训练并预测，按准确率公式打分后取平均。
+多进程并行时，历史开奖的打包号码通过共享内存传给各进程，不随每个任务序列化；
+各进程只在启动时构建一次特征。最优参数可写回prediction_models.parameters。
+"""
+import os
+import math
+import time
+import itertools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import List, Dict, Any, Tuple
+from loguru import logger
+from config import TUNING_CONFIG, FEATURE_STORE_CONFIG
+from feature_store import build_features
+from number_encoding import GAME_ZONES, detect_game, encode_batch, format_numbers, unpack_matrices
+from prediction_models import PredictionModelFactory, score_batch
+
+# 进程内的回测数据: 彩种 -> {'packed', 'features', 'draws'}
+_worker_data = {}
+
+
+def _prepare_game(game: str, packed: np.ndarray, window: int) -> Dict[str, Any]:
+    """从按时间升序的打包号码构建回测所需的特征和号码字典"""
+    matrices = unpack_matrices(game, packed)
+    draws = [{'numbers': format_numbers(game, {zone: matrix[index].tolist() for zone, matrix in matrices.items()})}
+             for index in range(len(packed))]
+    return {'packed': packed, 'features': build_features(game, packed, window), 'draws': draws}
+
+
+def _attach_history(segments: List[Tuple[str, str, int]], window: int) -> None:
+    """进程初始化: 连接共享内存中的历史号码并构建特征"""
+    for game, name, rows in segments:
+        block = shared_memory.SharedMemory(name=name)
+        packed = np.ndarray((rows,), dtype=np.uint64, buffer=block.buf).copy()
+        block.close()
+        _worker_data[game] = _prepare_game(game, packed, window)
+
+
+def backtest(model_type: str, parameters: Dict[str, Any], game: str, test_draws: int,
+             min_train_draws: int) -> Dict[str, Any]:
+    """
+    对单个彩种做滚动回测: 第t期只用前t期的数据训练和预测
+    特征的每一行只依赖当期及之前的开奖，按行截取前缀即可避免用到未来数据
+    """
+    data = _worker_data[game]
+    rows = len(data['packed'])
+    start = max(min_train_draws, rows - test_draws)
+    if start >= rows:
+        raise ValueError(f"{game}历史数据不足，至少需要{min_train_draws + 1}期")
+
+    predictions = []
+    for step in range(start, rows):
+        model = PredictionModelFactory.create_model(model_type, parameters)
+        history = data['draws'][step - 1::-1]
+        features = {key: value[:step] for key, value in data['features'].items()}
+        if not model.train(history, features):
+            raise ValueError("模型训练失败")
+        predictions.append(model.predict(history))
+
+    scores = score_batch(game, data['packed'][start:], encode_batch(game, predictions))
+    return {'game': game, 'draws': len(scores), 'score': float(scores.mean())}
+
+
+def _evaluate_task(model_type: str, parameters: Dict[str, Any], games: List[str], test_draws: int,
+                   min_train_draws: int) -> Dict[str, Any]:
+    """进程任务: 评估一组参数在所有彩种上的回测得分"""
+    started = time.perf_counter()
+    try:
+        results = [backtest(model_type, parameters, game, test_draws, min_train_draws) for game in games]
+        return {'parameters': parameters, 'score': round(float(np.mean([r['score'] for r in results])), 6),
+                'games': {r['game']: round(r['score'], 6) for r in results},
+                'seconds': round(time.perf_counter() - started, 4)}
+    except Exception as e:
+        return {'parameters': parameters, 'score': None, 'error': str(e),
+                'seconds': round(time.perf_counter() - started, 4)}
+
+
+def parameter_sets(search_space: Dict[str, List[Any]], mode: str = 'grid', samples: int = None,
+                   seed: int = None) -> List[Dict[str, Any]]:
+    """
+    生成候选参数组合
+    grid为全部组合，组合数超过TUNING_CONFIG['max_samples']时拒绝；
+    random为从全部组合中不重复地随机抽取samples组(按序号抽取，不展开全部组合)
+    """
+    if not search_space:
+        raise ValueError("参数搜索空间为空")
+    if mode not in ('grid', 'random'):
+        raise ValueError(f"未知的搜索方式: {mode}")
+    if any(not isinstance(values, list) or not values for values in search_space.values()):
+        raise ValueError("参数搜索空间的每个参数须为非空列表")
+
+    names = sorted(search_space)
+    sizes = [len(search_space[name]) for name in names]
+    total = math.prod(sizes)
+    if mode == 'grid':
+        if total > TUNING_CONFIG['max_samples']:
+            raise ValueError(f"参数组合数{total}超过上限{TUNING_CONFIG['max_samples']}，请缩小搜索空间或使用随机搜索")
+        return [dict(zip(names, values)) for values in itertools.product(*(search_space[name] for name in names))]
+
+    samples = min(samples or TUNING_CONFIG['random_samples'], total)
+    rng = np.random.default_rng(TUNING_CONFIG['seed'] if seed is None else seed)
+    candidates = []
+    for index in sorted(rng.choice(total, size=samples, replace=False).tolist()):
+        # 按itertools.product的顺序(最后一个参数变化最快)把序号还原为参数组合
+        values = {}
+        for name, size in zip(reversed(names), reversed(sizes)):
+            index, position = divmod(index, size)
+            values[name] = search_space[name][position]
+        candidates.append({name: values[name] for name in names})
+    return candidates
+
+
+class ParameterSweep:
+    """模型参数搜索"""
+
+    def __init__(self, model_type: str, search_space: Dict[str, List[Any]] = None, mode: str = 'grid',
+                 samples: int = None, seed: int = None, workers: int = None, test_draws: int = None):
+        """初始化参数搜索，search_space未指定时使用TUNING_CONFIG中该模型的默认搜索空间"""
+        if not PredictionModelFactory.is_supported(model_type):
+            raise ValueError(f"未知的模型类型: {model_type}")
+
+        self.model_type = model_type
+        self.search_space = search_space or TUNING_CONFIG['search_spaces'].get(model_type)
+        self.candidates = parameter_sets(self.search_space, mode, samples, seed)
+        self.mode = mode
+        self.workers = workers or TUNING_CONFIG['workers'] or os.cpu_count() or 1
+        self.test_draws = test_draws or TUNING_CONFIG['test_draws']
+        self.min_train_draws = TUNING_CONFIG['min_train_draws']
+        self.window = FEATURE_STORE_CONFIG['rolling_window']
+
+    def run(self, histories: List[List[Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        在一个或多个彩种的历史数据(数据库格式，最新一期在前)上评估全部候选参数
+        多个彩种时按各彩种回测得分的平均值排名
+        """
+        packed_by_game = {}
+        for history in histories:
+            if history:
+                game = detect_game(history[0]['numbers'])
+                packed_by_game[game] = encode_batch(game, [result['numbers'] for result in history[::-1]])
+        if not packed_by_game:
+            raise ValueError("历史数据为空")
+
+        games = sorted(packed_by_game, key=list(GAME_ZONES).index)
+        args = [(self.model_type, parameters, games, self.test_draws, self.min_train_draws)
+                for parameters in self.candidates]
+        workers = min(self.workers, len(args))
+        logger.info(f"参数搜索开始: {self.model_type}, {len(args)}组参数, {', '.join(games)}, {workers}个进程")
+        started = time.perf_counter()
+
+        if workers == 1:
+            for game in games:
+                _worker_data[game] = _prepare_game(game, packed_by_game[game], self.window)
+            try:
+                results = [_evaluate_task(*arg) for arg in args]
+            finally:
+                _worker_data.clear()
+        else:
+            results = self._run_parallel(packed_by_game, args, workers)
+
+        ranked = sorted((r for r in results if r['score'] is not None), key=lambda r: -r['score'])
+        if not ranked:
+            raise ValueError(f"所有参数组合回测失败: {results[0].get('error')}")
+
+        return {
+            'model_type': self.model_type,
+            'mode': self.mode,
+            'games': games,
+            'test_draws': self.test_draws,
+            'best_parameters': ranked[0]['parameters'],
+            'best_score': ranked[0]['score'],
+            'results': ranked + [r for r in results if r['score'] is None],
+            'seconds': round(time.perf_counter() - started, 4)
+        }
+
+    def _run_parallel(self, packed_by_game: Dict[str, np.ndarray], args: List[tuple],
+                      workers: int) -> List[Dict[str, Any]]:
+        """把历史号码放入共享内存，多进程评估全部候选参数"""
+        blocks = []
+        try:
+            segments = []
+            for game, packed in packed_by_game.items():
+                block = shared_memory.SharedMemory(create=True, size=max(packed.nbytes, 1))
+                np.ndarray(packed.shape, dtype=np.uint64, buffer=block.buf)[:] = packed
+                blocks.append(block)
+                segments.append((game, block.name, len(packed)))
+
+            with ProcessPoolExecutor(max_workers=workers, initializer=_attach_history,
+                                     initargs=(segments, self.window)) as executor:
+                return list(executor.map(_evaluate_task, *zip(*args)))
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
@@ -0,0 +1,206 @@
+"""
+号码编码模块 - 彩票数据分析系统
+
+将各彩种的开奖号码按号码区编码为位掩码，并打包成单个uint64，
+供批量评估等向量化计算使用。
+"""
+import numpy as np
+from typing import List, Dict, Any, Union
+
+
+# 号码区定义: (区名, 最小号码, 最大号码, 每注选号个数)
+GAME_ZONES = {
+    'DLT': [('front', 1, 35, 5), ('back', 1, 12, 2)],
+    'SSQ': [('red', 1, 33, 6), ('blue', 1, 16, 1)],
+    'FC3D': [('hundred', 0, 9, 1), ('ten', 0, 9, 1), ('unit', 0, 9, 1)],
+}
+
+
+def _build_layout(zones) -> List[Dict[str, Any]]:
+    """计算每个号码区在打包整数中的位偏移和掩码"""
+    layout = []
+    offset = 0
+    for name, low, high, picks in zones:
+        width = high - low + 1
+        layout.append({
+            'name': name,
+            'low': low,
+            'high': high,
+            'picks': picks,
+            'offset': offset,
+            'width': width,
+            'mask': np.uint64(((1 << width) - 1) << offset)
+        })
+        offset += width
+    return layout
+
+
+ZONE_LAYOUT = {game: _build_layout(zones) for game, zones in GAME_ZONES.items()}
+
+# 0-255的置位数查表，用于不支持np.bitwise_count的NumPy版本
+_POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def detect_game(numbers: Dict[str, Any]) -> str:
+    """根据号码字段判断彩票类型"""
+    if 'front' in numbers:  # 大乐透
+        return 'DLT'
+    elif 'red' in numbers:  # 双色球
+        return 'SSQ'
+    elif 'main' in numbers:  # 福彩3D
+        return 'FC3D'
+    raise ValueError("未知的彩票类型")
+
+
+def zone_values(game: str, numbers: Dict[str, Any]) -> Dict[str, List[int]]:
+    """把号码字典转换为各号码区的整数列表"""
+    if game == 'DLT':
+        return {
+            'front': [int(num) for num in numbers['front']],
+            'back': [int(num) for num in numbers['back']]
+        }
+    elif game == 'SSQ':
+        return {
+            'red': [int(num) for num in numbers['red']],
+            'blue': [int(numbers['blue'])]
+        }
+    elif game == 'FC3D':
+        return {
+            'hundred': [int(numbers['hundred'])],
+            'ten': [int(numbers['ten'])],
+            'unit': [int(numbers['unit'])]
+        }
+    raise ValueError(f"未知的彩票类型: {game}")
+
+
+def numbers_valid(game: str, numbers: Dict[str, Any]) -> bool:
+    """检查号码字典是否符合选号规则: 各号码区的号码个数、范围正确且不重复"""
+    try:
+        values = zone_values(game, numbers)
+    except (KeyError, TypeError, ValueError):
+        return False
+    for zone in ZONE_LAYOUT[game]:
+        zone_numbers = values[zone['name']]
+        if len(zone_numbers) != zone['picks'] or len(set(zone_numbers)) != zone['picks']:
+            return False
+        if any(num < zone['low'] or num > zone['high'] for num in zone_numbers):
+            return False
+    return True
+
+
+def format_number(game: str, num: int) -> str:
+    """把单个号码格式化为字符串: 大乐透/双色球补齐两位，福彩3D为一位数字"""
+    return str(num) if game == 'FC3D' else f"{num:02d}"
+
+
+def format_numbers(game: str, values: Dict[str, List[int]]) -> Dict[str, Any]:
+    """把各号码区的整数列表转换回号码字典格式"""
+    if game == 'DLT':
+        return {
+            'front': [f"{num:02d}" for num in sorted(values['front'])],
+            'back': [f"{num:02d}" for num in sorted(values['back'])]
+        }
+    elif game == 'SSQ':
+        return {
+            'red': [f"{num:02d}" for num in sorted(values['red'])],
+            'blue': f"{values['blue'][0]:02d}"
+        }
+    elif game == 'FC3D':
+        hundred, ten, unit = values['hundred'][0], values['ten'][0], values['unit'][0]
+        return {
+            'main': f"{hundred}{ten}{unit}",
+            'hundred': hundred,
+            'ten': ten,
+            'unit': unit
+        }
+    raise ValueError(f"未知的彩票类型: {game}")
+
+
+def encode_numbers(game: str, numbers: Dict[str, Any]) -> int:
+    """把单个号码字典编码为打包整数"""
+    values = zone_values(game, numbers)
+    packed = 0
+    for zone in ZONE_LAYOUT[game]:
+        for num in values[zone['name']]:
+            packed |= 1 << (zone['offset'] + num - zone['low'])
+    return packed
+
+
+def is_valid_packed(game: str, packed: int) -> bool:
+    """检查打包号码是否在各号码区内恰好选了规定个数的号码"""
+    layout = ZONE_LAYOUT[game]
+    if packed < 0 or packed >> (layout[-1]['offset'] + layout[-1]['width']):
+        return False
+    value = np.uint64(packed)
+    return all(int(popcount(value & zone['mask'])) == zone['picks'] for zone in layout)
+
+
+def encode_batch(game: str, numbers_list: List[Dict[str, Any]]) -> np.ndarray:
+    """把号码字典列表编码为uint64数组"""
+    return np.fromiter((encode_numbers(game, numbers) for numbers in numbers_list),
+                       dtype=np.uint64, count=len(numbers_list))
+
+
+def pack_zone(game: str, zone_name: str, matrix: np.ndarray) -> np.ndarray:
+    """把某号码区的号码矩阵(N, 选号个数)编码为该区的位掩码"""
+    zone = next(z for z in ZONE_LAYOUT[game] if z['name'] == zone_name)
+    shifts = (np.asarray(matrix, dtype=np.int64) - zone['low'] + zone['offset']).astype(np.uint64)
+    return np.bitwise_or.reduce(np.left_shift(np.uint64(1), shifts), axis=-1)
+
+
+def pack_matrices(game: str, matrices: Dict[str, np.ndarray]) -> np.ndarray:
+    """把各号码区的号码矩阵合并编码为打包整数数组"""
+    packed = None
+    for zone in ZONE_LAYOUT[game]:
+        zone_bits = pack_zone(game, zone['name'], matrices[zone['name']])
+        packed = zone_bits if packed is None else packed | zone_bits
+    return packed
+
+
+def unpack_matrices(game: str, packed: np.ndarray) -> Dict[str, np.ndarray]:
+    """把打包整数数组解码为各号码区的号码矩阵(N, 选号个数)，号码升序"""
+    packed = np.ascontiguousarray(packed, dtype=np.uint64).reshape(-1)
+    bits = np.unpackbits(packed.view(np.uint8).reshape(-1, 8), axis=1, bitorder='little')
+    matrices = {}
+    for zone in ZONE_LAYOUT[game]:
+        zone_bits = bits[:, zone['offset']:zone['offset'] + zone['width']]
+        columns = np.nonzero(zone_bits)[1].reshape(len(packed), zone['picks'])
+        matrices[zone['name']] = (columns + zone['low']).astype(np.int16)
+    return matrices
+
+
+def popcount(values: Union[np.ndarray, int]) -> np.ndarray:
+    """逐元素统计uint64中置位的个数"""
+    values = np.asarray(values, dtype=np.uint64)
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values)
+    flat = np.ascontiguousarray(values).reshape(-1)
+    counts = _POPCOUNT_TABLE[flat.view(np.uint8)].reshape(-1, 8).sum(axis=1, dtype=np.uint8)
+    return counts.reshape(values.shape)
+
+
+def zone_match_counts(game: str, actual: np.ndarray, predicted: np.ndarray) -> Dict[str, np.ndarray]:
+    """计算两组打包号码在各号码区的命中个数，支持广播"""
+    common = np.bitwise_and(np.asarray(actual, dtype=np.uint64),
+                            np.asarray(predicted, dtype=np.uint64))
+    return {zone['name']: popcount(common & zone['mask']) for zone in ZONE_LAYOUT[game]}
+
+
+def random_packed(game: str, rng: np.random.Generator, count: int,
+                  pools: Dict[str, List[int]] = None) -> np.ndarray:
+    """
+    批量生成随机打包号码
+    每个号码区对(count, 候选号码数)的均匀随机数做argsort取前k列，得到不放回抽样；
+    pools可为部分号码区指定候选号码池，未指定的号码区使用全部号码
+    """
+    matrices = {}
+    for zone in ZONE_LAYOUT[game]:
+        candidates = np.arange(zone['low'], zone['high'] + 1)
+        if pools and pools.get(zone['name']):
+            candidates = np.asarray([int(num) for num in pools[zone['name']]])
+        if zone['picks'] == 1:
+            matrices[zone['name']] = candidates[rng.integers(0, len(candidates), size=(count, 1))]
+        else:
+            order = np.argsort(rng.random((count, len(candidates))), axis=1)[:, :zone['picks']]
+            matrices[zone['name']] = candidates[order]
+    return pack_matrices(game, matrices)
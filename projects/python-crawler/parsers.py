@@ -0,0 +1,163 @@
+"""
+页面解析模块 - 彩票数据分析系统
+
+DATA_SOURCES中的'parser'名称(dlt_parser/fc3d_parser/ssq_parser)对应的历史开奖页解析器。
+页面结构: table.historylist的tbody中每行依次为期号、开奖日期、号码球(span.red/span.blue)、
+销售额和奖池。解析后端:
+- lxml: 先按标记截取开奖表格片段，只对该片段用lxml.etree建树(不使用lxml.html的元素类)并逐行读取单元格
+- bs4: BeautifulSoup + html.parser，解析整页，作为对照和兼容后端
+两种后端的输出完全相同，默认后端由CRAWLER_CONFIG['parser_backend']指定。
+号码个数或范围不符合该彩种选号规则的行(页面改版、数据源录入错误)记录警告后跳过。
+"""
+from typing import List, Dict, Any, Optional
+from loguru import logger
+from config import CRAWLER_CONFIG
+from number_encoding import numbers_valid
+
+_TABLE_MARKER = 'class="historylist"'
+
+
+def _text(element) -> str:
+    """元素的文本(含子元素)，没有子元素时直接取text"""
+    text = element.text if len(element) == 0 else ''.join(element.itertext())
+    return (text or '').strip()
+
+
+def _amount(text: str) -> Optional[float]:
+    """解析带千分位的金额，无法解析时返回None"""
+    try:
+        return float(text.replace(',', ''))
+    except ValueError:
+        return None
+
+
+class HistoryPageParser:
+    """历史开奖页解析器基类"""
+
+    backend = None
+
+    def __init__(self, game: str):
+        """初始化解析器"""
+        self.game = game
+
+    def parse(self, html: str) -> List[Dict[str, Any]]:
+        """解析页面中的全部开奖记录"""
+        raise NotImplementedError("子类必须实现parse方法")
+
+    def _result(self, draw_number: str, draw_date: str, red: List[str], blue: List[str],
+                sales_amount: str, prize_pool: str) -> Optional[Dict[str, Any]]:
+        """由单元格文本组装开奖记录，号码不符合选号规则时返回None"""
+        if self.game == 'DLT':
+            numbers = {'front': red, 'back': blue}
+        elif self.game == 'SSQ':
+            numbers = {'red': red, 'blue': blue[0] if len(blue) == 1 else None}
+        else:
+            number = ''.join(red)
+            numbers = {'main': number, 'hundred': None, 'ten': None, 'unit': None}
+            if len(number) == 3 and number.isdigit():
+                numbers.update(hundred=int(number[0]), ten=int(number[1]), unit=int(number[2]))
+        if not draw_number or not numbers_valid(self.game, numbers):
+            logger.warning(f"{self.game}开奖记录格式错误，已跳过: 期号{draw_number or '-'} 红球{red} 蓝球{blue}")
+            return None
+        return {
+            'draw_number': draw_number,
+            'draw_date': draw_date,
+            'numbers': numbers,
+            'sales_amount': _amount(sales_amount),
+            'prize_pool': _amount(prize_pool)
+        }
+
+
+class LxmlHistoryParser(HistoryPageParser):
+    """lxml后端: 只解析开奖表格片段"""
+
+    backend = 'lxml'
+    _rows = None  # 编译后的XPath，第一次解析时创建
+
+    def parse(self, html: str) -> List[Dict[str, Any]]:
+        """截取开奖表格后逐行读取，页面中找不到表格标记时解析整页"""
+        from lxml import etree
+
+        if LxmlHistoryParser._rows is None:
+            LxmlHistoryParser._rows = etree.XPath(
+                '//table[contains(concat(" ", normalize-space(@class), " "), " historylist ")]/tbody/tr')
+
+        marker = html.find(_TABLE_MARKER)
+        start = html.rfind('<table', 0, marker) if marker >= 0 else -1
+        end = html.find('</table>', marker) if start >= 0 else -1
+        if end >= 0:
+            html = html[start:end + len('</table>')]
+        root = etree.fromstring(html, etree.HTMLParser())
+        if root is None:
+            return []
+
+        results = []
+        for row in LxmlHistoryParser._rows(root):
+            cells = row.findall('td')
+            if len(cells) < 5:
+                continue
+            red, blue = [], []
+            for ball in cells[2].iterfind('span'):
+                classes = (ball.get('class') or '').split()
+                if 'red' in classes:
+                    red.append(_text(ball))
+                elif 'blue' in classes:
+                    blue.append(_text(ball))
+            result = self._result(_text(cells[0]), _text(cells[1]), red, blue, _text(cells[3]), _text(cells[4]))
+            if result is not None:
+                results.append(result)
+        return results
+
+
+class SoupHistoryParser(HistoryPageParser):
+    """BeautifulSoup后端: 解析整页"""
+
+    backend = 'bs4'
+
+    def parse(self, html: str) -> List[Dict[str, Any]]:
+        """用CSS选择器读取开奖表格的每一行"""
+        from bs4 import BeautifulSoup
+
+        soup = BeautifulSoup(html, 'html.parser')
+        results = []
+        for row in soup.select('table.historylist tbody tr'):
+            cells = row.find_all('td')
+            if len(cells) < 5:
+                continue
+            red = [ball.get_text(strip=True) for ball in cells[2].select('span.red')]
+            blue = [ball.get_text(strip=True) for ball in cells[2].select('span.blue')]
+            result = self._result(cells[0].get_text(strip=True), cells[1].get_text(strip=True),
+                                  red, blue, cells[3].get_text(strip=True), cells[4].get_text(strip=True))
+            if result is not None:
+                results.append(result)
+        return results
+
+
+class ParserFactory:
+    """解析器工厂: 按DATA_SOURCES中的解析器名称和后端创建解析器"""
+
+    PARSERS = {
+        'dlt_parser': 'DLT',
+        'fc3d_parser': 'FC3D',
+        'ssq_parser': 'SSQ'
+    }
+
+    BACKENDS = {
+        'lxml': LxmlHistoryParser,
+        'bs4': SoupHistoryParser
+    }
+
+    @staticmethod
+    def create_parser(name: str, backend: str = None) -> HistoryPageParser:
+        """创建解析器，未指定backend时使用CRAWLER_CONFIG['parser_backend']"""
+        if name not in ParserFactory.PARSERS:
+            raise ValueError(f"未知的解析器: {name}")
+        backend = backend or CRAWLER_CONFIG['parser_backend']
+        if backend not in ParserFactory.BACKENDS:
+            raise ValueError(f"未知的解析后端: {backend}")
+        return ParserFactory.BACKENDS[backend](ParserFactory.PARSERS[name])
+
+    @staticmethod
+    def is_supported(name: str) -> bool:
+        """是否支持该解析器"""
+        return name in ParserFactory.PARSERS
@@ -2,13 +2,28 @@
 预测模型模块 - 彩票数据分析系统
 """
 import numpy as np
-import pandas as pd
-from typing import List, Dict, Any, Tuple
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.neural_network import MLPRegressor
-from sklearn.preprocessing import StandardScaler
+from typing import List, Dict, Any, Tuple, Union
 from loguru import logger
 from config import MODEL_CONFIG
+from number_encoding import ZONE_LAYOUT, detect_game, encode_batch, format_number, format_numbers, \
+    zone_match_counts
+from feature_store import get_feature_store
+
+
+def score_batch(game: str, actual: np.ndarray, predicted: np.ndarray) -> np.ndarray:
+    """按各彩种准确率公式批量计算打包号码的准确率，支持广播"""
+    counts = zone_match_counts(game, actual, predicted)
+    
+    if game == 'DLT':  # 大乐透
+        accuracy = (counts['front'] / 5 + counts['back'] / 2) / 2
+    elif game == 'SSQ':  # 双色球
+        accuracy = (counts['red'] / 6 + counts['blue']) / 2
+    elif game == 'FC3D':  # 福彩3D
+        accuracy = (counts['hundred'].astype(np.float64) + counts['ten'] + counts['unit']) / 3
+    else:
+        raise ValueError(f"未知的彩票类型: {game}")
+    
+    return np.round(accuracy, 4)
 
 
 class BasePredictionModel:
@@ -18,9 +33,18 @@ class BasePredictionModel:
         """初始化模型"""
         self.model_name = model_name
         self.model_type = model_type
+        self.game = None
         self.is_trained = False
     
-    def train(self, data: List[Dict[str, Any]]) -> bool:
+    def get_features(self, data: List[Dict[str, Any]],
+                     features: Dict[str, np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """获取训练特征，未传入时从共享特征存储中取，子类不再自行解析历史数据"""
+        self.game = detect_game(data[0]['numbers'])
+        if features is None:
+            features = get_feature_store().get_features(self.game, data)
+        return features
+    
+    def train(self, data: List[Dict[str, Any]], features: Dict[str, np.ndarray] = None) -> bool:
         """训练模型"""
         raise NotImplementedError("子类必须实现train方法")
     
@@ -31,51 +55,55 @@ class BasePredictionModel:
     def evaluate(self, actual: Dict[str, Any], predicted: Dict[str, Any]) -> float:
         """评估模型准确率"""
         raise NotImplementedError("子类必须实现evaluate方法")
+    
+    def evaluate_batch(self, actual: Union[List[Dict[str, Any]], np.ndarray],
+                       predicted: Union[List[Dict[str, Any]], np.ndarray],
+                       game: str = None) -> np.ndarray:
+        """批量评估模型准确率"""
+        raise NotImplementedError("子类必须实现evaluate_batch方法")
+    
+    def score_numbers(self, data: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+        """
+        各号码区每个号码的得分(按号码从小到大排列)，供集成预测加权合并
+        默认把预测号码记为1分，子类可返回更细的得分
+        """
+        game = self.game or detect_game(data[0]['numbers'])
+        prediction = self.predict(data)
+        packed = encode_batch(game, [prediction])
+        bits = np.unpackbits(packed.view(np.uint8), bitorder='little')
+        return {zone['name']: bits[zone['offset']:zone['offset'] + zone['width']].astype(np.float64)
+                for zone in ZONE_LAYOUT[game]}
 
 
 class FrequencyAnalysisModel(BasePredictionModel):
     """频率分析模型"""
     
-    def __init__(self):
-        """初始化频率分析模型"""
+    def __init__(self, parameters: Dict[str, Any] = None):
+        """初始化频率分析模型，parameters为数据库中保存的模型参数，覆盖默认配置"""
         super().__init__("频率分析模型", "FREQUENCY")
         self.frequency_data = {}
-        self.config = MODEL_CONFIG['frequency_model']
+        self.config = {**MODEL_CONFIG['frequency_model'], **(parameters or {})}
     
-    def train(self, data: List[Dict[str, Any]]) -> bool:
+    def train(self, data: List[Dict[str, Any]], features: Dict[str, np.ndarray] = None) -> bool:
         """训练频率分析模型"""
         try:
             logger.info("开始训练频率分析模型")
             
-            # 统计号码出现频率
-            number_counts = {}
-            total_draws = len(data)
-            
-            for result in data:
-                numbers = result['numbers']
-                
-                # 处理不同类型的彩票
-                if 'front' in numbers:  # 大乐透
-                    for num in numbers['front']:
-                        number_counts[num] = number_counts.get(num, 0) + 1
-                    for num in numbers['back']:
-                        number_counts[num] = number_counts.get(num, 0) + 1
-                
-                elif 'red' in numbers:  # 双色球
-                    for num in numbers['red']:
-                        number_counts[num] = number_counts.get(num, 0) + 1
-                    number_counts[numbers['blue']] = number_counts.get(numbers['blue'], 0) + 1
-                
-                elif 'main' in numbers:  # 福彩3D
-                    for digit in [numbers['hundred'], numbers['ten'], numbers['unit']]:
-                        number_counts[str(digit)] = number_counts.get(str(digit), 0) + 1
+            features = self.get_features(data, features)
             
-            # 计算加权频率
+            # 按号码区统计窗口内号码出现频率并加权
             self.frequency_data = {}
-            for num, count in number_counts.items():
-                frequency = count / total_draws
-                weighted_frequency = frequency * self.config['weight_factor']
-                self.frequency_data[num] = weighted_frequency
+            for zone in ZONE_LAYOUT[self.game]:
+                onehot = features[f"{zone['name']}_onehot"][-self.config['window_size']:]
+                total_draws = len(onehot)
+                counts = onehot.sum(axis=0)
+                
+                self.frequency_data[zone['name']] = {}
+                for index, count in enumerate(counts):
+                    frequency = count / total_draws
+                    weighted_frequency = frequency * self.config['weight_factor']
+                    num = format_number(self.game, zone['low'] + index)
+                    self.frequency_data[zone['name']][num] = float(weighted_frequency)
             
             self.is_trained = True
             logger.info("频率分析模型训练完成")
@@ -108,18 +136,27 @@ class FrequencyAnalysisModel(BasePredictionModel):
             logger.error(f"频率分析预测失败: {e}")
             return {}
     
+    def score_numbers(self, data: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+        """以加权频率作为各号码的得分"""
+        if not self.is_trained:
+            raise ValueError("模型尚未训练")
+        return {zone: np.fromiter(frequencies.values(), dtype=np.float64, count=len(frequencies))
+                for zone, frequencies in self.frequency_data.items()}
+    
+    def _top_numbers(self, zone_name: str, count: int) -> List[str]:
+        """按频率从高到低选出某号码区的号码"""
+        sorted_numbers = sorted(self.frequency_data[zone_name].items(), 
+                              key=lambda x: x[1], reverse=True)
+        return [num for num, _ in sorted_numbers[:count]]
+    
     def _predict_dlt(self) -> Dict[str, Any]:
         """预测大乐透"""
-        # 按频率排序选择号码
-        sorted_numbers = sorted(self.frequency_data.items(), 
-                              key=lambda x: x[1], reverse=True)
-        
         # 前区选择5个号码
-        front_numbers = [num for num, _ in sorted_numbers[:35]][:5]
+        front_numbers = self._top_numbers('front', 5)
         front_numbers.sort()
         
         # 后区选择2个号码
-        back_numbers = [num for num, _ in sorted_numbers[:12]][:2]
+        back_numbers = self._top_numbers('back', 2)
         back_numbers.sort()
         
         return {
@@ -130,15 +167,12 @@ class FrequencyAnalysisModel(BasePredictionModel):
     
     def _predict_ssq(self) -> Dict[str, Any]:
         """预测双色球"""
-        sorted_numbers = sorted(self.frequency_data.items(), 
-                              key=lambda x: x[1], reverse=True)
-        
         # 红球选择6个号码
-        red_numbers = [num for num, _ in sorted_numbers[:33]][:6]
+        red_numbers = self._top_numbers('red', 6)
         red_numbers.sort()
         
         # 蓝球选择1个号码
-        blue_number = sorted_numbers[0][0] if sorted_numbers else "01"
+        blue_number = self._top_numbers('blue', 1)[0]
         
         return {
             'red': red_numbers,
@@ -148,11 +182,8 @@ class FrequencyAnalysisModel(BasePredictionModel):
     
     def _predict_fc3d(self) -> Dict[str, Any]:
         """预测福彩3D"""
-        sorted_numbers = sorted(self.frequency_data.items(), 
-                              key=lambda x: x[1], reverse=True)
-        
-        # 选择3个数字
-        selected_digits = [num for num, _ in sorted_numbers[:10]][:3]
+        # 每一位选择频率最高的数字
+        selected_digits = [self._top_numbers(zone, 1)[0] for zone in ('hundred', 'ten', 'unit')]
         
         return {
             'main': ''.join(selected_digits),
@@ -193,15 +224,52 @@ class FrequencyAnalysisModel(BasePredictionModel):
         except Exception as e:
             logger.error(f"准确率评估失败: {e}")
             return 0.0
+    
+    def evaluate_batch(self, actual: Union[List[Dict[str, Any]], np.ndarray],
+                       predicted: Union[List[Dict[str, Any]], np.ndarray],
+                       game: str = None) -> np.ndarray:
+        """
+        批量评估准确率
+        actual和predicted可以是号码字典列表或已编码的uint64数组，
+        长度为1时会广播到另一侧；传入数组时需指定game，任一侧为空时返回空数组
+        """
+        if len(actual) == 0 or len(predicted) == 0:
+            return np.zeros(0)
+        if game is None:
+            game = detect_game(actual[0] if len(actual) else predicted[0])
+        
+        if not isinstance(actual, np.ndarray):
+            actual = encode_batch(game, actual)
+        if not isinstance(predicted, np.ndarray):
+            predicted = encode_batch(game, predicted)
+        
+        return score_batch(game, actual, predicted)
 
 
 class PredictionModelFactory:
     """预测模型工厂"""
     
+    MODEL_TYPES = {
+        "FREQUENCY": FrequencyAnalysisModel
+    }
+    
     @staticmethod
-    def create_model(model_type: str) -> BasePredictionModel:
-        """创建预测模型"""
-        if model_type == "FREQUENCY":
-            return FrequencyAnalysisModel()
-        else:
-            raise ValueError(f"未知的模型类型: {model_type}") 
\ No newline at end of file
+    def create_model(model_type: str, parameters: Dict[str, Any] = None) -> BasePredictionModel:
+        """创建预测模型，parameters为prediction_models表中的模型参数"""
+        if model_type not in PredictionModelFactory.MODEL_TYPES:
+            raise ValueError(f"未知的模型类型: {model_type}")
+        return PredictionModelFactory.MODEL_TYPES[model_type](parameters)
+    
+    @staticmethod
+    def is_supported(model_type: str) -> bool:
+        """是否支持该模型类型"""
+        return model_type in PredictionModelFactory.MODEL_TYPES
+
+
+def numbers_from_scores(game: str, scores: Dict[str, np.ndarray]) -> Dict[str, Any]:
+    """按各号码区得分从高到低选号，得分相同时取较小号码"""
+    values = {}
+    for zone in ZONE_LAYOUT[game]:
+        top = np.argsort(-scores[zone['name']], kind='stable')[:zone['picks']]
+        values[zone['name']] = [int(index) + zone['low'] for index in top]
+    return format_numbers(game, values) 
\ No newline at end of file
@@ -0,0 +1,284 @@
+"""
+预测服务模块 - 彩票数据分析系统
+
+把数据库中启用的预测模型组织起来统一运行：
+历史数据只查询一次、特征只构建一次，各模型在线程池中并行训练和预测，
+预测结果按各自的model_id批量写入predictions表。
+集成预测按最近的模型评估准确率给各模型加权，合并各号码的得分后选号。
+新开奖数据入库后，对已开奖的预测批量计算准确率并写入model_evaluations表。
+"""
+import json
+import time
+import threading
+import contextvars
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
+from loguru import logger
+from config import PREDICTION_CONFIG
+from feature_store import get_feature_store
+from metrics import MODEL_SECONDS, MODEL_ERRORS
+from tracing import span, traced, current_span
+from number_encoding import ZONE_LAYOUT, detect_game, encode_batch, numbers_valid
+from prediction_models import PredictionModelFactory, numbers_from_scores, score_batch
+
+# 同一进程内的评估串行执行，避免并发时重复写入同一条评估
+_evaluation_lock = threading.Lock()
+
+
+def next_draw_number(history: List[Dict[str, Any]]) -> str:
+    """根据最新一期期号推算下一期期号"""
+    latest = history[0]['draw_number']
+    return str(int(latest) + 1).zfill(len(latest))
+
+
+class PredictionService:
+    """预测服务"""
+
+    def __init__(self, db, workers: int = None):
+        """初始化预测服务，db为DatabaseManager实例"""
+        self.db = db
+        self.workers = workers or PREDICTION_CONFIG['workers']
+
+    def active_models(self) -> List[Dict[str, Any]]:
+        """获取启用且已实现的预测模型"""
+        models = []
+        for model in self.db.get_prediction_models():
+            if PredictionModelFactory.is_supported(model['model_type']):
+                models.append(model)
+            else:
+                logger.warning(f"模型{model['model_name']}({model['model_type']})尚未实现，已跳过")
+        return models
+
+    def find_model(self, model_type: str) -> Optional[Dict[str, Any]]:
+        """按模型类型查找启用的模型"""
+        return next((model for model in self.active_models() if model['model_type'] == model_type), None)
+
+    @staticmethod
+    def _run_model(model_info: Dict[str, Any], history: List[Dict[str, Any]],
+                   features: Dict[str, np.ndarray], with_scores: bool = False) -> Dict[str, Any]:
+        """训练并运行单个模型，记录训练和预测耗时，失败时返回error字段"""
+        result = {'model_id': model_info['id'], 'model_type': model_info['model_type'],
+                  'model_name': model_info['model_name']}
+        with span('run_model', model_id=model_info['id'], model_type=model_info['model_type']) as model_span:
+            try:
+                start = time.perf_counter()
+                model = PredictionModelFactory.create_model(model_info['model_type'], model_info.get('parameters'))
+                if not model.train(history, features):
+                    raise ValueError("模型训练失败")
+                trained = time.perf_counter()
+                
+                prediction = model.predict(history)
+                if not prediction:
+                    raise ValueError("预测生成失败")
+                result['prediction'] = prediction
+                if with_scores:
+                    result['scores'] = model.score_numbers(history)
+                
+                predicted = time.perf_counter()
+                result['train_seconds'] = round(trained - start, 4)
+                result['predict_seconds'] = round(predicted - trained, 4)
+                MODEL_SECONDS.observe(trained - start, model_type=model_info['model_type'], phase='train')
+                MODEL_SECONDS.observe(predicted - trained, model_type=model_info['model_type'], phase='predict')
+            except Exception as e:
+                logger.error(f"模型{model_info['model_name']}预测失败: {e}")
+                MODEL_ERRORS.inc(model_type=model_info['model_type'])
+                result['error'] = str(e)
+            if 'error' in result:
+                model_span.set('error', result['error'])
+        return result
+
+    def _run_tasks(self, tasks: List[tuple]) -> List[Dict[str, Any]]:
+        """并行执行(模型, 历史数据, 特征, 是否返回得分)任务，结果顺序与任务一致"""
+        if len(tasks) <= 1:
+            return [self._run_model(*task) for task in tasks]
+
+        # 每个任务在当前上下文的副本中运行，模型的追踪区间挂在调用方的区间下
+        contexts = [contextvars.copy_context() for _ in tasks]
+        with ThreadPoolExecutor(max_workers=self.workers or len(tasks)) as executor:
+            return list(executor.map(lambda context, task: context.run(self._run_model, *task), contexts, tasks))
+
+    def run_models(self, models: List[Dict[str, Any]], history: List[Dict[str, Any]],
+                   with_scores: bool = False) -> List[Dict[str, Any]]:
+        """在同一份历史数据和特征上并行运行多个模型，返回各模型的预测(失败的模型带error字段)"""
+        game = detect_game(history[0]['numbers'])
+        features = get_feature_store().get_features(game, history)
+        return self._run_tasks([(model_info, history, features, with_scores) for model_info in models])
+
+    def model_weights(self, lottery_type_id: int, model_ids: List[int]) -> Dict[int, float]:
+        """
+        按最近评估的平均准确率计算集成权重(归一化)
+        没有评估记录的模型取其他模型的平均准确率，都没有时等权
+        """
+        accuracy = self.db.get_model_accuracy(lottery_type_id, PREDICTION_CONFIG['evaluation_window'])
+        known = [accuracy[model_id]['accuracy'] for model_id in model_ids if model_id in accuracy]
+        default = float(np.mean(known)) if known else 1.0
+
+        raw = {model_id: max(accuracy[model_id]['accuracy'] if model_id in accuracy else default,
+                             PREDICTION_CONFIG['min_weight'])
+               for model_id in model_ids}
+        total = sum(raw.values())
+        return {model_id: weight / total for model_id, weight in raw.items()}
+
+    def ensemble(self, lottery_type_id: int, history_limit: int = None) -> Dict[str, Any]:
+        """
+        集成预测: 所有启用模型并行预测，各自的预测按model_id批量入库，
+        再按权重合并各模型的号码得分得到集成号码
+        """
+        history = self.db.get_lottery_results(lottery_type_id, history_limit or PREDICTION_CONFIG['history_limit'])
+        if not history:
+            raise ValueError("历史数据不足")
+
+        models = self.active_models()
+        if not models:
+            raise ValueError("没有可用的预测模型")
+
+        game = detect_game(history[0]['numbers'])
+        draw_number = next_draw_number(history)
+        results = self.run_models(models, history, with_scores=True)
+        succeeded = [result for result in results if 'error' not in result]
+        if not succeeded:
+            raise ValueError("所有模型预测均失败")
+
+        self.db.insert_predictions([
+            {'model_id': result['model_id'], 'lottery_type_id': lottery_type_id, 'draw_number': draw_number,
+             'predicted_numbers': result['prediction'],
+             'confidence_score': result['prediction'].get('confidence', 0.5)}
+            for result in succeeded
+        ])
+
+        # 各模型得分按号码区归一化后加权求和
+        weights = self.model_weights(lottery_type_id, [result['model_id'] for result in succeeded])
+        combined = {zone['name']: np.zeros(zone['width']) for zone in ZONE_LAYOUT[game]}
+        for result in succeeded:
+            for zone_name, scores in result['scores'].items():
+                total = scores.sum()
+                if total > 0:
+                    combined[zone_name] += weights[result['model_id']] * scores / total
+
+        prediction = numbers_from_scores(game, combined)
+        prediction['confidence'] = round(sum(weights[result['model_id']] * result['prediction'].get('confidence', 0.5)
+                                             for result in succeeded), 4)
+
+        for result in results:
+            result.pop('scores', None)
+            if result['model_id'] in weights:
+                result['weight'] = round(weights[result['model_id']], 4)
+
+        return {
+            'next_draw_number': draw_number,
+            'prediction': prediction,
+            'models': results
+        }
+
+    @traced('predict_all')
+    def predict_all(self, lottery_type_ids: List[int] = None, history_limit: int = None,
+                    force: bool = False) -> Dict[str, Any]:
+        """
+        批量预测: 为每个(彩种, 模型)组合生成下一期预测
+        每个彩种只查询一次历史数据、构建一次特征，全部组合在同一线程池中并行运行，
+        预测结果一次性批量写入；已有下一期预测的组合默认跳过，force为True时重新预测
+        """
+        start = time.perf_counter()
+        history_limit = history_limit or PREDICTION_CONFIG['history_limit']
+        models = self.active_models()
+        lottery_types = [lottery_type for lottery_type in self.db.get_lottery_types()
+                         if lottery_type_ids is None or lottery_type['id'] in lottery_type_ids]
+
+        tasks = []
+        pairs = []
+        skipped = []
+        for lottery_type in lottery_types:
+            history = self.db.get_lottery_results(lottery_type['id'], history_limit)
+            if not history:
+                logger.warning(f"{lottery_type['type_name']}没有历史数据，跳过批量预测")
+                continue
+
+            draw_number = next_draw_number(history)
+            predicted = set() if force else self.db.get_predicted_model_ids(lottery_type['id'], draw_number)
+            pending = [model_info for model_info in models if model_info['id'] not in predicted]
+            skipped.extend({'lottery_type_id': lottery_type['id'], 'type_code': lottery_type['type_code'],
+                            'model_id': model_info['id'], 'draw_number': draw_number}
+                           for model_info in models if model_info['id'] in predicted)
+            if not pending:
+                continue
+
+            features = get_feature_store().get_features(detect_game(history[0]['numbers']), history)
+            for model_info in pending:
+                tasks.append((model_info, history, features, False))
+                pairs.append({'lottery_type_id': lottery_type['id'], 'type_code': lottery_type['type_code'],
+                              'draw_number': draw_number})
+        prepared = time.perf_counter()
+
+        results = []
+        for pair, result in zip(pairs, self._run_tasks(tasks)):
+            results.append({**pair, **result})
+        predicted_at = time.perf_counter()
+
+        saved = self.db.insert_predictions([
+            {'model_id': result['model_id'], 'lottery_type_id': result['lottery_type_id'],
+             'draw_number': result['draw_number'], 'predicted_numbers': result['prediction'],
+             'confidence_score': result['prediction'].get('confidence', 0.5)}
+            for result in results if 'error' not in result
+        ]) if results else 0
+        finished = time.perf_counter()
+
+        if current_span():
+            current_span().set('pairs', len(results))
+            current_span().set('saved', saved)
+        logger.info(f"批量预测完成: {len(results)}个组合, 保存{saved}条, 跳过{len(skipped)}个, "
+                    f"耗时{finished - start:.3f}秒")
+        return {
+            'pairs': results,
+            'skipped': skipped,
+            'saved': saved,
+            'failed': sum(1 for result in results if 'error' in result),
+            'timings': {
+                'load_seconds': round(prepared - start, 4),
+                'predict_seconds': round(predicted_at - prepared, 4),
+                'write_seconds': round(finished - predicted_at, 4),
+                'total_seconds': round(finished - start, 4)
+            }
+        }
+
+    def evaluate_pending(self, lottery_type_id: int) -> Dict[str, Any]:
+        """
+        评估已开奖的预测: 一次查询取出全部待评估预测，批量计算准确率，单个事务批量写入
+        已评估过的预测不会再次写入，可重复调用
+        """
+        with _evaluation_lock:
+            pending = self.db.get_pending_evaluations(lottery_type_id)
+            if not pending:
+                return {'lottery_type_id': lottery_type_id, 'evaluated': 0, 'models': {}}
+
+            actual = [json.loads(row['actual_numbers']) for row in pending]
+            predicted = [json.loads(row['predicted_numbers']) for row in pending]
+            game = detect_game(actual[0])
+            
+            # 不符合选号规则的旧预测(如超出范围的后区号码)按0分写入，不阻塞其余预测的评估
+            valid = [numbers_valid(game, actual_numbers) and numbers_valid(game, predicted_numbers)
+                     for actual_numbers, predicted_numbers in zip(actual, predicted)]
+            for row, is_valid in zip(pending, valid):
+                if not is_valid:
+                    logger.warning(f"模型{row['model_id']}第{row['draw_number']}期预测号码不符合选号规则，按0分评估: "
+                                   f"{row['predicted_numbers']}")
+            scores = np.zeros(len(pending))
+            if any(valid):
+                indexes = [index for index, is_valid in enumerate(valid) if is_valid]
+                scores[indexes] = score_batch(game, encode_batch(game, [actual[index] for index in indexes]),
+                                              encode_batch(game, [predicted[index] for index in indexes]))
+
+            evaluations = [dict(row, accuracy_score=float(score)) for row, score in zip(pending, scores)]
+            saved = self.db.insert_model_evaluations(evaluations)
+
+        models = {}
+        for evaluation in evaluations:
+            models.setdefault(evaluation['model_id'], []).append(evaluation['accuracy_score'])
+
+        logger.info(f"彩票类型{lottery_type_id}评估完成: {len(evaluations)}条预测")
+        return {
+            'lottery_type_id': lottery_type_id,
+            'evaluated': saved,
+            'models': {model_id: {'evaluations': len(values), 'accuracy': round(float(np.mean(values)), 4)}
+                       for model_id, values in models.items()}
+        }
@@ -0,0 +1,286 @@
+"""
+兑奖模块 - 彩票数据分析系统
+
+基于号码位掩码批量计算彩票的中奖等级和奖金。
+彩票以number_encoding中的打包uint64表示，每次对整批彩票做向量化匹配。
+"""
+import re
+import numpy as np
+from typing import List, Dict, Any, Iterator, Tuple
+from loguru import logger
+from config import PRIZE_CONFIG
+from number_encoding import ZONE_LAYOUT, GAME_ZONES, pack_matrices, popcount
+
+
+# 大乐透奖级表: [前区命中数][后区命中数] -> 奖级(0为未中奖)
+DLT_TIER_TABLE = np.array([
+    # 后区0, 1, 2
+    [0, 0, 9],  # 前区0
+    [0, 0, 9],  # 前区1
+    [0, 9, 8],  # 前区2
+    [9, 8, 6],  # 前区3
+    [7, 5, 4],  # 前区4
+    [3, 2, 1],  # 前区5
+], dtype=np.uint8)
+
+# 双色球奖级表: [红球命中数][蓝球命中数] -> 奖级(0为未中奖)
+SSQ_TIER_TABLE = np.array([
+    # 蓝球0, 1
+    [0, 6],  # 红球0
+    [0, 6],  # 红球1
+    [0, 6],  # 红球2
+    [0, 5],  # 红球3
+    [5, 4],  # 红球4
+    [4, 3],  # 红球5
+    [2, 1],  # 红球6
+], dtype=np.uint8)
+
+TIER_TABLES = {'DLT': DLT_TIER_TABLE, 'SSQ': SSQ_TIER_TABLE}
+
+# 福彩3D奖级: 直选、组选3、组选6
+FC3D_DIRECT, FC3D_GROUP3, FC3D_GROUP6 = 1, 2, 3
+
+# 单个置位(1 << d)到数字d的查表
+_BIT_TO_DIGIT = np.zeros(1 << 10, dtype=np.int16)
+for _digit in range(10):
+    _BIT_TO_DIGIT[1 << _digit] = _digit
+
+_SEPARATORS = re.compile(r'[^0-9]+')
+
+
+def fc3d_digits(packed: np.ndarray) -> np.ndarray:
+    """把福彩3D打包号码解码为(N, 3)的百/十/个位数字矩阵"""
+    packed = np.asarray(packed, dtype=np.uint64)
+    columns = []
+    for zone in ZONE_LAYOUT['FC3D']:
+        bits = (packed >> np.uint64(zone['offset'])) & np.uint64((1 << zone['width']) - 1)
+        columns.append(_BIT_TO_DIGIT[bits.astype(np.intp)])
+    return np.stack(columns, axis=-1)
+
+
+def fc3d_group_keys(packed: np.ndarray) -> np.ndarray:
+    """计算福彩3D组选键(排序后的三位数字)"""
+    digits = np.sort(fc3d_digits(packed), axis=-1)
+    return digits[..., 0] * 100 + digits[..., 1] * 10 + digits[..., 2]
+
+
+class PrizeChecker:
+    """批量兑奖引擎"""
+
+    def __init__(self, game: str, fc3d_play: str = 'direct', prize_table: Dict[int, float] = None):
+        """
+        初始化兑奖引擎
+        fc3d_play: 福彩3D玩法，direct为直选，group为组选
+        prize_table: 奖级到单注奖金的映射，默认取PRIZE_CONFIG
+        """
+        if game not in GAME_ZONES:
+            raise ValueError(f"未知的彩票类型: {game}")
+        if fc3d_play not in ('direct', 'group'):
+            raise ValueError(f"未知的福彩3D玩法: {fc3d_play}")
+
+        self.game = game
+        self.fc3d_play = fc3d_play
+        self.ticket_price = PRIZE_CONFIG['ticket_price']
+
+        prize_table = prize_table or PRIZE_CONFIG[game]
+        self.max_tier = max(prize_table)
+        self.prize_amounts = np.zeros(self.max_tier + 1, dtype=np.float64)
+        for tier, amount in prize_table.items():
+            self.prize_amounts[tier] = amount
+
+        self.zone_masks = [zone['mask'] for zone in ZONE_LAYOUT[game]]
+
+    def check(self, tickets: np.ndarray, draw: Any, ticket_keys: np.ndarray = None) -> np.ndarray:
+        """
+        计算彩票的中奖等级(0为未中奖)
+        draw可以是单期开奖号码，也可以是与tickets可广播的数组(逐注对应各自的开奖号码)
+        """
+        tickets = np.asarray(tickets, dtype=np.uint64)
+        draw = np.asarray(draw, dtype=np.uint64)
+
+        if self.game == 'FC3D':
+            return self._check_fc3d(tickets, draw, ticket_keys)
+
+        common = tickets & draw
+        first = popcount(common & self.zone_masks[0])
+        second = popcount(common & self.zone_masks[1])
+        return TIER_TABLES[self.game][first, second]
+
+    def _check_fc3d(self, tickets: np.ndarray, draw: np.ndarray, ticket_keys: np.ndarray = None) -> np.ndarray:
+        """福彩3D兑奖：直选按位完全匹配，组选按数字组合匹配"""
+        if self.fc3d_play == 'direct':
+            return (tickets == draw).astype(np.uint8) * FC3D_DIRECT
+
+        # 组选: 豹子号不设组选奖，两位相同为组选3，三位不同为组选6
+        digits = np.sort(fc3d_digits(draw), axis=-1)
+        distinct = 1 + (digits[..., 1] != digits[..., 0]) + (digits[..., 2] != digits[..., 1])
+        tier = np.select([distinct == 2, distinct == 3], [FC3D_GROUP3, FC3D_GROUP6], 0).astype(np.uint8)
+        draw_key = digits[..., 0] * 100 + digits[..., 1] * 10 + digits[..., 2]
+
+        if ticket_keys is None:
+            ticket_keys = fc3d_group_keys(tickets)
+        return (ticket_keys == draw_key).astype(np.uint8) * tier
+
+    def check_draws(self, tickets: np.ndarray, draws: np.ndarray) -> np.ndarray:
+        """计算一批彩票对多期开奖号码的中奖等级矩阵(期数, 注数)"""
+        tickets = np.asarray(tickets, dtype=np.uint64)
+        ticket_keys = self._group_keys(tickets)
+        return np.stack([self.check(tickets, draw, ticket_keys) for draw in np.asarray(draws, dtype=np.uint64)])
+
+    def summarize(self, tickets: np.ndarray, draws: np.ndarray) -> List[Dict[str, Any]]:
+        """统计一批彩票在每期开奖中的各奖级注数和奖金，不保留逐注结果"""
+        tickets = np.asarray(tickets, dtype=np.uint64)
+        ticket_keys = self._group_keys(tickets)
+
+        summaries = []
+        for draw in np.asarray(draws, dtype=np.uint64):
+            tier_counts = np.bincount(self.check(tickets, draw, ticket_keys), minlength=self.max_tier + 1)
+            summaries.append({
+                'tickets': int(len(tickets)),
+                'tier_counts': {tier: int(tier_counts[tier]) for tier in range(1, self.max_tier + 1)},
+                'winning_tickets': int(tier_counts[1:].sum()),
+                'payout': float(tier_counts @ self.prize_amounts),
+                'cost': float(len(tickets) * self.ticket_price)
+            })
+        return summaries
+
+    def payouts(self, tiers: np.ndarray) -> np.ndarray:
+        """把中奖等级转换为单注奖金"""
+        return self.prize_amounts[tiers]
+
+    def _group_keys(self, tickets: np.ndarray) -> np.ndarray:
+        """组选玩法下预先计算彩票的组选键，多期兑奖时复用"""
+        if self.game == 'FC3D' and self.fc3d_play == 'group':
+            return fc3d_group_keys(tickets)
+        return None
+
+
+def merge_summaries(total: Dict[str, Any], summary: Dict[str, Any]) -> Dict[str, Any]:
+    """把一批彩票的兑奖统计累加到总计中"""
+    if not total:
+        total.update({key: (dict(value) if isinstance(value, dict) else value)
+                      for key, value in summary.items()})
+        return total
+
+    for key in ('tickets', 'winning_tickets', 'payout', 'cost'):
+        total[key] += summary[key]
+    for tier, count in summary['tier_counts'].items():
+        total['tier_counts'][tier] += count
+    return total
+
+
+def _ticket_tokens(line: str, zones: List[Dict[str, Any]]) -> List[str]:
+    """
+    拆分一行大乐透/双色球彩票的号码，格式不符时返回None:
+    号码个数与选号个数不符、号码超过两位，或用"+"分隔号码区时各区号码个数不符
+    """
+    parts = [_SEPARATORS.sub(' ', part).split() for part in line.split('+')]
+    if len(parts) > 1 and [len(part) for part in parts] != [zone['picks'] for zone in zones]:
+        return None
+    tokens = [token for part in parts for token in part]
+    if len(tokens) != sum(zone['picks'] for zone in zones) or any(len(token) > 2 for token in tokens):
+        return None
+    return tokens
+
+
+def parse_ticket_lines(game: str, lines: List[str]) -> Tuple[np.ndarray, int]:
+    """
+    解析文本格式的彩票，每行一注，返回(有效彩票的打包数组, 无效行数)
+    大乐透/双色球: "01 05 12 23 35 + 03 08"，号码间可用任意非数字字符分隔，逐行校验号码个数
+    福彩3D: "123" 或 "1 2 3"
+    """
+    lines = [line for line in lines if line.strip()]
+    if not lines:
+        return np.empty(0, dtype=np.uint64), 0
+
+    zones = ZONE_LAYOUT[game]
+    total_picks = sum(zone['picks'] for zone in zones)
+
+    if game == 'FC3D':
+        cleaned = [_SEPARATORS.sub('', line) for line in lines]
+        cleaned = [digits for digits in cleaned if len(digits) == total_picks]
+        values = (np.frombuffer(''.join(cleaned).encode(), dtype=np.uint8).astype(np.int64) - 48)
+        values = values.reshape(-1, total_picks)
+    else:
+        rows = [_ticket_tokens(line, zones) for line in lines]
+        values = np.array([row for row in rows if row is not None], dtype=np.int64).reshape(-1, total_picks)
+
+    # 校验号码范围
+    valid = np.ones(len(values), dtype=bool)
+    matrices = {}
+    column = 0
+    for zone in zones:
+        matrix = values[:, column:column + zone['picks']]
+        valid &= ((matrix >= zone['low']) & (matrix <= zone['high'])).all(axis=1)
+        matrices[zone['name']] = np.clip(matrix, zone['low'], zone['high'])
+        column += zone['picks']
+
+    packed = pack_matrices(game, matrices)
+
+    # 校验同一号码区内号码不重复
+    for zone in zones:
+        valid &= popcount(packed & zone['mask']) == zone['picks']
+
+    packed = packed[valid]
+    return packed, len(lines) - len(packed)
+
+
+def iter_ticket_file(game: str, path: str, chunk_size: int = None) -> Iterator[Tuple[np.ndarray, int]]:
+    """
+    分批读取彩票文件
+    .npy文件为打包后的uint64数组(内存映射读取)，其他文件按文本格式每行一注
+    """
+    chunk_size = chunk_size or PRIZE_CONFIG['check_chunk_size']
+
+    if path.endswith('.npy'):
+        tickets = np.load(path, mmap_mode='r')
+        for start in range(0, len(tickets), chunk_size):
+            yield np.asarray(tickets[start:start + chunk_size], dtype=np.uint64), 0
+        return
+
+    with open(path, 'r', encoding='utf-8') as f:
+        lines = []
+        for line in f:
+            lines.append(line)
+            if len(lines) >= chunk_size:
+                yield parse_ticket_lines(game, lines)
+                lines = []
+        if lines:
+            yield parse_ticket_lines(game, lines)
+
+
+class TicketStreamParser:
+    """从字节流中按行增量解析彩票，攒满一批后输出"""
+
+    def __init__(self, game: str, chunk_size: int = None):
+        """初始化流式解析器"""
+        self.game = game
+        self.chunk_size = chunk_size or PRIZE_CONFIG['check_chunk_size']
+        self._remainder = b''
+        self._lines = []
+
+    def feed(self, data: bytes) -> Iterator[Tuple[np.ndarray, int]]:
+        """写入一段字节数据，输出已攒满的批次"""
+        *complete, self._remainder = (self._remainder + data).split(b'\n')
+        self._lines.extend(complete)
+
+        while len(self._lines) >= self.chunk_size:
+            batch = self._lines[:self.chunk_size]
+            del self._lines[:self.chunk_size]
+            yield self._parse(batch)
+
+    def flush(self) -> Iterator[Tuple[np.ndarray, int]]:
+        """输出剩余未满一批的彩票"""
+        if self._remainder:
+            self._lines.append(self._remainder)
+            self._remainder = b''
+        if self._lines:
+            batch, self._lines = self._lines, []
+            yield self._parse(batch)
+
+    def _parse(self, batch: List[bytes]) -> Tuple[np.ndarray, int]:
+        """解析一批字节行"""
+        tickets, invalid = parse_ticket_lines(self.game, [line.decode('utf-8', 'ignore') for line in batch])
+        if invalid:
+            logger.warning(f"忽略{invalid}注格式错误的彩票")
+        return tickets, invalid
@@ -0,0 +1,202 @@
+"""
+性能剖析模块 - 彩票数据分析系统
+
+按需对单个接口请求或下一次定时任务做性能剖析，不需要重新部署：
+- 接口请求: 携带X-Profile请求头时，在请求执行期间定时采样所有忙碌线程的调用栈，
+  输出火焰图工具(flamegraph.pl、speedscope)可直接读取的折叠栈文本(.folded)
+- 定时任务: 在执行任务的线程中用cProfile剖析，输出pstats文件(.prof)，也可选择采样方式
+剖析结果保存在PROFILING_CONFIG['dir']中，只保留最近的若干个。
+同一时刻只做一次剖析，两次剖析之间至少间隔min_interval秒；未启用时不注册任何钩子。
+"""
+import os
+import sys
+import time
+import marshal
+import cProfile
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Callable, Dict, Any, List, Optional
+from loguru import logger
+from config import PROFILING_CONFIG
+
+PROFILE_MODES = ('sample', 'cprofile')
+
+_PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _frame_label(frame) -> str:
+    """折叠栈中的帧名称: 函数名 (文件:行号)，不含折叠栈的分隔符"""
+    code = frame.f_code
+    filename = code.co_filename
+    if filename.startswith(_PROJECT_DIR):
+        filename = os.path.relpath(filename, _PROJECT_DIR)
+    else:
+        filename = os.path.basename(filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(';', ',')
+
+
+class SamplingProfiler:
+    """
+    采样剖析器: 后台线程按固定间隔读取所有线程的调用栈并计数
+    只记录栈中含有项目代码的线程，空闲的线程池线程和事件循环不计入
+    """
+
+    def __init__(self, interval: float = None, max_seconds: float = None):
+        """初始化采样剖析器"""
+        self.interval = interval or PROFILING_CONFIG['sample_interval']
+        self.max_seconds = max_seconds or PROFILING_CONFIG['max_seconds']
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        """开始采样"""
+        self._thread = threading.Thread(target=self._run, name='profiler-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> str:
+        """停止采样并返回折叠栈文本(每行: 线程;外层帧;...;内层帧 次数)"""
+        self._stop.set()
+        self._thread.join()
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def _run(self) -> None:
+        """采样循环，超过max_seconds后自动停止"""
+        own = threading.get_ident()
+        deadline = time.monotonic() + self.max_seconds
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                labels = []
+                in_project = False
+                while frame is not None:
+                    in_project = in_project or frame.f_code.co_filename.startswith(_PROJECT_DIR)
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                if in_project:
+                    labels.append(names.get(ident, str(ident)))
+                    self.stacks[';'.join(reversed(labels))] += 1
+            self.samples += 1
+
+
+class Profiling:
+    """剖析入口: 限流、保存剖析结果，以及为定时任务预约剖析"""
+
+    def __init__(self, directory: str = None, min_interval: float = None, max_files: int = None):
+        """初始化剖析入口"""
+        self.directory = directory or PROFILING_CONFIG['dir']
+        self.min_interval = PROFILING_CONFIG['min_interval'] if min_interval is None else min_interval
+        self.max_files = max_files or PROFILING_CONFIG['max_files']
+        self._lock = threading.Lock()
+        self._active = False
+        self._last_started = None
+        self._armed_jobs = {}  # 任务名 -> 剖析方式
+
+    def acquire(self) -> bool:
+        """申请一次剖析: 已有剖析在进行或距上次开始不足min_interval秒时返回False"""
+        with self._lock:
+            now = time.monotonic()
+            if self._active or (self._last_started is not None and now - self._last_started < self.min_interval):
+                return False
+            self._active = True
+            self._last_started = now
+            return True
+
+    def release(self) -> None:
+        """结束剖析"""
+        with self._lock:
+            self._active = False
+
+    def arm_job(self, job_name: str, mode: str = 'cprofile') -> None:
+        """预约剖析定时任务的下一次执行"""
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"未知的剖析方式: {mode}")
+        self._armed_jobs[job_name] = mode
+
+    def take_job(self, job_name: str) -> Optional[str]:
+        """取出任务的剖析预约(只生效一次)"""
+        return self._armed_jobs.pop(job_name, None)
+
+    def armed_jobs(self) -> Dict[str, str]:
+        """已预约剖析的任务"""
+        return dict(self._armed_jobs)
+
+    def run(self, func: Callable[[], Any], name: str, mode: str = 'cprofile') -> Any:
+        """
+        在当前线程中剖析执行func并保存结果，返回func的返回值
+        被限流时直接执行func，不做剖析
+        """
+        if not self.acquire():
+            logger.warning(f"剖析{name}被限流，本次不剖析")
+            return func()
+
+        try:
+            if mode == 'sample':
+                profiler = SamplingProfiler()
+                profiler.start()
+                try:
+                    return func()
+                finally:
+                    self.save(name, profiler.stop().encode('utf-8'), 'folded')
+            profiler = cProfile.Profile()
+            try:
+                return profiler.runcall(func)
+            finally:
+                profiler.create_stats()
+                self.save(name, marshal.dumps(profiler.stats), 'prof')  # 与Profile.dump_stats的文件格式相同
+        finally:
+            self.release()
+
+    def save(self, name: str, content: bytes, extension: str) -> str:
+        """保存剖析结果并淘汰最旧的文件，返回剖析ID(文件名)"""
+        os.makedirs(self.directory, exist_ok=True)
+        safe_name = ''.join(char if char.isalnum() or char in '-_' else '_' for char in name)
+        profile_id = f"{datetime.now():%Y%m%d-%H%M%S-%f}-{safe_name}.{extension}"
+        with open(os.path.join(self.directory, profile_id), 'wb') as f:
+            f.write(content)
+        logger.info(f"剖析结果已保存: {profile_id}")
+
+        for old in self.list()[self.max_files:]:
+            try:
+                os.remove(os.path.join(self.directory, old['profile_id']))
+            except OSError:
+                pass
+        return profile_id
+
+    def list(self) -> List[Dict[str, Any]]:
+        """已保存的剖析结果，最新的在前"""
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for filename in os.listdir(self.directory):
+            if filename.endswith(('.prof', '.folded')):
+                path = os.path.join(self.directory, filename)
+                profiles.append({'profile_id': filename, 'bytes': os.path.getsize(path),
+                                 'created': datetime.fromtimestamp(os.path.getmtime(path)).isoformat()})
+        return sorted(profiles, key=lambda profile: profile['profile_id'], reverse=True)
+
+    def path(self, profile_id: str) -> str:
+        """剖析结果文件路径，ID不合法或文件不存在时抛出ValueError"""
+        if os.path.basename(profile_id) != profile_id or not profile_id.endswith(('.prof', '.folded')):
+            raise ValueError(f"无效的剖析ID: {profile_id}")
+        path = os.path.join(self.directory, profile_id)
+        if not os.path.exists(path):
+            raise ValueError(f"剖析结果不存在: {profile_id}")
+        return path
+
+
+_profiling = None
+
+
+def get_profiling() -> Optional[Profiling]:
+    """进程内共享的剖析入口，未启用剖析时返回None"""
+    global _profiling
+    if not PROFILING_CONFIG['enabled']:
+        return None
+    if _profiling is None:
+        _profiling = Profiling()
+    return _profiling
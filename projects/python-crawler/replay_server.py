@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+数据源录制回放模块 - 彩票数据分析系统
+
+把数据源的响应录制到压缩的本地样本库，再由本地HTTP替身服务器回放，
+用于在没有网络的环境中可重复地测量爬取、解析和入库的吞吐量:
+- FixtureStore: 按"数据源 + 路径 + 排序后的查询参数"保存响应，每个响应一个gzip压缩的JSON文件
+- ReplayServer: 基于标准库的多线程HTTP服务器，路径第一段为数据源(如/DLT/historykj/history.jspx)，
+  可配置响应延迟和错误率(返回503及Retry-After)；响应带ETag和Last-Modified，条件请求未变化时返回304
+- 爬虫启用REPLAY_CONFIG后请求改发到回放服务器；启用record时把真实响应写入样本库
+- 没有网络时可用合成开奖数据生成与历史开奖页结构相同的样本页
+
+命令行: python replay_server.py synthesize|record|serve
+"""
+import sys
+import os
+import gzip
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from html import escape
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qsl, urlencode
+from typing import List, Dict, Any, Optional
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from loguru import logger
+from config import REPLAY_CONFIG, DATA_SOURCES
+
+
+def _normalized(path: str, query: str) -> str:
+    """路径加排序后的查询参数"""
+    query = urlencode(sorted(parse_qsl(query, keep_blank_values=True)))
+    return path + (f"?{query}" if query else '')
+
+
+def fixture_key(source: str, url: str) -> str:
+    """样本键: /数据源/路径?排序后的查询参数，与主机无关"""
+    parts = urlsplit(url)
+    return _normalized(f"/{source}{parts.path or '/'}", parts.query)
+
+
+def replay_url(source: str, url: str) -> str:
+    """把数据源地址改写为回放服务器上的地址"""
+    parts = urlsplit(url)
+    query = f"?{parts.query}" if parts.query else ''
+    return f"{REPLAY_CONFIG['base_url'].rstrip('/')}/{source}{parts.path or '/'}{query}"
+
+
+class FixtureStore:
+    """压缩的响应样本库"""
+
+    def __init__(self, directory: str = None):
+        """初始化样本库"""
+        self.directory = directory or REPLAY_CONFIG['fixture_dir']
+
+    def _path(self, key: str) -> str:
+        """样本文件路径"""
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json.gz')
+
+    def put(self, key: str, body: str, status: int = 200, content_type: str = 'text/html; charset=utf-8') -> None:
+        """保存一个响应(先写临时文件再替换)"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        record = {'key': key, 'status': status, 'content_type': content_type, 'body': body,
+                  'recorded_at': time.time()}
+        with gzip.open(f"{path}.tmp", 'wt', encoding='utf-8') as f:
+            json.dump(record, f, ensure_ascii=False)
+        os.replace(f"{path}.tmp", path)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取响应，不存在时返回None"""
+        try:
+            with gzip.open(self._path(key), 'rt', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def keys(self) -> List[str]:
+        """全部样本键"""
+        if not os.path.isdir(self.directory):
+            return []
+        keys = []
+        for filename in sorted(os.listdir(self.directory)):
+            if filename.endswith('.json.gz'):
+                with gzip.open(os.path.join(self.directory, filename), 'rt', encoding='utf-8') as f:
+                    keys.append(json.load(f)['key'])
+        return keys
+
+
+class ReplayServer:
+    """
+    回放样本的本地HTTP替身服务器
+    latency为平均响应延迟(秒)，实际延迟在±jitter比例内随机；error_rate为返回503的概率
+    """
+
+    def __init__(self, store: FixtureStore = None, host: str = '127.0.0.1', port: int = None,
+                 latency: float = None, jitter: float = None, error_rate: float = None, seed: int = None):
+        """初始化服务器，port为0时使用随机空闲端口"""
+        self.store = store or FixtureStore()
+        self.latency = REPLAY_CONFIG['latency'] if latency is None else latency
+        self.jitter = REPLAY_CONFIG['jitter'] if jitter is None else jitter
+        self.error_rate = REPLAY_CONFIG['error_rate'] if error_rate is None else error_rate
+        self.requests = 0
+        self.errors = 0
+        self.not_modified = 0
+        self.bytes_sent = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread = None
+        port = urlsplit(REPLAY_CONFIG['base_url']).port if port is None else port
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        """服务器地址"""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        """生成请求处理类"""
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def handle(self, request: BaseHTTPRequestHandler) -> None:
+        """按延迟和错误率回放一个请求"""
+        with self._lock:
+            self.requests += 1
+            delay = self.latency * (1 + self._random.uniform(-self.jitter, self.jitter))
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        if delay > 0:
+            time.sleep(delay)
+
+        if failed:
+            self._send(request, 503, b'service unavailable', 'text/plain', {'Retry-After': '1'})
+            return
+        parts = urlsplit(request.path)
+        fixture = self.store.get(_normalized(parts.path, parts.query))
+        if fixture is None:
+            self._send(request, 404, b'fixture not found', 'text/plain')
+            return
+        body = fixture['body'].encode('utf-8')
+        headers = {'ETag': '"' + hashlib.sha1(body).hexdigest() + '"',
+                   'Last-Modified': formatdate(fixture['recorded_at'], usegmt=True)}
+        if self._not_modified(request, headers['ETag'], fixture['recorded_at']):
+            with self._lock:
+                self.not_modified += 1
+            self._send(request, 304, b'', fixture['content_type'], headers)
+            return
+        self._send(request, fixture['status'], body, fixture['content_type'], headers)
+
+    @staticmethod
+    def _not_modified(request: BaseHTTPRequestHandler, etag: str, modified: float) -> bool:
+        """条件请求是否未变化: 优先比较If-None-Match，没有时比较If-Modified-Since"""
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            return etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+        if_modified_since = request.headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                return int(modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+    
+    def _send(self, request: BaseHTTPRequestHandler, status: int, body: bytes, content_type: str,
+              headers: Dict[str, str] = None) -> None:
+        """写出响应"""
+        request.send_response(status)
+        request.send_header('Content-Type', content_type)
+        request.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            request.send_header(name, value)
+        request.end_headers()
+        request.wfile.write(body)
+        with self._lock:
+            self.bytes_sent += len(body)
+
+    def start(self) -> 'ReplayServer':
+        """在后台线程中启动服务器"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='replay-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """停止服务器"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def render_history_page(game: str, results: List[Dict[str, Any]], page: int, pages: int) -> str:
+    """生成历史开奖页: 开奖表格每行为期号、开奖日期、号码球、销售额和奖池"""
+    rows = []
+    for result in results:
+        numbers = result['numbers']
+        if game == 'DLT':
+            balls = [('red', num) for num in numbers['front']] + [('blue', num) for num in numbers['back']]
+        elif game == 'SSQ':
+            balls = [('red', num) for num in numbers['red']] + [('blue', numbers['blue'])]
+        else:
+            balls = [('red', str(numbers[name])) for name in ('hundred', 'ten', 'unit')]
+        ball_html = ''.join(f'<span class="ball {color}">{num}</span>' for color, num in balls)
+        rows.append(
+            f'<tr><td class="draw">{result["draw_number"]}</td><td class="date">{result["draw_date"]}</td>'
+            f'<td class="numbers">{ball_html}</td><td class="sales">{result["sales_amount"]:,.2f}</td>'
+            f'<td class="pool">{result["prize_pool"]:,.2f}</td></tr>'
+        )
+    name = escape(DATA_SOURCES[game]['name'])
+    navigation = ''.join(f'<li><a href="?page={index}">{index}</a></li>' for index in range(1, min(pages, 10) + 1))
+    return (
+        f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{name}历史开奖</title>'
+        f'<link rel="stylesheet" href="/css/history.css"></head><body>'
+        f'<div class="header"><ul class="nav">{navigation}</ul></div>'
+        f'<div class="content"><h2>{name}历史开奖</h2>'
+        f'<table class="historylist"><thead><tr><th>期号</th><th>开奖日期</th><th>开奖号码</th>'
+        f'<th>销售额(元)</th><th>奖池(元)</th></tr></thead><tbody>{"".join(rows)}</tbody></table>'
+        f'<div class="page">第{page}页/共{pages}页</div></div>'
+        f'<div class="footer">数据仅供参考，以官方公布为准</div></body></html>'
+    )
+
+
+def synthesize_fixtures(store: FixtureStore, games: List[str], pages: int, rows_per_page: int,
+                        seed: int = 2024) -> int:
+    """用合成开奖数据为各数据源生成pages页历史开奖样本(第1页为最新开奖)，返回样本数"""
+    import numpy as np
+    from synthetic_data import generate_draws, to_results
+
+    count = 0
+    for index, game in enumerate(games):
+        results = to_results(generate_draws(game, pages * rows_per_page, [seed, index]))
+        amounts = np.random.default_rng([seed, index, 1]).uniform(1e6, 1e8, size=(len(results), 2)).round(2)
+        for result, (sales_amount, prize_pool) in zip(results, amounts.tolist()):
+            result['sales_amount'], result['prize_pool'] = sales_amount, prize_pool
+        for page in range(1, pages + 1):
+            page_results = results[(page - 1) * rows_per_page:page * rows_per_page]
+            url = f"{DATA_SOURCES[game]['url']}&{urlencode({'page': page})}"
+            store.put(fixture_key(game, url), render_history_page(game, page_results, page, pages))
+            count += 1
+    return count
+
+
+def record_sources(store: FixtureStore, games: List[str], pages: int) -> int:
+    """请求真实数据源的前pages页并写入样本库，返回样本数"""
+    import requests
+    from config import CRAWLER_CONFIG
+
+    session = requests.Session()
+    session.headers.update({'User-Agent': CRAWLER_CONFIG['user_agent']})
+    count = 0
+    for game in games:
+        for page in range(1, pages + 1):
+            response = session.get(DATA_SOURCES[game]['url'], params={'page': page},
+                                   timeout=CRAWLER_CONFIG['timeout'])
+            store.put(fixture_key(game, response.url), response.text, response.status_code,
+                      response.headers.get('Content-Type', 'text/html'))
+            count += 1
+            time.sleep(CRAWLER_CONFIG['request_delay'])
+    return count
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="数据源录制回放")
+    parser.add_argument('command', choices=('synthesize', 'record', 'serve'),
+                        help='synthesize生成合成样本，record录制真实数据源，serve启动回放服务器')
+    parser.add_argument('--dir', default=REPLAY_CONFIG['fixture_dir'], help='样本库目录')
+    parser.add_argument('--games', default=','.join(DATA_SOURCES), help='数据源，逗号分隔')
+    parser.add_argument('--pages', type=int, default=10, help='每个数据源的页数')
+    parser.add_argument('--rows', type=int, default=30, help='合成样本每页的开奖期数')
+    parser.add_argument('--port', type=int, help='回放服务器端口(默认取REPLAY_CONFIG的base_url)')
+    parser.add_argument('--latency', type=float, help='平均响应延迟(秒)')
+    parser.add_argument('--error-rate', type=float, help='返回503的概率')
+    args = parser.parse_args()
+
+    store = FixtureStore(args.dir)
+    games = [game.strip().upper() for game in args.games.split(',')]
+    if args.command == 'synthesize':
+        print(f"✅ 已生成{synthesize_fixtures(store, games, args.pages, args.rows)}个样本页: {args.dir}")
+    elif args.command == 'record':
+        print(f"✅ 已录制{record_sources(store, games, args.pages)}个样本页: {args.dir}")
+    else:
+        server = ReplayServer(store, port=args.port, latency=args.latency, error_rate=args.error_rate)
+        logger.info(f"回放服务器已启动: {server.url}, 样本{len(store.keys())}个")
+        try:
+            server.httpd.serve_forever()
+        except KeyboardInterrupt:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
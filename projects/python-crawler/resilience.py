@@ -0,0 +1,161 @@
+"""
+爬虫容错模块 - 彩票数据分析系统
+
+- retry_delay: 第n次重试前的等待时间，按指数退避并在[0, 上限]内随机(full jitter)，
+  响应带Retry-After(秒数或HTTP日期)时至少等待该时间，均不超过backoff_max
+- CircuitBreaker: 每个数据源一个熔断器，连续失败breaker_failures次后打开，打开期间请求直接失败；
+  经过breaker_reset秒后放行一个试探请求，成功则关闭，失败则重新打开
+- CrawlCheckpoint: 记录每个数据源未完成的历史页爬取进度(中断的页和当时的最新期号)；
+  下次爬取仍从第1页开始，读到该期号后(新开奖已补齐)跳到中断的页继续回填
+"""
+import os
+import json
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Optional
+import requests
+from loguru import logger
+from config import CRAWLER_CONFIG
+from metrics import CRAWLER_CIRCUIT_OPEN
+
+
+class CircuitOpenError(requests.RequestException):
+    """熔断器打开期间的请求"""
+
+
+def retry_delay(attempt: int, retry_after: str = None) -> float:
+    """第attempt次重试(从1开始)前的等待秒数"""
+    delay = random.uniform(0, min(CRAWLER_CONFIG['backoff_max'], CRAWLER_CONFIG['backoff_base'] * 2 ** (attempt - 1)))
+    if retry_after:
+        delay = max(delay, _retry_after_seconds(retry_after))
+    return min(delay, CRAWLER_CONFIG['backoff_max'])
+
+
+def _retry_after_seconds(value: str) -> float:
+    """解析Retry-After: 秒数或HTTP日期，无法解析时为0"""
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class CircuitBreaker:
+    """数据源熔断器"""
+
+    def __init__(self, name: str, failures: int = None, reset_seconds: float = None):
+        """初始化熔断器"""
+        self.name = name
+        self.failure_threshold = failures or CRAWLER_CONFIG['breaker_failures']
+        self.reset_seconds = CRAWLER_CONFIG['breaker_reset'] if reset_seconds is None else reset_seconds
+        self.failures = 0
+        self.opened_at = None  # 打开时间(time.monotonic)，关闭时为None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """closed、open或half_open"""
+        if self.opened_at is None:
+            return 'closed'
+        return 'half_open' if time.monotonic() - self.opened_at >= self.reset_seconds else 'open'
+
+    def before_request(self) -> None:
+        """请求前检查，打开期间或已有试探请求时抛出CircuitOpenError"""
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return
+            if state == 'half_open' and not self._probing:
+                self._probing = True
+                return
+            remaining = max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+        raise CircuitOpenError(f"数据源{self.name}已熔断，{remaining:.0f}秒后重试")
+
+    def record_success(self) -> None:
+        """请求成功，关闭熔断器"""
+        with self._lock:
+            if self.opened_at is not None:
+                logger.info(f"数据源{self.name}已恢复，熔断器关闭")
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        """请求失败，连续失败达到阈值或试探请求失败时打开熔断器"""
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                if self.opened_at is None or self._probing:
+                    logger.warning(f"数据源{self.name}连续失败{self.failures}次，熔断{self.reset_seconds}秒")
+                self.opened_at = time.monotonic()
+                self._probing = False
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(source: str) -> CircuitBreaker:
+    """获取进程内共享的数据源熔断器"""
+    with _breakers_lock:
+        if source not in _breakers:
+            _breakers[source] = CircuitBreaker(source)
+        return _breakers[source]
+
+
+CRAWLER_CIRCUIT_OPEN.callback = lambda: {(name,): int(breaker.state != 'closed')
+                                         for name, breaker in list(_breakers.items())}
+
+
+class CrawlCheckpoint:
+    """历史页爬取进度: {数据源: {'page': 中断的页, 'latest': 中断时第1页的最新期号, 'updated_at': 时间戳}}"""
+
+    def __init__(self, path: str = None):
+        """初始化进度文件"""
+        self.path = path or CRAWLER_CONFIG['checkpoint_file']
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Any]:
+        """读取全部进度，文件不存在或损坏时为空"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"爬取进度文件损坏，已忽略: {self.path}: {e}")
+            return {}
+
+    def _save(self, checkpoints: Dict[str, Any]) -> None:
+        """写入全部进度(先写临时文件再替换)"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(f"{self.path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(checkpoints, f, ensure_ascii=False, indent=2)
+        os.replace(f"{self.path}.tmp", self.path)
+
+    def get(self, source: str) -> Optional[Dict[str, Any]]:
+        """未完成的爬取进度，没有时返回None"""
+        with self._lock:
+            return self._load().get(source)
+
+    def update(self, source: str, page: int, latest: str) -> None:
+        """记录在第page页中断，中断时的最新期号为latest"""
+        with self._lock:
+            checkpoints = self._load()
+            checkpoints[source] = {'page': page, 'latest': latest, 'updated_at': time.time()}
+            self._save(checkpoints)
+
+    def clear(self, source: str) -> None:
+        """爬取完成后清除进度"""
+        with self._lock:
+            checkpoints = self._load()
+            if checkpoints.pop(source, None) is not None:
+                self._save(checkpoints)
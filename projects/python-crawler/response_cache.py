@@ -0,0 +1,133 @@
+"""
+响应缓存模块 - 彩票数据分析系统
+
+分析和图表接口的结果只在开奖数据变化时才会变化。
+响应按(路径, 查询参数, 彩种数据版本)缓存在内存中，带有效期；
+每个响应带基于内容的强ETag，客户端携带If-None-Match时可直接返回304。
+"""
+import time
+import hashlib
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlencode
+from typing import Dict, Any, Optional, Callable
+from config import CACHE_CONFIG
+
+
+class DataVersionCache:
+    """彩种数据版本缓存，避免每个请求都查询数据库"""
+
+    def __init__(self, loader: Callable[[int], str], ttl: int = None):
+        """loader为按彩票类型ID查询数据版本的函数"""
+        self.loader = loader
+        self.ttl = CACHE_CONFIG['version_ttl'] if ttl is None else ttl
+        self._versions = {}  # 彩票类型ID -> (版本号, 过期时间)
+
+    def cached(self, lottery_type_id: int) -> Optional[str]:
+        """未过期的数据版本，没有时返回None(不查询数据库，可在事件循环中调用)"""
+        cached = self._versions.get(lottery_type_id)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+        return None
+    
+    def get(self, lottery_type_id: int) -> str:
+        """获取数据版本，过期后重新查询"""
+        cached = self._versions.get(lottery_type_id)
+        now = time.monotonic()
+        if cached and cached[1] > now:
+            return cached[0]
+
+        version = self.loader(lottery_type_id)
+        self._versions[lottery_type_id] = (version, now + self.ttl)
+        return version
+
+    def invalidate(self, lottery_type_id: int = None) -> None:
+        """开奖数据更新后使版本缓存失效，不指定彩种时全部失效"""
+        if lottery_type_id is None:
+            self._versions.clear()
+        else:
+            self._versions.pop(lottery_type_id, None)
+
+
+class ResponseCache:
+    """按最近使用淘汰的响应缓存"""
+
+    def __init__(self, ttl: int = None, max_entries: int = None):
+        """初始化响应缓存"""
+        self.ttl = CACHE_CONFIG['ttl'] if ttl is None else ttl
+        self.max_entries = max_entries or CACHE_CONFIG['max_entries']
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(path: str, query: str, version: str) -> str:
+        """缓存键: 路径 + 排序后的查询参数 + 数据版本"""
+        return f"{path}?{urlencode(sorted(parse_qsl(query, keep_blank_values=True)))}#{version}"
+
+    @staticmethod
+    def etag(body: bytes) -> str:
+        """基于响应内容的强ETag"""
+        return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """获取未过期的缓存响应"""
+        entry = self._entries.get(key)
+        if entry is None or entry['expires'] <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: str, body: bytes, headers: Dict[str, str], media_type: str = None) -> Dict[str, Any]:
+        """保存响应，超出条目上限时淘汰最久未使用的响应"""
+        headers = {name: value for name, value in headers.items()
+                   if name.lower() not in ('content-length', 'etag', 'cache-control')}
+        entry = {
+            'body': body,
+            'headers': headers,
+            'media_type': media_type,
+            'etag': self.etag(body),
+            'expires': time.monotonic() + self.ttl
+        }
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    def cache_headers(self, entry: Dict[str, Any]) -> Dict[str, str]:
+        """响应的ETag和Cache-Control(max-age为缓存剩余有效期)"""
+        max_age = max(0, int(entry['expires'] - time.monotonic()))
+        return {'ETag': entry['etag'], 'Cache-Control': f"public, max-age={max_age}"}
+
+    def clear(self) -> None:
+        """清空缓存"""
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计"""
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0
+        }
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """判断If-None-Match请求头(逗号分隔的ETag列表)是否包含该ETag，按弱比较忽略W/前缀"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if (tag[2:] if tag.startswith('W/') else tag) == opaque:
+            return True
+    return False
@@ -0,0 +1,47 @@
+"""
+请求合并模块 - 彩票数据分析系统
+
+同一时刻的相同请求只执行一次计算：第一个请求负责计算，
+之后到达的相同请求等待这次计算完成并共享结果(single-flight)。
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """按键合并并发执行的协程"""
+
+    def __init__(self):
+        """初始化请求合并器"""
+        self._inflight = {}  # 键 -> 正在进行的计算
+        self.executed = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """执行func并返回结果，同一键已有计算在进行时等待其结果"""
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        self.executed += 1
+        try:
+            result = await func()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # 没有等待者时不产生未获取异常的警告
+            raise
+        finally:
+            del self._inflight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """合并统计"""
+        return {
+            'in_flight': len(self._inflight),
+            'executed': self.executed,
+            'coalesced': self.coalesced
+        }
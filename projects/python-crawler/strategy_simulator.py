@@ -0,0 +1,183 @@
+"""
+策略模拟模块 - 彩票数据分析系统
+
+用蒙特卡洛方法比较不同选号策略(模型选号、随机选号、热号选号)的投入产出。
+模拟按固定大小的任务块进行，每个任务块使用由(种子, 块序号)派生的独立随机数流，
+因此在相同种子下结果与进程数无关，可以复现。
+任务块的大小按彩票注数计算(block_size注)，每期投注多注时每块的期数相应减少，单个进程的内存占用不随每期注数增长。
+"""
+import os
+import math
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any
+from loguru import logger
+from config import SIMULATION_CONFIG
+from number_encoding import ZONE_LAYOUT, GAME_ZONES, detect_game, encode_batch, encode_numbers, \
+    is_valid_packed, random_packed, unpack_matrices
+from prize_checker import PrizeChecker
+from prediction_models import PredictionModelFactory
+
+
+def _simulate_block(game: str, strategies: List[Dict[str, Any]], seed: int, block_index: int,
+                    draws: int, fc3d_play: str) -> Dict[str, Dict[str, Any]]:
+    """
+    进程任务: 模拟一个任务块的开奖，返回各策略的累计统计量
+    所有策略共用同一组模拟开奖号码，便于横向比较
+    """
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(block_index,)))
+    checker = PrizeChecker(game, fc3d_play=fc3d_play)
+    draw_codes = random_packed(game, rng, draws)
+
+    block_stats = {}
+    for strategy in strategies:
+        tickets_per_draw = strategy.get('tickets_per_draw', 1)
+
+        if strategy['type'] == 'fixed':
+            fixed = np.asarray(strategy['tickets'], dtype=np.uint64)
+            tickets = np.broadcast_to(fixed, (draws, len(fixed)))
+        elif strategy['type'] == 'random':
+            tickets = random_packed(game, rng, draws * tickets_per_draw).reshape(draws, tickets_per_draw)
+        elif strategy['type'] == 'pool':
+            tickets = random_packed(game, rng, draws * tickets_per_draw,
+                                    strategy['pools']).reshape(draws, tickets_per_draw)
+        else:
+            raise ValueError(f"未知的策略类型: {strategy['type']}")
+
+        tiers = checker.check(tickets, draw_codes[:, None])
+        payout = checker.payouts(tiers).sum(axis=1)
+        net = payout - tickets.shape[1] * checker.ticket_price
+
+        block_stats[strategy['name']] = {
+            'draws': draws,
+            'tickets': int(tickets.size),
+            'payout': float(payout.sum()),
+            'net_sum': float(net.sum()),
+            'net_sq_sum': float(np.square(net).sum()),
+            'tier_counts': np.bincount(tiers.ravel(), minlength=checker.max_tier + 1)
+        }
+    return block_stats
+
+
+class StrategySimulator:
+    """蒙特卡洛选号策略模拟器"""
+
+    def __init__(self, game: str, strategies: List[Dict[str, Any]], seed: int = None,
+                 workers: int = None, block_size: int = None, fc3d_play: str = 'direct'):
+        """
+        初始化模拟器
+        strategies中每个策略为字典:
+        {'name': 'model', 'type': 'fixed', 'tickets': [打包号码, ...]}  每期购买固定号码
+        {'name': 'random', 'type': 'random', 'tickets_per_draw': 1}      每期随机选号
+        {'name': 'hot', 'type': 'pool', 'pools': {'front': [...]}, 'tickets_per_draw': 1}  从候选池中随机选号
+        """
+        if game not in GAME_ZONES:
+            raise ValueError(f"未知的彩票类型: {game}")
+        if not strategies:
+            raise ValueError("至少需要一个选号策略")
+
+        self.game = game
+        self.strategies = strategies
+        self.seed = SIMULATION_CONFIG['seed'] if seed is None else seed
+        self.workers = workers or SIMULATION_CONFIG['workers'] or os.cpu_count() or 1
+        self.block_size = block_size or SIMULATION_CONFIG['block_size']
+        self.fc3d_play = fc3d_play
+        # 每个任务块的期数: 投注最多的策略每块不超过block_size注
+        max_tickets = max(len(strategy['tickets']) if strategy['type'] == 'fixed'
+                          else strategy.get('tickets_per_draw', 1) for strategy in strategies)
+        self.block_draws = max(1, self.block_size // max(1, max_tickets))
+
+    def run(self, draws: int) -> Dict[str, Any]:
+        """模拟指定期数，返回各策略的期望收益、方差等统计"""
+        block_count = math.ceil(draws / self.block_draws)
+        block_draws = [min(self.block_draws, draws - index * self.block_draws) for index in range(block_count)]
+        args = [(self.game, self.strategies, self.seed, index, count, self.fc3d_play)
+                for index, count in enumerate(block_draws)]
+
+        logger.info(f"策略模拟开始: {self.game}, {draws}期, {block_count}个任务块, {self.workers}个进程")
+
+        if self.workers == 1:
+            results = [_simulate_block(*arg) for arg in args]
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                results = list(executor.map(_simulate_block, *zip(*args)))
+
+        # 按任务块顺序累加，保证浮点结果可复现
+        totals = {}
+        for block_stats in results:
+            for name, stats in block_stats.items():
+                if name not in totals:
+                    totals[name] = dict(stats, tier_counts=stats['tier_counts'].copy())
+                    continue
+                for key in ('draws', 'tickets', 'payout', 'net_sum', 'net_sq_sum'):
+                    totals[name][key] += stats[key]
+                totals[name]['tier_counts'] += stats['tier_counts']
+
+        return {
+            'game': self.game,
+            'draws': draws,
+            'seed': self.seed,
+            'block_size': self.block_size,
+            'block_draws': self.block_draws,
+            'strategies': [self._report(strategy, totals[strategy['name']]) for strategy in self.strategies]
+        }
+
+    @staticmethod
+    def _report(strategy: Dict[str, Any], totals: Dict[str, Any]) -> Dict[str, Any]:
+        """把累计统计量转换为每期的期望收益和方差"""
+        draws = totals['draws']
+        cost = totals['payout'] - totals['net_sum']
+        mean = totals['net_sum'] / draws
+        variance = (totals['net_sq_sum'] - draws * mean * mean) / (draws - 1) if draws > 1 else 0.0
+        variance = max(variance, 0.0)
+        tier_counts = totals['tier_counts']
+
+        return {
+            'name': strategy['name'],
+            'type': strategy['type'],
+            'draws': draws,
+            'tickets': totals['tickets'],
+            'cost': round(cost, 2),
+            'payout': round(totals['payout'], 2),
+            'expected_return': round(mean, 4),
+            'variance': round(variance, 4),
+            'std': round(math.sqrt(variance), 4),
+            'roi': round(totals['payout'] / cost - 1, 6) if cost else 0.0,
+            'win_rate': round(int(tier_counts[1:].sum()) / totals['tickets'], 6),
+            'tier_counts': {tier: int(tier_counts[tier]) for tier in range(1, len(tier_counts))}
+        }
+
+
+def hot_number_pools(game: str, history: List[Dict[str, Any]], ratio: float = None) -> Dict[str, List[int]]:
+    """统计历史开奖中各号码区出现次数最多的号码，作为热号候选池"""
+    ratio = ratio or SIMULATION_CONFIG['hot_pool_ratio']
+    matrices = unpack_matrices(game, encode_batch(game, [result['numbers'] for result in history]))
+
+    pools = {}
+    for zone in ZONE_LAYOUT[game]:
+        counts = np.bincount(matrices[zone['name']].ravel() - zone['low'], minlength=zone['width'])
+        size = max(zone['picks'], int(round(zone['width'] * ratio)))
+        top = np.argsort(-counts, kind='stable')[:size]
+        pools[zone['name']] = sorted(int(index) + zone['low'] for index in top)
+    return pools
+
+
+def build_strategies(history: List[Dict[str, Any]], tickets_per_draw: int = 1) -> List[Dict[str, Any]]:
+    """根据历史开奖数据构建默认的比较策略: 模型选号、随机选号、热号选号"""
+    game = detect_game(history[0]['numbers'])
+    strategies = []
+
+    try:
+        model = PredictionModelFactory.create_model("FREQUENCY")
+        if model.train(history):
+            ticket = encode_numbers(game, model.predict(history))
+            if not is_valid_packed(game, ticket):
+                raise ValueError("模型预测号码不符合选号规则")
+            strategies.append({'name': 'model', 'type': 'fixed', 'tickets': [ticket]})
+    except Exception as e:
+        logger.warning(f"模型选号策略构建失败，已跳过: {e}")
+
+    strategies.append({'name': 'random', 'type': 'random', 'tickets_per_draw': tickets_per_draw})
+    strategies.append({'name': 'hot', 'type': 'pool', 'tickets_per_draw': tickets_per_draw,
+                       'pools': hot_number_pools(game, history)})
+    return strategies
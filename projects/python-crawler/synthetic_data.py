@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+合成开奖数据生成器 - 彩票数据分析系统
+
+一次向量化生成任意期数的合法开奖号码，用于写入测试数据库、基准测试和压力测试:
+- 号码: 每个号码区对(期数, 候选号码数)做不放回抽样，argsort方式取每行均匀随机数最小的k列
+  (用argpartition只做部分排序，结果与argsort取前k列相同)，permuted方式用Generator.permuted
+  逐行打乱候选号码取前k列；同一种子和方式结果可复现
+- 号码JSON: 各彩种号码JSON的长度固定，按模板把数字直接写入字节矩阵，不逐期格式化
+- 期号和开奖日期按期序号整体计算
+结果可经DatabaseManager.insert_lottery_rows批量入库，或保存为按列压缩的.npz文件。
+"""
+import sys
+import os
+import json
+import time
+import argparse
+import numpy as np
+from typing import List, Dict, Any, Iterator
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from number_encoding import ZONE_LAYOUT, format_numbers, pack_matrices
+
+GENERATE_METHODS = ('argsort', 'permuted')
+
+
+def random_matrices(game: str, rng: np.random.Generator, count: int,
+                    method: str = 'argsort') -> Dict[str, np.ndarray]:
+    """生成各号码区的号码矩阵(count, 选号个数)，号码升序"""
+    if method not in GENERATE_METHODS:
+        raise ValueError(f"未知的生成方式: {method}")
+
+    matrices = {}
+    for zone in ZONE_LAYOUT[game]:
+        width = zone['high'] - zone['low'] + 1
+        if zone['picks'] == 1:
+            columns = rng.integers(0, width, size=(count, 1))
+        elif method == 'argsort':
+            keys = rng.random((count, width), dtype=np.float32)
+            columns = np.argpartition(keys, zone['picks'] - 1, axis=1)[:, :zone['picks']]
+        else:
+            candidates = np.broadcast_to(np.arange(width, dtype=np.int16), (count, width))
+            columns = rng.permuted(candidates, axis=1)[:, :zone['picks']]
+        matrices[zone['name']] = np.sort(columns, axis=1).astype(np.int16) + zone['low']
+    return matrices
+
+
+def _digit_columns(game: str, matrices: Dict[str, np.ndarray]) -> List[np.ndarray]:
+    """号码JSON中按出现顺序排列的各位数字"""
+    if game == 'FC3D':  # main为三位数字串，之后是百位、十位、个位
+        digits = [matrices['hundred'][:, 0], matrices['ten'][:, 0], matrices['unit'][:, 0]]
+        return digits + digits
+    columns = []
+    for zone in ZONE_LAYOUT[game]:  # 大乐透/双色球的号码都是两位
+        for index in range(zone['picks']):
+            columns.append(matrices[zone['name']][:, index] // 10)
+            columns.append(matrices[zone['name']][:, index] % 10)
+    return columns
+
+
+def numbers_json(game: str, matrices: Dict[str, np.ndarray]) -> np.ndarray:
+    """
+    生成与json.dumps(format_numbers(...), ensure_ascii=False)相同的号码JSON字符串数组
+    号码全为0时的JSON作为模板，其中的每个'0'就是一位数字的位置(各号码区的键名不含'0')
+    """
+    zeros = {zone['name']: [0] * zone['picks'] for zone in ZONE_LAYOUT[game]}
+    template = json.dumps(format_numbers(game, zeros), ensure_ascii=False).encode('ascii')
+    positions = [index for index, char in enumerate(template) if char == ord('0')]
+    digits = _digit_columns(game, matrices)
+
+    buffer = np.tile(np.frombuffer(template, dtype=np.uint8), (len(digits[0]), 1))
+    for position, column in zip(positions, digits):
+        buffer[:, position] += column.astype(np.uint8)
+    return buffer.view(f'S{len(template)}').ravel().astype(f'U{len(template)}')
+
+
+def generate_draws(game: str, count: int, seed: int = None, method: str = 'argsort',
+                   start_date: str = '2000-01-01', interval_days: int = 1) -> Dict[str, np.ndarray]:
+    """
+    生成count期合成开奖，返回按时间升序的列:
+    draw_number(7位期号)、draw_date(datetime64[D])、numbers(号码JSON)、packed(打包号码)及各号码区矩阵
+    """
+    rng = np.random.default_rng(seed)
+    matrices = random_matrices(game, rng, count, method)
+    sequence = np.arange(1, count + 1)
+    draws = {
+        'draw_number': np.char.zfill(sequence.astype(str), 7),
+        'draw_date': np.datetime64(start_date, 'D') + (sequence - 1) * interval_days,
+        'numbers': numbers_json(game, matrices),
+        'packed': pack_matrices(game, matrices)
+    }
+    draws.update(matrices)
+    return draws
+
+
+def iter_rows(lottery_type_id: int, draws: Dict[str, np.ndarray]) -> Iterator[tuple]:
+    """逐行产出DatabaseManager.insert_lottery_rows所需的参数元组"""
+    dates = draws['draw_date'].astype(str).tolist()
+    for draw_number, draw_date, numbers in zip(draws['draw_number'].tolist(), dates, draws['numbers'].tolist()):
+        yield lottery_type_id, draw_number, draw_date, numbers, None, None
+
+
+def to_results(draws: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+    """转换为与get_lottery_results相同格式的开奖记录列表(最新一期在前)"""
+    dates = draws['draw_date'].astype(str).tolist()
+    return [{'draw_number': draw_number, 'draw_date': draw_date, 'numbers': json.loads(numbers),
+             'sales_amount': None, 'prize_pool': None}
+            for draw_number, draw_date, numbers in zip(reversed(draws['draw_number'].tolist()),
+                                                       reversed(dates), reversed(draws['numbers'].tolist()))]
+
+
+def save_draws(path: str, draws: Dict[str, np.ndarray]) -> None:
+    """按列保存为压缩的.npz文件"""
+    np.savez_compressed(path, **draws)
+
+
+def load_draws(path: str) -> Dict[str, np.ndarray]:
+    """读取save_draws保存的列"""
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="合成开奖数据生成器")
+    parser.add_argument('--games', default='DLT,SSQ,FC3D', help='彩种，逗号分隔')
+    parser.add_argument('--count', type=int, default=100000, help='每个彩种的期数')
+    parser.add_argument('--seed', type=int, default=2024, help='随机种子')
+    parser.add_argument('--method', choices=GENERATE_METHODS, default='argsort', help='不放回抽样方式')
+    parser.add_argument('--output', help='把每个彩种保存为该目录下的<彩种>.npz')
+    parser.add_argument('--db', action='store_true', help='写入数据库(按配置，DB_BACKEND=sqlite时为本地替身)')
+    args = parser.parse_args()
+
+    if not args.output and not args.db:
+        parser.error("请指定--output或--db")
+
+    db = None
+    lottery_type_ids = {}
+    if args.db:
+        from database import create_database
+        db = create_database()
+        lottery_type_ids = {row['type_code']: row['id'] for row in db.get_lottery_types()}
+
+    try:
+        for index, game in enumerate(game.strip().upper() for game in args.games.split(',')):
+            start = time.perf_counter()
+            draws = generate_draws(game, args.count, [args.seed, index], args.method)
+            print(f"🎲 {game}: 生成{args.count}期, {time.perf_counter() - start:.2f}秒")
+
+            if args.output:
+                os.makedirs(args.output, exist_ok=True)
+                path = os.path.join(args.output, f"{game}.npz")
+                save_draws(path, draws)
+                print(f"💾 已保存: {path}")
+            if db:
+                start = time.perf_counter()
+                db.insert_lottery_rows(iter_rows(lottery_type_ids[game], draws))
+                print(f"🗄️ 已入库: {time.perf_counter() - start:.2f}秒")
+    finally:
+        if db:
+            db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+"""测试配置: 把项目目录加入Python路径"""
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
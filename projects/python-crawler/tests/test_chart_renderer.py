@@ -0,0 +1,56 @@
+"""图表渲染测试: ETag匹配和缓存文件被淘汰时重新渲染"""
+import asyncio
+import os
+import pytest
+from chart_renderer import ChartRenderer
+from data_analysis import LotteryDataAnalyzer
+from local_db import LocalDatabaseManager
+
+
+@pytest.fixture
+def renderer(tmp_path):
+    db = LocalDatabaseManager()
+    lottery_type_id = {row['type_code']: row['id'] for row in db.get_lottery_types()}['SSQ']
+    for index in range(1, 40):
+        red = [f"{(index + offset) % 33 + 1:02d}" for offset in range(0, 30, 5)]
+        db.insert_lottery_result(lottery_type_id, f"2024{index:03d}", '2024-01-02', {'red': red, 'blue': '07'})
+    renderer = ChartRenderer(LotteryDataAnalyzer(db), cache_dir=str(tmp_path), workers=1)
+    renderer.lottery_type_id = lottery_type_id
+    yield renderer
+    renderer.close()
+    db.close()
+
+
+def _get(renderer, if_none_match=None):
+    return asyncio.run(renderer.get_chart(renderer.lottery_type_id, 'frequency', fmt='json',
+                                          if_none_match=if_none_match))
+
+
+def test_if_none_match(renderer):
+    content, etag = _get(renderer)
+    assert content
+    assert _get(renderer, etag) == (None, etag)
+    assert _get(renderer, f'"other", W/{etag}') == (None, etag)
+    assert _get(renderer, etag[:-2] + '"')[0] == content
+    assert _get(renderer, f'"x{etag[1:]}')[0] == content
+    assert _get(renderer, f'"x"{etag}')[0] == content
+
+
+def test_cached_file_evicted_before_read(renderer):
+    content, _ = _get(renderer)
+    path = next(iter(renderer._memory))
+    renderer._memory.clear()
+    renderer._memory_bytes = 0
+
+    # 提交时命中磁盘缓存，读取前文件被淘汰
+    is_cached = renderer._is_cached
+
+    def evict_after_check(cache_path):
+        renderer._is_cached = is_cached
+        cached = is_cached(cache_path)
+        os.remove(cache_path)
+        return cached
+
+    renderer._is_cached = evict_after_check
+    assert _get(renderer)[0] == content
+    assert os.path.exists(path)
@@ -0,0 +1,53 @@
+"""特征存储测试: 复用缓存序列时校验号码"""
+import numpy as np
+from feature_store import FeatureStore, build_features
+from number_encoding import encode_batch
+
+
+def _draw(index: int, blue: int = 1):
+    """第index期双色球开奖"""
+    red = [f"{(index + offset) % 33 + 1:02d}" for offset in range(0, 30, 5)]
+    return {'draw_number': f"2024{index:03d}", 'numbers': {'red': red, 'blue': f"{blue:02d}"}}
+
+
+def _expected(history):
+    """按history整体计算的特征"""
+    return build_features('SSQ', encode_batch('SSQ', [result['numbers'] for result in history[::-1]]), 30)
+
+
+def _assert_features(features, history):
+    for key, value in _expected(history).items():
+        np.testing.assert_array_equal(features[key], value)
+
+
+def test_append_new_draws(tmp_path):
+    store = FeatureStore(str(tmp_path), window=30)
+    history = [_draw(index) for index in range(40, 0, -1)]
+    store.get_features('SSQ', history[2:])
+    _assert_features(store.get_features('SSQ', history), history)
+
+
+def test_draw_updated_in_place(tmp_path):
+    store = FeatureStore(str(tmp_path), window=30)
+    history = [_draw(index) for index in range(40, 0, -1)]
+    store.get_features('SSQ', history)
+    version = store.version('SSQ')
+
+    history[5] = _draw(35, blue=9)
+    _assert_features(store.get_features('SSQ', history), history)
+    assert store.version('SSQ') != version
+
+    # 进程重启后从磁盘加载的缓存同样校验号码
+    history[0] = _draw(40, blue=9)
+    _assert_features(FeatureStore(str(tmp_path), window=30).get_features('SSQ', history), history)
+
+
+def test_append_draw_corrected(tmp_path):
+    store = FeatureStore(str(tmp_path), window=30)
+    history = [_draw(index) for index in range(40, 0, -1)]
+    store.get_features('SSQ', history)
+
+    history[0] = _draw(40, blue=9)
+    store.append_draw('SSQ', history[0])
+    assert 'SSQ' not in store._series
+    _assert_features(store.get_features('SSQ', history), history)
@@ -0,0 +1,39 @@
+"""模型调参测试: 候选参数组合"""
+import itertools
+import numpy as np
+import pytest
+from config import TUNING_CONFIG
+from model_tuning import parameter_sets
+
+SPACE = {'window_size': [20, 50, 100, 200], 'weight_factor': [0.5, 0.8, 1.0]}
+
+
+def test_grid():
+    assert parameter_sets(SPACE) == [{'weight_factor': factor, 'window_size': size}
+                                     for factor in SPACE['weight_factor'] for size in SPACE['window_size']]
+
+
+def test_grid_too_large():
+    space = {f'p{index}': list(range(10)) for index in range(4)}
+    with pytest.raises(ValueError):
+        parameter_sets(space)
+
+
+@pytest.mark.parametrize('space', [{'window_size': 20}, {'window_size': []}])
+def test_invalid_space(space):
+    with pytest.raises(ValueError):
+        parameter_sets(space)
+
+
+def test_random_matches_full_grid_sampling():
+    names = sorted(SPACE)
+    grid = [dict(zip(names, values)) for values in itertools.product(*(SPACE[name] for name in names))]
+    indexes = sorted(np.random.default_rng(7).choice(len(grid), size=5, replace=False))
+    assert parameter_sets(SPACE, 'random', 5, seed=7) == [grid[index] for index in indexes]
+
+
+def test_random_large_space():
+    space = {f'p{index}': list(range(100)) for index in range(6)}
+    candidates = parameter_sets(space, 'random', TUNING_CONFIG['max_samples'])
+    assert len(candidates) == TUNING_CONFIG['max_samples']
+    assert len({tuple(sorted(candidate.items())) for candidate in candidates}) == len(candidates)
@@ -0,0 +1,19 @@
+"""号码编码测试: 选号规则校验"""
+import pytest
+from number_encoding import numbers_valid
+
+
+@pytest.mark.parametrize('game, numbers, valid', [
+    ('DLT', {'front': ['01', '02', '03', '04', '35'], 'back': ['01', '12']}, True),
+    ('DLT', {'front': ['01', '02', '03', '04', '05'], 'back': ['01', '30']}, False),
+    ('DLT', {'front': ['01', '02', '03', '04', '05'], 'back': ['01', '13']}, False),
+    ('DLT', {'front': ['01', '02', '03', '04', '04'], 'back': ['01', '02']}, False),
+    ('DLT', {'front': ['01', '02', '03', '04'], 'back': ['01', '02']}, False),
+    ('SSQ', {'red': ['01', '02', '03', '04', '05', '33'], 'blue': '16'}, True),
+    ('SSQ', {'red': ['01', '02', '03', '04', '05', '06'], 'blue': '32'}, False),
+    ('SSQ', {'red': ['01', '02', '03', '04', '05', '06']}, False),
+    ('FC3D', {'main': '090', 'hundred': 0, 'ten': 9, 'unit': 0}, True),
+    ('FC3D', {'main': '0', 'hundred': 0, 'ten': 10, 'unit': 0}, False),
+])
+def test_numbers_valid(game, numbers, valid):
+    assert numbers_valid(game, numbers) is valid
@@ -0,0 +1,60 @@
+"""页面解析测试: 两种后端输出一致，格式错误的行跳过"""
+import pytest
+from parsers import ParserFactory
+from replay_server import render_history_page
+
+
+def _row(draw_number: str, balls: str) -> str:
+    """开奖表格的一行"""
+    return (f'<tr><td class="draw">{draw_number}</td><td class="date">2024-01-02</td>'
+            f'<td class="numbers">{balls}</td><td class="sales">1,234.50</td><td class="pool">bad</td></tr>')
+
+
+def _page(rows) -> str:
+    """只含开奖表格的页面"""
+    return f'<html><body><table class="historylist"><tbody>{"".join(rows)}</tbody></table></body></html>'
+
+
+def _balls(red, blue=()) -> str:
+    """号码球"""
+    return (''.join(f'<span class="ball red">{num}</span>' for num in red)
+            + ''.join(f'<span class="ball blue">{num}</span>' for num in blue))
+
+
+@pytest.mark.parametrize('backend', ['lxml', 'bs4'])
+def test_parse_rendered_page(backend):
+    results = [{'draw_number': '2024001', 'draw_date': '2024-01-02',
+                'numbers': {'red': ['01', '02', '03', '04', '05', '06'], 'blue': '07'},
+                'sales_amount': 1234.5, 'prize_pool': 100.0}]
+    parser = ParserFactory.create_parser('ssq_parser', backend)
+    assert parser.parse(render_history_page('SSQ', results, 1, 1)) == results
+
+
+@pytest.mark.parametrize('backend', ['lxml', 'bs4'])
+def test_skip_malformed_rows(backend):
+    html = _page([
+        _row('2024003', _balls(['01', '02', '03', '04', '05', '06'])),  # 缺少蓝球
+        _row('2024002', _balls(['01', '02', '03', '04', '05', '06'], ['07', '08'])),  # 两个蓝球
+        _row('2024001', _balls(['01', '02', '03', '04', '05', '06'], ['07'])),
+    ])
+    results = ParserFactory.create_parser('ssq_parser', backend).parse(html)
+    assert [result['draw_number'] for result in results] == ['2024001']
+    assert results[0]['sales_amount'] == 1234.5
+    assert results[0]['prize_pool'] is None
+
+
+@pytest.mark.parametrize('backend', ['lxml', 'bs4'])
+def test_skip_malformed_dlt_and_fc3d_rows(backend):
+    dlt = _page([
+        _row('2024002', _balls(['01', '02', '03', '04', '36'], ['01', '02'])),  # 前区超出范围
+        _row('2024001', _balls(['01', '02', '03', '04', '05'], ['01', '12'])),
+    ])
+    fc3d = _page([
+        _row('2024003', _balls(['1', '2'])),  # 少一位
+        _row('2024002', _balls(['1', 'x', '3'])),
+        _row('2024001', _balls(['0', '9', '0'])),
+    ])
+    assert [result['draw_number'] for result in ParserFactory.create_parser('dlt_parser', backend).parse(dlt)] \
+        == ['2024001']
+    results = ParserFactory.create_parser('fc3d_parser', backend).parse(fc3d)
+    assert [result['numbers'] for result in results] == [{'main': '090', 'hundred': 0, 'ten': 9, 'unit': 0}]
@@ -0,0 +1,19 @@
+"""预测模型测试: 批量评估"""
+import numpy as np
+from prediction_models import FrequencyAnalysisModel
+
+DLT_DRAW = {'front': ['01', '02', '03', '04', '05'], 'back': ['01', '02']}
+
+
+def test_evaluate_batch_matches_evaluate():
+    model = FrequencyAnalysisModel()
+    predicted = [DLT_DRAW, {'front': ['01', '02', '10', '11', '12'], 'back': ['01', '03']}]
+    scores = model.evaluate_batch([DLT_DRAW], predicted)
+    assert scores.tolist() == [model.evaluate(DLT_DRAW, numbers) for numbers in predicted]
+
+
+def test_evaluate_batch_empty():
+    model = FrequencyAnalysisModel()
+    assert model.evaluate_batch([], []).shape == (0,)
+    assert model.evaluate_batch([DLT_DRAW], []).shape == (0,)
+    assert model.evaluate_batch(np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.uint64), 'DLT').shape == (0,)
@@ -0,0 +1,94 @@
+"""兑奖引擎测试: 文本彩票解析和各彩种奖级"""
+import numpy as np
+import pytest
+from number_encoding import encode_numbers
+from prize_checker import PrizeChecker, parse_ticket_lines
+
+
+def dlt(front, back):
+    """大乐透打包号码"""
+    return encode_numbers('DLT', {'front': [f"{n:02d}" for n in front], 'back': [f"{n:02d}" for n in back]})
+
+
+def ssq(red, blue):
+    """双色球打包号码"""
+    return encode_numbers('SSQ', {'red': [f"{n:02d}" for n in red], 'blue': f"{blue:02d}"})
+
+
+def fc3d(number):
+    """福彩3D打包号码"""
+    return encode_numbers('FC3D', {'main': number, 'hundred': int(number[0]), 'ten': int(number[1]),
+                                   'unit': int(number[2])})
+
+
+class TestParseTicketLines:
+
+    def test_valid_lines(self):
+        packed, invalid = parse_ticket_lines('DLT', ['01 02 03 04 05 + 06 07', '10,11,12,13,14|01 12', '  '])
+        assert invalid == 0
+        assert packed.tolist() == [dlt([1, 2, 3, 4, 5], [6, 7]), dlt([10, 11, 12, 13, 14], [1, 12])]
+
+    def test_extra_and_missing_numbers_do_not_shift_tickets(self):
+        lines = ['01 02 03 04 05 + 06 07 08', '10 11 12 13 14 + 01', '20 21 22 23 24 + 02 03']
+        packed, invalid = parse_ticket_lines('DLT', lines)
+        assert invalid == 2
+        assert packed.tolist() == [dlt([20, 21, 22, 23, 24], [2, 3])]
+
+    def test_zone_counts_must_match_separator(self):
+        packed, invalid = parse_ticket_lines('DLT', ['01 02 03 04 05 06 + 07'])
+        assert invalid == 1 and len(packed) == 0
+
+    def test_out_of_range_duplicate_and_oversized_numbers(self):
+        lines = ['01 02 03 04 36 + 01 02', '01 01 03 04 05 + 01 02', '01 02 03 04 05 + 01 99999999999999999999',
+                 '01 02 03 04 05 + 01 13', '31 32 33 34 35 + 11 12']
+        packed, invalid = parse_ticket_lines('DLT', lines)
+        assert invalid == 4
+        assert packed.tolist() == [dlt([31, 32, 33, 34, 35], [11, 12])]
+
+    def test_ssq_blue_range(self):
+        packed, invalid = parse_ticket_lines('SSQ', ['01 02 03 04 05 06 + 16', '01 02 03 04 05 06 + 17'])
+        assert invalid == 1
+        assert packed.tolist() == [ssq([1, 2, 3, 4, 5, 6], 16)]
+
+    def test_fc3d(self):
+        packed, invalid = parse_ticket_lines('FC3D', ['123', '4 5 6', '12', '1234'])
+        assert invalid == 2
+        assert packed.tolist() == [fc3d('123'), fc3d('456')]
+
+
+class TestTiers:
+
+    @pytest.mark.parametrize('front_hits, back_hits, tier', [
+        (5, 2, 1), (5, 1, 2), (5, 0, 3), (4, 2, 4), (4, 1, 5), (3, 2, 6), (4, 0, 7),
+        (3, 1, 8), (2, 2, 8), (3, 0, 9), (2, 1, 9), (1, 2, 9), (0, 2, 9), (2, 0, 0), (1, 1, 0), (0, 0, 0)
+    ])
+    def test_dlt(self, front_hits, back_hits, tier):
+        draw = dlt([1, 2, 3, 4, 5], [1, 2])
+        ticket = dlt(list(range(1, front_hits + 1)) + list(range(30, 35 - front_hits)),
+                     list(range(1, back_hits + 1)) + list(range(11, 13 - back_hits)))
+        assert PrizeChecker('DLT').check(np.array([ticket]), draw).tolist() == [tier]
+
+    @pytest.mark.parametrize('red_hits, blue_hit, tier', [
+        (6, 1, 1), (6, 0, 2), (5, 1, 3), (5, 0, 4), (4, 1, 4), (4, 0, 5), (3, 1, 5),
+        (2, 1, 6), (1, 1, 6), (0, 1, 6), (3, 0, 0), (0, 0, 0)
+    ])
+    def test_ssq(self, red_hits, blue_hit, tier):
+        draw = ssq([1, 2, 3, 4, 5, 6], 1)
+        ticket = ssq(list(range(1, red_hits + 1)) + list(range(27, 33 - red_hits)), 1 if blue_hit else 16)
+        assert PrizeChecker('SSQ').check(np.array([ticket]), draw).tolist() == [tier]
+
+    def test_fc3d_direct_and_group(self):
+        tickets = np.array([fc3d('123'), fc3d('321'), fc3d('112'), fc3d('121'), fc3d('111')], dtype=np.uint64)
+        assert PrizeChecker('FC3D').check(tickets, fc3d('123')).tolist() == [1, 0, 0, 0, 0]
+        group = PrizeChecker('FC3D', fc3d_play='group')
+        assert group.check(tickets, fc3d('123')).tolist() == [3, 3, 0, 0, 0]
+        assert group.check(tickets, fc3d('211')).tolist() == [0, 0, 2, 2, 0]
+        assert group.check(tickets, fc3d('111')).tolist() == [0, 0, 0, 0, 0]
+
+    def test_summarize_payout(self):
+        checker = PrizeChecker('DLT')
+        tickets = np.array([dlt([1, 2, 3, 4, 5], [1, 2]), dlt([1, 2, 3, 30, 31], [11, 12])], dtype=np.uint64)
+        summary, = checker.summarize(tickets, np.array([dlt([1, 2, 3, 4, 5], [1, 2])], dtype=np.uint64))
+        assert summary['tier_counts'][1] == 1 and summary['tier_counts'][9] == 1
+        assert summary['payout'] == 10000000 + 5
+        assert summary['cost'] == 4
@@ -0,0 +1,35 @@
+"""响应缓存测试: If-None-Match匹配"""
+import pytest
+from response_cache import DataVersionCache, etag_matches
+
+
+@pytest.mark.parametrize('header, matches', [
+    (None, False),
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"x", "abc"', True),
+    ('"x",W/"abc" ', True),
+    ('*', True),
+    ('"ab"', False),
+    ('"abcd"', False),
+    ('"x""abc"', False),
+    ('"abc"x', False),
+])
+def test_etag_matches(header, matches):
+    assert etag_matches(header, '"abc"') is matches
+
+
+def test_weak_etag():
+    assert etag_matches('"abc"', 'W/"abc"')
+
+
+def test_data_version_cache():
+    calls = []
+    versions = DataVersionCache(lambda lottery_type_id: calls.append(lottery_type_id) or f"v{len(calls)}", ttl=60)
+    assert versions.cached(1) is None
+    assert versions.get(1) == 'v1'
+    assert versions.cached(1) == 'v1'
+    assert versions.get(1) == 'v1' and calls == [1]
+    versions.invalidate(1)
+    assert versions.cached(1) is None
+    assert versions.get(1) == 'v2'
@@ -0,0 +1,17 @@
+"""策略模拟测试: 任务块按注数划分"""
+from strategy_simulator import StrategySimulator
+
+
+def test_block_draws_scale_with_tickets_per_draw():
+    strategies = [{'name': 'random', 'type': 'random', 'tickets_per_draw': 100},
+                  {'name': 'model', 'type': 'fixed', 'tickets': [1, 2]}]
+    simulator = StrategySimulator('DLT', strategies, workers=1, block_size=1000)
+    assert simulator.block_draws == 10
+    result = simulator.run(25)
+    assert result['block_draws'] == 10
+    assert [strategy['tickets'] for strategy in result['strategies']] == [2500, 50]
+
+
+def test_single_ticket_blocks_keep_block_size():
+    simulator = StrategySimulator('SSQ', [{'name': 'random', 'type': 'random'}], workers=1, block_size=1000)
+    assert simulator.block_draws == 1000
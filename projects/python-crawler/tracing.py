@@ -0,0 +1,123 @@
+"""
+链路追踪模块 - 彩票数据分析系统
+
+为爬取 → 解析 → 入库 → 分析/评估流水线的各阶段记录结构化的计时区间(span)。
+每个区间带trace_id、span_id和父区间ID，以及彩种、页码、行数等属性，
+结束时以一行JSON追加写入TRACING_CONFIG['file']，便于本地采集器读取。
+当前区间通过contextvars传递；提交到线程池的任务需用copy_context()带上父区间。
+"""
+import os
+import json
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, Any, Optional, Iterator
+from config import TRACING_CONFIG
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+_write_lock = threading.Lock()
+
+
+class Span:
+    """计时区间"""
+
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'attributes', 'start', 'status', 'error')
+
+    def __init__(self, name: str, parent: Optional['Span'], attributes: Dict[str, Any]):
+        """初始化区间，没有父区间时开始新的链路"""
+        self.name = name
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = attributes
+        self.start = time.time()
+        self.status = 'ok'
+        self.error = None
+
+    def set(self, key: str, value: Any) -> None:
+        """设置区间属性"""
+        self.attributes[key] = value
+
+    def to_dict(self, end: float) -> Dict[str, Any]:
+        """区间的JSON记录"""
+        record = {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': round(self.start, 6),
+            'duration_ms': round((end - self.start) * 1000, 3),
+            'status': self.status,
+            'thread': threading.current_thread().name,
+            'attributes': self.attributes
+        }
+        if self.error:
+            record['error'] = self.error
+        return record
+
+
+class _NoopSpan:
+    """未启用追踪时使用的空区间"""
+
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+
+_noop_span = _NoopSpan()
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Span]:
+    """
+    记录一个区间: with span('save_results', game='DLT') as s: ...; s.set('rows', n)
+    区间内抛出的异常会记录到区间中并继续抛出
+    """
+    if not TRACING_CONFIG['enabled']:
+        yield _noop_span
+        return
+
+    current = Span(name, _current_span.get(), attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.status = 'error'
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        _write(current.to_dict(time.time()))
+
+
+def traced(name: str) -> Callable:
+    """装饰器: 把函数的每次调用记录为一个区间"""
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_span() -> Optional[Span]:
+    """当前区间"""
+    return _current_span.get()
+
+
+def _write(record: Dict[str, Any]) -> None:
+    """追加写入一行JSON，文件超过max_bytes时轮转为.1文件"""
+    path = TRACING_CONFIG['file']
+    line = json.dumps(record, ensure_ascii=False, default=str) + '\n'
+    with _write_lock:
+        try:
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            elif os.path.getsize(path) > TRACING_CONFIG['max_bytes']:
+                os.replace(path, f"{path}.1")
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(line)
+        except OSError:
+            pass